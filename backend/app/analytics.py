@@ -0,0 +1,299 @@
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
+from itertools import compress, repeat
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import csv
+import io
+import math
+import os
+import sys
+
+from .json_codec import dumps_str
+from .models import Question
+from .persistence import Journal
+from .quiz_loader import QUIZ_FILE, CompiledQuiz, load_quiz
+from .store import SQLiteStore
+from .state import ANSWER_TYPECODE, LATENCY_TYPECODE, NO_ANSWER, NO_LATENCY, GameState
+
+# Post-game statistics of one session, as columnar tables (column name -> values):
+#   answers:      one row per answer (participant, question, option, correct, latency)
+#   questions:    one row per question shown: answer distribution, difficulty, time to answer
+#   participants: one row per participant: answered, correct, streaks, mean time to answer
+# Everything is computed from whole answer/latency rows (array slicing, count, compress,
+# sort, bytes.translate), not from per-answer Python objects.
+
+TABLES = ("answers", "questions", "participants")
+LATENCY_PERCENTILES = (50, 90, 99)
+# CSV rows per streamed chunk
+CSV_CHUNK_ROWS = 1000
+
+Table = Dict[str, List[Any]]
+
+# bytes.translate tables over answer rows (option indexes as signed bytes, NO_ANSWER = 0xFF)
+_ANSWERED = bytes(0 if b == NO_ANSWER & 0xFF else 1 for b in range(256))
+
+
+def _hit_table(correct_index: int) -> bytes:
+    return bytes(1 if b == correct_index else 0 for b in range(256))
+
+
+def _column(rows: Dict[int, array], question_id: int, size: int, typecode: str, fill: int) -> array:
+    """A question's row cut or padded to exactly `size` entries."""
+    row = rows.get(question_id)
+    if row is None:
+        return array(typecode, [fill]) * size
+    if len(row) >= size:
+        return row[:size]
+    return row + array(typecode, [fill]) * (size - len(row))
+
+
+def _percentile(ordered: Sequence[int], pct: float) -> Optional[int]:
+    """Nearest-rank percentile of sorted values."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def played_questions(game: GameState) -> List[Question]:
+    """Questions whose answers are final (passed or revealed), in quiz order."""
+    st = game.state
+    if st.is_finished:
+        return list(game.quiz)
+    played = st.current_question_index + (1 if st.reveal_answer else 0)
+    return [game.quiz[i] for i in range(max(0, min(played, len(game.quiz))))]
+
+
+class _Columns:
+    """Answer and latency rows of the played questions, restricted to current participants."""
+
+    def __init__(self, game: GameState):
+        self.game = game
+        # Answers of interned ids that are no longer participants are masked out
+        self.members = bytes(pid in game.participants for pid in game.participant_ids)
+        self.ids = list(compress(game.participant_ids, self.members))
+        self.questions = played_questions(game)
+        size = len(game.participant_ids)
+        # question -> (options chosen, latencies), both aligned with self.ids
+        self.rows: List[Tuple[Question, array, array]] = [
+            (
+                q,
+                array(ANSWER_TYPECODE, compress(_column(game.answer_rows, q.id, size, ANSWER_TYPECODE, NO_ANSWER), self.members)),
+                array(LATENCY_TYPECODE, compress(_column(game.answer_latency, q.id, size, LATENCY_TYPECODE, NO_LATENCY), self.members)),
+            )
+            for q in self.questions
+        ]
+
+
+def answers_table(game: GameState) -> Table:
+    cols = _Columns(game)
+    names = [game.participants[pid]["name"] for pid in cols.ids]
+    table: Table = {name: [] for name in ("participant_id", "name", "question_id", "option_index", "correct", "latency_ms")}
+    for q, options, latencies in cols.rows:
+        answered = options.tobytes().translate(_ANSWERED)
+        count = len(cols.ids) - options.count(NO_ANSWER)
+        table["participant_id"].extend(compress(cols.ids, answered))
+        table["name"].extend(compress(names, answered))
+        table["question_id"].extend(repeat(q.id, count))
+        table["option_index"].extend(compress(options, answered))
+        if q.correct_index is None:
+            table["correct"].extend(repeat(None, count))
+        else:
+            table["correct"].extend(compress(options.tobytes().translate(_hit_table(q.correct_index)), answered))
+        table["latency_ms"].extend(None if ms == NO_LATENCY else ms for ms in compress(latencies, answered))
+    return table
+
+
+def questions_table(game: GameState) -> Table:
+    cols = _Columns(game)
+    columns = ["question_id", "position", "answered", "correct", "correct_rate", "option_counts"]
+    columns += [f"latency_ms_p{p}" for p in LATENCY_PERCENTILES] + ["latency_ms_mean"]
+    table: Table = {name: [] for name in columns}
+    for position, (q, options, latencies) in enumerate(cols.rows):
+        answered = len(options) - options.count(NO_ANSWER)
+        correct = options.count(q.correct_index) if q.correct_index is not None else None
+        ordered = sorted(latencies)
+        ordered = ordered[bisect_left(ordered, 0):]
+        table["question_id"].append(q.id)
+        table["position"].append(position)
+        table["answered"].append(answered)
+        table["correct"].append(correct)
+        # Share of answers that were right; 1 - correct_rate is the question's difficulty
+        table["correct_rate"].append(round(correct / answered, 4) if correct is not None and answered else None)
+        table["option_counts"].append([options.count(i) for i in range(len(q.options))])
+        for p in LATENCY_PERCENTILES:
+            table[f"latency_ms_p{p}"].append(_percentile(ordered, p))
+        table["latency_ms_mean"].append(round(sum(ordered) / len(ordered), 1) if ordered else None)
+    return table
+
+
+def participants_table(game: GameState) -> Table:
+    cols = _Columns(game)
+    ids = cols.ids
+    table: Table = {
+        "participant_id": ids,
+        "name": [game.participants[pid]["name"] for pid in ids],
+        "answered": [0] * len(ids),
+        "correct": [0] * len(ids),
+        "longest_streak": [0] * len(ids),
+        "current_streak": [0] * len(ids),
+        "latency_ms_mean": [None] * len(ids),
+    }
+    if not ids or not cols.rows:
+        return table
+    # Transpose question rows into per-participant sequences in one C-level zip each
+    options_by_pid = zip(*(options for _, options, _ in cols.rows))
+    table["answered"] = [len(row) - row.count(NO_ANSWER) for row in options_by_pid]
+    hits = [
+        options.tobytes().translate(_hit_table(q.correct_index))
+        for q, options, _ in cols.rows
+        if q.correct_index is not None
+    ]
+    if hits:
+        # One byte per scored question, 1 for a correct answer: streaks are runs of 1s
+        sequences = [bytes(seq) for seq in zip(*hits)]
+        table["correct"] = [seq.count(1) for seq in sequences]
+        table["longest_streak"] = [max(map(len, seq.split(b"\x00"))) for seq in sequences]
+        table["current_streak"] = [len(seq) - len(seq.rstrip(b"\x01")) for seq in sequences]
+    means = []
+    for row in zip(*(latencies for _, _, latencies in cols.rows)):
+        known = [ms for ms in row if ms != NO_LATENCY]
+        means.append(round(sum(known) / len(known), 1) if known else None)
+    table["latency_ms_mean"] = means
+    return table
+
+
+BUILDERS = {"answers": answers_table, "questions": questions_table, "participants": participants_table}
+
+
+def session_table(game: GameState, table: str) -> Table:
+    return BUILDERS[table](game)
+
+
+def iter_csv(table: Table, session: Optional[str] = None, header: bool = True) -> Iterator[str]:
+    """CSV text of a table in chunks of CSV_CHUNK_ROWS rows; `session` adds a leading column with that value."""
+    names = list(table)
+    columns = list(table.values())
+    # List cells (option_counts) are written as "3;5;0;1"
+    for i, values in enumerate(columns):
+        if values and isinstance(values[0], list):
+            columns[i] = [";".join(map(str, v)) for v in values]
+    if session is not None:
+        names.insert(0, "session")
+        columns.insert(0, repeat(session))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(names)
+    rows = zip(*columns)
+    while True:
+        chunk = [row for _, row in zip(range(CSV_CHUNK_ROWS), rows)]
+        if chunk:
+            writer.writerows(chunk)
+        if buffer.tell():
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if len(chunk) < CSV_CHUNK_ROWS:
+            return
+
+
+# ---------------- Archived sessions ----------------
+
+def session_files(paths: List[Path]) -> List[Path]:
+    """Snapshot (.json) and SQLite (.sqlite3) files given directly or found in the given directories."""
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(p for p in path.iterdir() if p.suffix in (".json", ".sqlite3")))
+        else:
+            files.append(path)
+    return files
+
+
+def load_session(path: Path, quiz: CompiledQuiz) -> GameState:
+    """A finished or interrupted game read from its files, without modifying them."""
+    game = GameState(quiz)
+    # The loaders log to stdout, which may be carrying the CSV
+    with redirect_stdout(sys.stderr):
+        if path.suffix == ".sqlite3":
+            store = SQLiteStore(game, str(path))
+            try:
+                store.load()
+            finally:
+                if store.db is not None:
+                    store.db.close()
+        else:
+            Journal(game, path).load_state(compact=False)
+    # The tables read participants and answer rows only, so the scoreboard indexes aren't rebuilt;
+    # interning gives participants who never answered a row too
+    for pid in game.participants:
+        game.intern(pid)
+    return game
+
+
+# Quiz of the sessions being exported, per CLI worker process
+_quiz: Optional[CompiledQuiz] = None
+
+
+def _init_worker(quiz_file: Path):
+    global _quiz
+    with redirect_stdout(sys.stderr):
+        _quiz = load_quiz(quiz_file)
+
+
+def _export_session(path: Path, table: str, fmt: str) -> Optional[str]:
+    """One session's rows (CSV without header) or JSON line, or None if it can't be read."""
+    try:
+        data = session_table(load_session(path, _quiz), table)
+    except Exception as e:
+        print(f"[analytics] skipped {path}: {e}", file=sys.stderr)
+        return None
+    if fmt == "csv":
+        return "".join(iter_csv(data, session=path.stem, header=False))
+    return dumps_str({"session": path.stem, table: data}) + "\n"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Export post-game statistics of archived sessions (quiz_state.json snapshots with their "
+        "journals, or .sqlite3 databases) as CSV, or as JSON lines of columnar tables."
+    )
+    parser.add_argument("sessions", nargs="+", type=Path, help="session files, or directories of them (e.g. rooms/)")
+    parser.add_argument("--table", choices=TABLES, default="questions")
+    parser.add_argument("--format", choices=("csv", "columns"), default="csv")
+    parser.add_argument("--quiz", type=Path, default=QUIZ_FILE, help="quiz the sessions were played with")
+    parser.add_argument("--out", type=Path, help="output file (default: stdout)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="sessions read in parallel processes")
+    args = parser.parse_args(argv)
+
+    files = session_files(args.sessions)
+    _init_worker(args.quiz)
+    out = args.out.open("w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        if args.format == "csv":
+            columns = ["session", *session_table(GameState(_quiz), args.table)]
+            out.write(",".join(columns) + "\n")
+        export = partial(_export_session, table=args.table, fmt=args.format)
+        if args.jobs > 1 and len(files) > 1:
+            with ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(args.quiz,)) as pool:
+                # map yields results in input order, so the output matches a serial run
+                for text in pool.map(export, files, chunksize=16):
+                    if text:
+                        out.write(text)
+        else:
+            for path in files:
+                text = export(path)
+                if text:
+                    out.write(text)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
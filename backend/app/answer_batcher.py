@@ -0,0 +1,68 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from . import profiler
+from .models import AnswerRequest
+
+AnswerResult = Dict[str, Any]
+
+
+class AnswerBatcher:
+    """Collects answers submitted during one event-loop tick and processes them together.
+
+    Submitters await their own result; the process callback receives every
+    answer queued since the last batch and returns one result per answer, in
+    order. One batch means one store write and one tally/broadcast update no
+    matter how many answers arrived at once.
+    """
+
+    def __init__(self, process: Callable[[List[AnswerRequest]], Awaitable[List[AnswerResult]]], name: str = ""):
+        self._process = process
+        self.name = name
+        self._pending: List[Tuple[AnswerRequest, asyncio.Future]] = []
+        # When the oldest pending answer arrived (perf_counter)
+        self._first_submitted = 0.0
+        self._handle: Optional[asyncio.Handle] = None
+        self.stats: Dict[str, int] = {"answers": 0, "batches": 0, "largest_batch": 0}
+
+    async def submit(self, answer: AnswerRequest) -> AnswerResult:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            self._first_submitted = time.perf_counter()
+        self._pending.append((answer, future))
+        if self._handle is None:
+            self._handle = loop.call_soon(self._start_batch)
+        return await future
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def _start_batch(self):
+        self._handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            profiler.record_span("answer_queue", self.name, self._first_submitted)
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[AnswerRequest, asyncio.Future]]):
+        stats = self.stats
+        stats["answers"] += len(batch)
+        stats["batches"] += 1
+        stats["largest_batch"] = max(stats["largest_batch"], len(batch))
+        try:
+            results = await self._process([answer for answer, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,67 @@
+from typing import Awaitable, Callable, Dict, Optional, Set
+import asyncio
+import os
+import time
+
+# Minimum spacing between non-priority broadcasts (0 flushes on the next loop tick)
+BROADCAST_INTERVAL_MS = int(os.getenv("BROADCAST_INTERVAL_MS", "100"))
+
+
+class BroadcastScheduler:
+    """Coalesces broadcast requests into at most one flush per interval.
+
+    Callers mark kinds of data dirty ("state", "counts", ...); the flush callback
+    receives every kind marked since the last flush. Priority events (reveal,
+    next question, ...) flush immediately instead of waiting for the interval.
+    """
+
+    def __init__(self, flush: Callable[[Set[str]], Awaitable[None]], interval_ms: int = BROADCAST_INTERVAL_MS):
+        self._flush = flush
+        self.interval = max(0, interval_ms) / 1000
+        self._dirty: Set[str] = set()
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._last_flush = 0.0
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "coalesced": 0,
+            "timed_flushes": 0,
+            "priority_flushes": 0,
+        }
+
+    def mark_dirty(self, kind: str):
+        """Schedule a flush within the interval; repeated requests before then are coalesced."""
+        self.stats["requests"] += 1
+        self._dirty.add(kind)
+        if self._handle is not None:
+            self.stats["coalesced"] += 1
+            return
+        delay = max(0.0, self._last_flush + self.interval - time.monotonic())
+        self._handle = asyncio.get_running_loop().call_later(delay, self._start_timed_flush)
+
+    async def flush_now(self, kind: str):
+        """Flush `kind` plus anything pending right away."""
+        self.stats["requests"] += 1
+        self.stats["priority_flushes"] += 1
+        self._dirty.add(kind)
+        await self._run()
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._dirty.clear()
+
+    def _start_timed_flush(self):
+        self._handle = None
+        if self._dirty:
+            self.stats["timed_flushes"] += 1
+            asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        kinds, self._dirty = self._dirty, set()
+        self._last_flush = time.monotonic()
+        if kinds:
+            await self._flush(kinds)
@@ -0,0 +1,132 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import os
+import tempfile
+
+from PIL import Image
+
+from .models import ImageAsset, ImageVariant
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Where image_url / reveal_image_url paths such as /images/q1-question.jpeg are found
+PUBLIC_DIR = Path(os.getenv("QUIZ_PUBLIC_DIR", BASE_DIR.parent / "frontend" / "public"))
+# Resized variants, named by source content hash so they survive restarts
+IMAGE_CACHE_DIR = Path(os.getenv("IMAGE_CACHE_DIR", BASE_DIR / "image_cache"))
+# Widths of the resized variants (only those smaller than the original are made)
+IMAGE_WIDTHS = tuple(sorted(int(w) for w in os.getenv("IMAGE_WIDTHS", "320,640,1280").split(",") if w.strip()))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+# Served at ASSET_PREFIX/<name>; names embed a content hash, so responses never change
+ASSET_PREFIX = "/assets/images"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ImagePipeline:
+    """Content-hashed, resized copies of the quiz's local images.
+
+    prepare() maps an image URL from the quiz to an ImageAsset (hashed
+    variant URLs with their widths); path() resolves a served asset name to
+    its file. Sources are re-read only when their size or mtime changes.
+    prepare() reads and resizes files, so the app calls it off the event loop.
+    """
+
+    def __init__(self, public_dir: Path = PUBLIC_DIR, cache_dir: Path = IMAGE_CACHE_DIR, widths: Tuple[int, ...] = IMAGE_WIDTHS):
+        self.public_dir = Path(public_dir)
+        self.cache_dir = Path(cache_dir)
+        self.widths = widths
+        # asset name -> file
+        self.files: Dict[str, Path] = {}
+        # source path -> ((size, mtime), asset)
+        self._assets: Dict[Path, Tuple[Tuple[int, float], Optional[ImageAsset]]] = {}
+
+    def source_path(self, src: str) -> Optional[Path]:
+        """The file behind a site-relative image URL, or None for remote URLs and paths outside public_dir."""
+        if not src.startswith("/") or src.startswith("//"):
+            return None
+        root = self.public_dir.resolve()
+        path = (root / src.split("?", 1)[0].lstrip("/")).resolve()
+        if root not in path.parents or not path.is_file():
+            return None
+        return path
+
+    def prepare(self, urls: Iterable[str]) -> Dict[str, ImageAsset]:
+        """Assets for every local image among `urls` (building missing variants)."""
+        assets: Dict[str, ImageAsset] = {}
+        for src in dict.fromkeys(urls):
+            path = self.source_path(src)
+            if path is None:
+                continue
+            try:
+                asset = self._asset(path, src)
+            except Exception as e:
+                print(f"[images] skipped {src}: {e}")
+                continue
+            if asset is not None:
+                assets[src] = asset
+        return assets
+
+    def path(self, name: str) -> Optional[Path]:
+        return self.files.get(name)
+
+    def _asset(self, path: Path, src: str) -> Optional[ImageAsset]:
+        stat = path.stat()
+        signature = (stat.st_size, stat.st_mtime)
+        cached = self._assets.get(path)
+        if cached is not None and cached[0] == signature:
+            asset = cached[1]
+            return asset.model_copy(update={"src": src}) if asset is not None else None
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        suffix = path.suffix.lower()
+        original = f"{digest}{suffix}"
+        self.files[original] = path
+        variants: List[ImageVariant] = []
+        complete = True
+        with Image.open(path) as img:
+            width, height = img.size
+            # Transparent images stay PNG; JPEG has no alpha channel
+            alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            for target in self.widths:
+                if target >= width:
+                    break
+                name = f"{digest}-{target}w.{'png' if alpha else 'jpg'}"
+                out = self.cache_dir / name
+                if not out.exists():
+                    try:
+                        self._resize(img, target, round(height * target / width), out, alpha)
+                    except Exception as e:
+                        # Another worker may have written it meanwhile; otherwise serve the other sizes
+                        if not out.exists():
+                            print(f"[images] skipped {name} for {src}: {e}")
+                            complete = False
+                            continue
+                self.files[name] = out
+                variants.append(ImageVariant(url=f"{ASSET_PREFIX}/{name}", width=target))
+        variants.append(ImageVariant(url=f"{ASSET_PREFIX}/{original}", width=width))
+        asset = ImageAsset(src=src, variants=variants)
+        if complete:
+            # A missing variant is retried on the next prepare()
+            self._assets[path] = (signature, asset)
+        return asset
+
+    def _resize(self, img, width: int, height: int, out: Path, alpha: bool):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        resized = img.convert("RGBA" if alpha else "RGB").resize((width, height), Image.LANCZOS)
+        # Unique temp name: workers sharing the cache may resize the same image at once
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{out.stem}-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if alpha:
+                    resized.save(f, "PNG", optimize=True)
+                else:
+                    resized.save(f, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp, out)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+PIPELINE = ImagePipeline()
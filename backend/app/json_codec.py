@@ -0,0 +1,78 @@
+from typing import Any, Callable, Dict, Union
+import json
+import os
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+try:
+    import msgspec
+except ImportError:  # optional: pip install msgspec
+    msgspec = None
+
+# JSON library for WebSocket frames, responses and persistence: "auto" (orjson,
+# then msgspec, then the standard library), or one of "orjson", "msgspec", "json"
+JSON_ENCODER = os.getenv("JSON_ENCODER", "auto")
+
+Encoder = Callable[[Any], bytes]
+Decoder = Callable[[Union[bytes, str]], Any]
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# Every encoder writes compact UTF-8 JSON with non-ASCII characters unescaped and
+# non-string dict keys turned into strings, like _json_dumps does; every decoder
+# raises ValueError on malformed input, like json.loads.
+ENCODERS: Dict[str, Encoder] = {"json": _json_dumps}
+DECODERS: Dict[str, Decoder] = {"json": json.loads}
+if orjson is not None:
+    ENCODERS["orjson"] = lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    DECODERS["orjson"] = orjson.loads
+if msgspec is not None:
+    _msgspec_decode = msgspec.json.Decoder().decode
+
+    def _msgspec_loads(data: Union[bytes, str]) -> Any:
+        try:
+            return _msgspec_decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    ENCODERS["msgspec"] = msgspec.json.Encoder().encode
+    DECODERS["msgspec"] = _msgspec_loads
+
+
+def _choose(name: str) -> str:
+    if name == "auto":
+        return next(n for n in ("orjson", "msgspec", "json") if n in ENCODERS)
+    if name not in ENCODERS:
+        print(f"[json] JSON_ENCODER={name} is not installed, using the standard library")
+        return "json"
+    return name
+
+
+BACKEND = _choose(JSON_ENCODER)
+dumps: Encoder = ENCODERS[BACKEND]
+loads: Decoder = DECODERS[BACKEND]
+
+
+def dumps_str(obj: Any) -> str:
+    """dumps() as text, for WebSocket text frames and text files."""
+    return dumps(obj).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """The app's default response class: JSONResponse rendered with the selected encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(model: BaseModel) -> Response:
+    """A response serialized by Pydantic straight to JSON, skipping the dict/jsonable_encoder round trip."""
+    return Response(content=model.model_dump_json(), media_type="application/json")
@@ -1,16 +1,24 @@
 # Test comment: File editing is working correctly
 import asyncio
-import contextlib
+import math
 import os
+import secrets
+import threading
+import time
+import uuid
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Set
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header, Depends, Request
+from fastapi import APIRouter, FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.requests import HTTPConnection
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
 
+from . import analytics, images, json_codec, metrics, persistence, profiler, rate_limit
+from .json_codec import model_response
+from .metrics import ANSWERS_TOTAL, HANDLER_SECONDS, METRICS_ENABLED, TIMER_DRIFT_SECONDS, MetricsMiddleware
 from .models import (
-    Question,
-    QuizState,
     JoinRequest,
     JoinResponse,
     AnswerRequest,
@@ -19,15 +27,16 @@ from .models import (
     AggregateResult,
     ScoreboardResponse,
     ScoreboardEntry,
+    RankResponse,
     ParticipantStatus,
     ParticipantsStatusResponse,
 )
-from .quiz_loader import load_quiz
-from . import state as quiz_state
-from .websocket_manager import ConnectionManager
-from .persistence import save_state, load_state
+from .quiz_loader import QUIZ_FILE, CompiledQuiz, load_quiz
+from .rate_limit import ANSWER_LIMITER, JOIN_ADMISSION, JOIN_LIMITER, RateLimited
+from .rooms import DEFAULT_ROOM, Room, RoomRegistry
+from .store import STATE_BACKEND
 
-app = FastAPI(title="Team Quiz Game")
+app = FastAPI(title="Team Quiz Game", default_response_class=json_codec.FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,378 +44,1082 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by the participant app to back off when /join answers 429
+    expose_headers=["Retry-After"],
 )
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
-manager = ConnectionManager()
+# Game endpoints live on this router, mounted at / for the default room and at
+# /rooms/{room_code} for every other room.
+router = APIRouter()
 
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "changeme")
-DEFAULT_TIME_LIMIT = int(os.getenv("DEFAULT_TIME_LIMIT", "30"))  # 0 disables global default
-timer_task: asyncio.Task | None = None
+# Seconds between checks of quiz_questions.json for changes (0 disables the watcher)
+QUIZ_WATCH_SECONDS = float(os.getenv("QUIZ_WATCH_SECONDS", "0"))
+# Auto-reveal once every participant with an open socket has answered (participants
+# without one are not waited for). Presence is per process, so off by default with
+# the multi-worker sqlite backend.
+PRESENCE_REVEAL = os.getenv("PRESENCE_REVEAL", "0" if STATE_BACKEND == "sqlite" else "1") == "1"
+# Leaderboard entries pushed to admin sockets when an answer is revealed
+LEADERBOARD_PUSH_SIZE = int(os.getenv("LEADERBOARD_PUSH_SIZE", "10"))
+# Distinguishes state versions of this process from those of a previous run in ETags
+BOOT_ID = uuid.uuid4().hex[:8]
+
+# ---------------- Instrumentation ----------------
+
+def record_timing(op: str, room: Room, started: float):
+    """Observe a hot operation that began at `started` (perf_counter) in metrics and any running profile."""
+    ended = time.perf_counter()
+    HANDLER_SECONDS.observe(ended - started, op)
+    profiler.record_span(op, room.code, started, ended)
 
 # ---------------- Admin Auth ----------------
 
 def verify_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Server-wide admin endpoints: ADMIN_TOKEN only."""
     token = x_admin_token or request.query_params.get("admin_token")
     if token != ADMIN_TOKEN:
         raise HTTPException(status_code=403, detail="Invalid admin token")
 
+def is_room_admin(room: Room, token: Optional[str]) -> bool:
+    """A room is administered with its own token (returned by POST /admin/rooms) or ADMIN_TOKEN."""
+    if not token:
+        return False
+    return secrets.compare_digest(token, ADMIN_TOKEN) or room.is_admin_token(token)
+
+# ---------------- Rate Limiting ----------------
+
+def client_host(connection: HTTPConnection) -> str:
+    """Client address; behind a reverse proxy run uvicorn with --proxy-headers so this is the real client."""
+    return connection.client.host if connection.client else "unknown"
+
+def too_many_requests(e: RateLimited) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+async def join_admission(request: Request):
+    """Per-IP join limit plus the global cap on joins handled at once (429 + Retry-After beyond either)."""
+    try:
+        JOIN_LIMITER.check(client_host(request))
+        await JOIN_ADMISSION.acquire()
+    except RateLimited as e:
+        raise too_many_requests(e)
+    try:
+        yield
+    finally:
+        JOIN_ADMISSION.release()
+
+def check_answer_rate(connection: HTTPConnection, participant_id: str):
+    """Per client IP and participant, so players sharing a venue's NAT address don't share a budget."""
+    ANSWER_LIMITER.check(f"{client_host(connection)}|{participant_id}")
+
+# ---------------- Rooms ----------------
+
+def room_code_path(room_code: str):
+    """Declares {room_code} on the routes mounted at /rooms/{room_code} (get_room reads it)."""
+
+def path_room_code(connection: HTTPConnection) -> str:
+    """The room named in the URL path; the unprefixed routes always serve the default room."""
+    return connection.path_params.get("room_code", DEFAULT_ROOM)
+
+async def get_room(connection: HTTPConnection) -> Room:
+    room = await rooms.get(path_room_code(connection))
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return room
+
+def verify_room_admin(request: Request, room: Room = Depends(get_room), x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints of one room: that room's token or ADMIN_TOKEN."""
+    if not is_room_admin(room, x_admin_token or request.query_params.get("admin_token")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
 # ---------------- Timer Helpers ----------------
 
-def effective_time_limit(q: Question) -> int:
-    if q.time_limit_seconds is not None:
-        return q.time_limit_seconds
-    if quiz_state.QUIZ_META.get("default_time_limit_seconds") is not None:
-        try:
-            raw_val = quiz_state.QUIZ_META.get("default_time_limit_seconds")
-            return int(str(raw_val)) if raw_val is not None else 0
-        except Exception:
-            return 0
-    return DEFAULT_TIME_LIMIT
-
-def compute_remaining_seconds() -> Optional[int]:
-    st = quiz_state.state
-    if st.is_finished or st.question_time_limit in (None, 0) or not st.question_started_at:
+def compute_remaining_seconds(room: Room) -> Optional[int]:
+    st = room.game.state
+    deadline = room.game.question_deadline
+    if st.is_finished or st.question_time_limit in (None, 0) or deadline is None:
+        return None
+    return max(0, math.ceil(deadline - time.monotonic()))
+
+def deadline_from_state(room: Room) -> Optional[float]:
+    """Monotonic deadline for a timer persisted as question_started_at + question_time_limit."""
+    st = room.game.state
+    if not st.question_time_limit or not st.question_started_at:
         return None
     try:
         started = datetime.fromisoformat(st.question_started_at)
     except ValueError:
         return None
-    elapsed = int((datetime.now(timezone.utc) - started).total_seconds())
-    rem = st.question_time_limit - elapsed
-    return max(0, rem) if rem >= 0 else 0
+    elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+    return time.monotonic() + st.question_time_limit - elapsed
+
+def schedule_auto_reveal(room: Room):
+    """(Re)arm the single auto-reveal callback for the room's current question, or disarm it."""
+    if room.reveal_timer is not None:
+        room.reveal_timer.cancel()
+        room.reveal_timer = None
+    game = room.game
+    st = game.state
+    if st.is_finished or st.reveal_answer or st.current_question_index < 0 or not st.question_time_limit:
+        game.question_deadline = None
+        return
+    if game.question_deadline is None:
+        game.question_deadline = deadline_from_state(room)
+        if game.question_deadline is None:
+            return
+    # asyncio's loop clock is time.monotonic()
+    room.reveal_timer = asyncio.get_running_loop().call_at(
+        game.question_deadline, on_question_deadline, room, st.current_question_index
+    )
+
+def on_question_deadline(room: Room, question_index: int):
+    room.reveal_timer = None
+    if room.game.question_deadline is not None:
+        TIMER_DRIFT_SECONDS.observe(max(0.0, asyncio.get_running_loop().time() - room.game.question_deadline))
+    asyncio.ensure_future(reveal_current_question(room, auto_reason="timer_expired", question_index=question_index))
 
-async def reveal_current_question(auto_reason: Optional[str] = None) -> bool:
-    """Mark the current question as revealed, stop the timer, and notify clients."""
-    st = quiz_state.state
+async def reveal_current_question(
+    room: Room, auto_reason: Optional[str] = None, question_index: Optional[int] = None
+) -> bool:
+    """Mark the current question as revealed, stop the timer, and notify clients.
+
+    With `question_index`, only if that is still the current question (timers and
+    auto-reveals decided before another worker moved the game on do nothing).
+    """
+    room.store.sync()
+    st = room.game.state
     if st.reveal_answer or st.current_question_index < 0 or st.is_finished:
         return False
+    if question_index is not None and st.current_question_index != question_index:
+        return False
+    started = time.perf_counter()
     st.reveal_answer = True
     st.question_time_limit = None
     st.question_started_at = None
-    save_state()
-    await broadcast_state()
+    if not await state_changed(room, "reveal"):
+        return False
+    await room.broadcasts.flush_now("state")
+    await broadcast_leaderboard(room)
+    record_timing("reveal", room, started)
     return True
 
-async def monitor_timer():
-    """Background task that checks the timer and triggers auto-reveal."""
-    try:
-        while True:
-            await asyncio.sleep(1)
-            st = quiz_state.state
-            if (
-                st.is_finished
-                or st.current_question_index < 0
-                or st.reveal_answer
-            ):
-                continue
-            remaining = compute_remaining_seconds()
-            if remaining is not None and remaining <= 0:
-                await reveal_current_question(auto_reason="timer_expired")
-    except asyncio.CancelledError:
-        return
-
 # ---------------- State projection ----------------
 
-def make_public_state() -> PublicState:
-    total_questions = len(quiz_state.QUIZ)
-    remaining = compute_remaining_seconds()
-    if quiz_state.state.is_finished:
-        return PublicState(
-            state=quiz_state.state,
-            question=None,
-            final_image_url=(
-                str(quiz_state.QUIZ_META.get("final_image_url"))
-                if quiz_state.QUIZ_META.get("final_image_url")
-                else None
-            ),
-            total_questions=total_questions,
-            remaining_seconds=None,
-        )
-    q = quiz_state.get_current_question()
-    if q and not quiz_state.state.reveal_answer:
-        q = Question(
-            id=q.id,
-            text=q.text,
-            options=q.options,
-            correct_index=None,
-            image_url=q.image_url,
-            time_limit_seconds=q.time_limit_seconds,
-            translations=q.translations,
-            reveal_image_url=None,
-        )
-    return PublicState(
-        state=quiz_state.state,
-        question=q,
-        final_image_url=None,
-        total_questions=total_questions,
-        remaining_seconds=remaining,
+async def state_changed(room: Room, kind: str) -> bool:
+    """Publish a quiz state transition: new projection version, persisted through the store.
+
+    Handlers call room.store.sync() before changing the state. Returns False if
+    another worker changed it first anyway; the local change is then replaced by
+    that worker's state.
+    """
+    if not await room.store.record_state(kind):
+        room.store.sync()
+        return False
+    room.game.bump_version()
+    schedule_auto_reveal(room)
+    return True
+
+STATE_CONFLICT = {"status": "error", "message": "The quiz was changed at the same time, please try again"}
+
+def final_image_url(room: Room) -> Optional[str]:
+    url = room.game.quiz.meta.get("final_image_url")
+    return str(url) if url else None
+
+# WebSocket protocols. "full" clients get the whole PublicState on every broadcast;
+# "delta" clients get a snapshot on connect (or on {"type": "resync"}), then
+# versioned dotted-path patches plus participant/answer count ticks.
+# Sockets are grouped by (protocol, payload variant) so that each variant of a
+# message is encoded once per broadcast; the variant comes from ?lang=.
+PROTOCOL_FULL = "full"
+PROTOCOL_DELTA = "delta"
+
+def public_state_body(room: Room, variant: Optional[str] = None) -> bytes:
+    """PublicState JSON without remaining_seconds, assembled from the quiz's pre-serialized questions."""
+    game = room.game
+    st = game.state
+    question = b"null"
+    final_url = None
+    if st.is_finished:
+        final_url = final_image_url(room)
+    elif 0 <= st.current_question_index < len(game.quiz):
+        question = game.quiz.question_payload(st.current_question_index, st.reveal_answer, variant)
+    manifest = game.quiz.image_manifest(st.current_question_index, st.reveal_answer, st.is_finished, variant)[2]
+    return (
+        b'{"state":' + st.model_dump_json().encode()
+        + b',"question":' + question
+        + b',"final_image_url":' + json_codec.dumps(final_url)
+        + b',"total_questions":%d' % len(game.quiz)
+        + manifest + b"}"
     )
 
-async def broadcast_state():
-    await manager.broadcast({"type": "state", "payload": make_public_state().model_dump()})
+def public_state_json(room: Room, remaining: Optional[int], variant: Optional[str] = None) -> bytes:
+    """Serialized PublicState, built once per state version and variant; only remaining_seconds is spliced in."""
+    version = room.game.version
+    cached = room.public_state_cache.get(variant)
+    if cached is None or cached[0] != version:
+        started = time.perf_counter()
+        cached = room.public_state_cache[variant] = (version, public_state_body(room, variant))
+        record_timing("public_state", room, started)
+    body = cached[1]
+    return body[:-1] + b',"remaining_seconds":' + (b"null" if remaining is None else str(remaining).encode()) + b"}"
+
+def state_message(room: Room, remaining: Optional[int], variant: Optional[str] = None) -> str:
+    return '{"type":"state","payload":' + public_state_json(room, remaining, variant).decode() + "}"
+
+def snapshot_message(room: Room, remaining: Optional[int], variant: Optional[str] = None) -> str:
+    payload = public_state_json(room, remaining, variant).decode()
+    return '{"type":"snapshot","version":%d,"payload":%s}' % (room.game.version, payload)
+
+def diff_public_state(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Dotted-path patch turning `old` into `new`.
+
+    Nested objects are patched field by field, except that a different question
+    is sent whole.
+    """
+    patch: Dict[str, Any] = {}
+    for key, value in new.items():
+        prev = old.get(key)
+        if prev == value:
+            continue
+        if isinstance(prev, dict) and isinstance(value, dict) and (key != "question" or prev.get("id") == value.get("id")):
+            for field, field_value in value.items():
+                if prev.get(field) != field_value:
+                    patch[f"{key}.{field}"] = field_value
+        else:
+            patch[key] = value
+    return patch
+
+def delta_message(room: Room, remaining: Optional[int], variant: Optional[str] = None) -> Optional[str]:
+    """Patch from the previous delta broadcast to the current version, or None if nothing changed."""
+    version = room.game.version
+    previous = room.delta_base.get(variant)
+    if previous is not None and previous[0] == version:
+        return None
+    current = json_codec.loads(public_state_json(room, None, variant))
+    room.delta_base[variant] = (version, current)
+    if previous is None:
+        return snapshot_message(room, remaining, variant)
+    patch = diff_public_state(previous[1], current)
+    patch["remaining_seconds"] = remaining
+    return json_codec.dumps_str({"type": "delta", "base": previous[0], "version": version, "patch": patch})
+
+def reset_delta_base(room: Room, variant: Optional[str]):
+    """Patch `variant` from the current version on; called when its first delta client connects."""
+    room.delta_base[variant] = (room.game.version, json_codec.loads(public_state_json(room, None, variant)))
+
+async def broadcast_state(room: Room):
+    started = time.perf_counter()
+    remaining = compute_remaining_seconds(room)
+    for group in list(room.manager.groups):
+        protocol, variant = group
+        if protocol == PROTOCOL_DELTA:
+            delta = delta_message(room, remaining, variant)
+            if delta is not None:
+                await room.manager.broadcast_text(delta, group=group)
+        else:
+            message = state_message(room, remaining, variant)
+            await room.manager.broadcast_text(message, coalesce="state", group=group, started=started)
+    record_timing("broadcast_state", room, started)
+
+async def broadcast_counts(room: Room):
+    """Tick delta clients with participant and current-question answer counts."""
+    groups = [group for group in room.manager.groups if group[0] == PROTOCOL_DELTA]
+    if not groups:
+        return
+    game = room.game
+    current_q = game.get_current_question()
+    answered = game.answered_count(current_q.id) if current_q else 0
+    message = json_codec.dumps_str(
+        {"type": "counts", "participants": len(game.participants), "answered": answered, "online": len(room.manager.online)}
+    )
+    for group in groups:
+        await room.manager.broadcast_text(message, coalesce="counts", group=group)
+
+def participants_message(room: Room, since: Optional[int]) -> str:
+    # The model serializes itself; only the message type is spliced in front
+    return '{"type":"participants",' + participants_status(room, since).model_dump_json()[1:]
+
+async def broadcast_participants(room: Room):
+    """Push roster, answered and presence changes since the last push to admin sockets."""
+    if not room.manager.admins:
+        return
+    game = room.game
+    if room.roster_pushed == game.roster_version:
+        return
+    message = participants_message(room, room.roster_pushed)
+    room.roster_pushed = game.roster_version
+    await room.manager.broadcast_text(message, admins=True)
+
+async def broadcast_leaderboard(room: Room):
+    """Push the top LEADERBOARD_PUSH_SIZE entries to admin sockets (the presenter shows them at reveal)."""
+    if not room.manager.admins or LEADERBOARD_PUSH_SIZE <= 0:
+        return
+    scoreboard = compute_scoreboard(room, limit=LEADERBOARD_PUSH_SIZE)
+    await room.manager.broadcast_text('{"type":"leaderboard",' + scoreboard.model_dump_json()[1:], admins=True)
+
+async def flush_broadcasts(room: Room, kinds: Set[str]):
+    if "state" in kinds:
+        await broadcast_state(room)
+    if "counts" in kinds or "presence" in kinds:
+        await broadcast_counts(room)
+    await broadcast_participants(room)
+    # A participant who went offline may have been the last one not to answer
+    if "presence" in kinds and all_participants_answered_current(room):
+        await reveal_current_question(room, auto_reason="all_answered")
 
 # ---------------- Calculations ----------------
 
-def compute_results() -> AdminResults:
-    per_question: List[AggregateResult] = []
-    for q in quiz_state.QUIZ:
-        counts = [0] * len(q.options)
-        for (pid, qid), opt_idx in quiz_state.answers.items():
-            if qid == q.id:
-                counts[opt_idx] += 1
-        per_question.append(AggregateResult(question_id=q.id, counts=counts))
+def compute_results(room: Room) -> AdminResults:
+    game = room.game
+    per_question = [
+        AggregateResult(question_id=q.id, counts=list(game.option_counts.get(q.id) or [0] * len(q.options)))
+        for q in game.quiz
+    ]
     return AdminResults(per_question=per_question)
 
-def compute_scoreboard() -> ScoreboardResponse:
-    questions_with_correct = [q for q in quiz_state.QUIZ if q.correct_index is not None]
-    total_questions = len(questions_with_correct)
-    per_participant: Dict[str, ScoreboardEntry] = {}
-    for participant_id, pdata in quiz_state.participants.items():
-        correct = 0
-        answered = 0
-        for q in questions_with_correct:
-            key = (participant_id, q.id)
-            if key in quiz_state.answers:
-                answered += 1
-                if quiz_state.answers[key] == q.correct_index:
-                    correct += 1
+def compute_scoreboard(room: Room, limit: Optional[int] = None) -> ScoreboardResponse:
+    """Read the scoreboard off the incrementally maintained leaderboard index."""
+    started = time.perf_counter()
+    game = room.game
+    total_questions = game.scored_question_count
+    ranked = game.leaderboard if limit is None else game.leaderboard[:limit]
+    entries: List[ScoreboardEntry] = []
+    rank = 0
+    for position, (neg_points, _, participant_id) in enumerate(ranked, 1):
+        correct, answered, points = game.participant_scores[participant_id]
         percentage = (correct / total_questions * 100) if total_questions > 0 else 0.0
-        per_participant[participant_id] = ScoreboardEntry(
-            participant_id=participant_id,
-            name=pdata["name"],
-            correct=correct,
-            answered=answered,
-            total_questions=total_questions,
-            percentage=round(percentage, 1),
+        if position == 1 or neg_points != ranked[position - 2][0]:
+            rank = position
+        entries.append(
+            ScoreboardEntry(
+                participant_id=participant_id,
+                name=game.participants[participant_id]["name"],
+                correct=correct,
+                answered=answered,
+                total_questions=total_questions,
+                percentage=round(percentage, 1),
+                points=points,
+                rank=rank,
+            )
+        )
+    record_timing("scoreboard", room, started)
+    return ScoreboardResponse(entries=entries, scoring_mode=game.scoring_mode)
+
+def participants_status(room: Room, since: Optional[int] = None) -> ParticipantsStatusResponse:
+    """Participant roster; with `since` only participants changed after that roster version."""
+    game = room.game
+    online = room.manager.online
+    current_q = game.get_current_question()
+    # A version from before the current question (or from a previous server run) needs a full list
+    full = since is None or not (game.roster_base_version <= since <= game.roster_version)
+    if full:
+        pids = [pid for _, pid in game.roster]
+    else:
+        pids = game.roster_changed_since(since)
+    participants = [
+        ParticipantStatus(
+            participant_id=pid,
+            name=game.participants[pid]["name"],
+            answered_current=current_q is not None and game.has_answer(pid, current_q.id),
+            online=pid in online,
         )
-    entries = sorted(per_participant.values(), key=lambda e: (-e.correct, e.name.lower()))
-    return ScoreboardResponse(entries=entries)
+        for pid in pids
+    ]
+    return ParticipantsStatusResponse(
+        participants=participants, version=game.roster_version, full=full, online=len(online)
+    )
 
-def all_participants_answered_current() -> bool:
-    current_q = quiz_state.get_current_question()
-    if not current_q or not quiz_state.participants:
+def all_participants_answered_current(room: Room) -> bool:
+    """Whether everyone expected to answer has; with PRESENCE_REVEAL only connected participants
+    are expected (everyone, when nobody is connected)."""
+    game = room.game
+    current_q = game.get_current_question()
+    if not current_q:
         return False
-    for pid in quiz_state.participants.keys():
-        if (pid, current_q.id) not in quiz_state.answers:
-            return False
-    return True
+    if PRESENCE_REVEAL:
+        online = [pid for pid in room.manager.online if pid in game.participants]
+        if online:
+            return all(game.has_answer(pid, current_q.id) for pid in online)
+    return game.all_answered(current_q.id)
+
+def check_answer(room: Room, req: AnswerRequest) -> Optional[str]:
+    """Why an answer cannot be accepted right now, or None."""
+    game = room.game
+    if req.participant_id not in game.participants:
+        # May have joined through another worker a moment ago
+        room.store.sync()
+    if req.participant_id not in game.participants:
+        return "Unknown participant"
+    question = game.get_current_question()
+    if not question or question.id != req.question_id:
+        return "Question mismatch"
+    if game.state.reveal_answer:
+        return "Answer already revealed"
+    remaining = compute_remaining_seconds(room)
+    if remaining is not None and remaining <= 0:
+        return "Time expired"
+    if not (0 <= req.option_index < len(question.options)):
+        return "Invalid option index"
+    return None
+
+def answer_latency_ms(room: Room) -> Optional[int]:
+    """Milliseconds since the current question was shown, or None if its start time is unknown."""
+    started_at = room.game.state.question_started_at
+    if not started_at:
+        return None
+    try:
+        started = datetime.fromisoformat(started_at)
+    except ValueError:
+        return None
+    return max(0, round((datetime.now(timezone.utc) - started).total_seconds() * 1000))
+
+async def ingest_answers(room: Room, batch: List[AnswerRequest]) -> List[Dict[str, Any]]:
+    """Validate, store and tally a batch of answers with one store write and one tally update."""
+    started = time.perf_counter()
+    game = room.game
+    results: List[Dict[str, Any]] = [{}] * len(batch)
+    valid: List[int] = []
+    for i, req in enumerate(batch):
+        error = check_answer(room, req)
+        if error:
+            results[i] = {"status": "error", "message": error}
+        else:
+            valid.append(i)
+    if not valid:
+        ANSWERS_TOTAL.inc(len(batch), "rejected")
+        return results
+    # The whole batch arrived within one event-loop tick, so it shares one latency
+    latency = answer_latency_ms(room)
+    # The question they were validated against; the game may move on while the store writes
+    question = game.get_current_question()
+    # Claims are atomic across workers; duplicates (also within the batch) are refused
+    granted = await room.store.record_answers(
+        [(batch[i].participant_id, batch[i].question_id, batch[i].option_index, latency) for i in valid]
+    )
+    recorded = 0
+    for i, ok in zip(valid, granted):
+        if ok:
+            game.record_answer(batch[i].participant_id, question, batch[i].option_index, latency)
+            results[i] = {"status": "ok"}
+            recorded += 1
+        else:
+            results[i] = {"status": "error", "message": "Answer already locked"}
+    ANSWERS_TOTAL.inc(recorded, "ok")
+    ANSWERS_TOTAL.inc(len(batch) - recorded, "rejected")
+    record_timing("answer_batch", room, started)
+    if recorded:
+        room.broadcasts.mark_dirty("counts")
+        if all_participants_answered_current(room):
+            await reveal_current_question(room, auto_reason="all_answered")
+    return results
 
+def begin_current_question(room: Room):
+    """Reset reveal and start the timer for the question at current_question_index."""
+    game = room.game
+    game.state.reveal_answer = False
+    q = game.get_current_question()
+    if q:
+        game.state.question_time_limit = game.quiz.time_limit(q) or None
+        game.state.question_started_at = datetime.now(timezone.utc).isoformat()
+        game.question_deadline = (
+            time.monotonic() + game.state.question_time_limit if game.state.question_time_limit else None
+        )
+    game.mark_question_changed()
+
+
+def apply_store_events(room: Room, events: List[Dict[str, Any]]):
+    """Bring the room's read model up to date with changes made by other workers."""
+    game = room.game
+    for event in events:
+        kind = event["kind"]
+        if kind == "join":
+            if event["participant_id"] not in game.participants:
+                game.add_participant(event["participant_id"], event["name"])
+                room.broadcasts.mark_dirty("state")
+                room.broadcasts.mark_dirty("counts")
+        elif kind == "answer":
+            question = game.quiz.question_by_id(event["question_id"])
+            if question and not game.has_answer(event["participant_id"], event["question_id"]):
+                game.record_answer(event["participant_id"], question, event["option_index"], event.get("latency_ms"))
+                room.broadcasts.mark_dirty("counts")
+                if all_participants_answered_current(room):
+                    asyncio.ensure_future(
+                        reveal_current_question(
+                            room, auto_reason="all_answered", question_index=game.state.current_question_index
+                        )
+                    )
+        elif kind == "reset":
+            # Later events are part of the reloaded state
+            room.store.load()
+            game.rebuild_tallies()
+            game.bump_version()
+            game.question_deadline = None
+            schedule_auto_reveal(room)
+            asyncio.ensure_future(room.broadcasts.flush_now("state"))
+            return
+        elif "quiz_state" in event:
+            previous_index = game.state.current_question_index
+            game.apply_quiz_state(event["quiz_state"])
+            if game.state.current_question_index != previous_index:
+                game.mark_question_changed()
+            game.bump_version()
+            game.question_deadline = None
+            schedule_auto_reveal(room)
+            asyncio.ensure_future(room.broadcasts.flush_now("state"))
 
 # ---------------- Lifecycle ----------------
 
+async def open_room(room: Room):
+    """Finish loading a room whose store has populated its state."""
+    game = room.game
+    if game.state.current_question_index >= len(game.quiz):
+        game.state.current_question_index = -1
+        game.state.question_started_at = None
+        game.state.question_time_limit = None
+    game.rebuild_tallies()
+    game.bump_version()
+    game.question_deadline = None
+    schedule_auto_reveal(room)
+    await room.store.start(lambda events: apply_store_events(room, events))
+
+async def close_room(room: Room):
+    """Stop a room's timers and sockets and persist it before it is unloaded."""
+    if room.reveal_timer:
+        room.reveal_timer.cancel()
+        room.reveal_timer = None
+    room.broadcasts.cancel()
+    room.answers.cancel()
+    await room.manager.close_all()
+    await room.store.close()
+
+rooms = RoomRegistry(flush_broadcasts, ingest_answers, open_room, close_room)
+quiz_watcher: asyncio.Task | None = None
+startup_images: asyncio.Task | None = None
+
 @app.on_event("startup")
 async def startup_event():
-    quiz_state.QUIZ, quiz_state.QUIZ_META = load_quiz()
-    quiz_state.state = QuizState(current_question_index=-1, reveal_answer=False, is_finished=False)
-    load_state()
-    if quiz_state.state.current_question_index >= len(quiz_state.QUIZ):
-        quiz_state.state.current_question_index = -1
-        quiz_state.state.question_started_at = None
-        quiz_state.state.question_time_limit = None
-    global timer_task
-    if timer_task is None or timer_task.done():
-        timer_task = asyncio.create_task(monitor_timer())
+    global quiz_watcher, startup_images, _quiz_reload_lock
+    # Bound to the event loop that serves this run
+    _quiz_reload_lock = asyncio.Lock()
+    quiz = await asyncio.to_thread(load_quiz)
+    await rooms.start(quiz)
+    # Serve right away; clients get the resized images once they are built
+    startup_images = asyncio.create_task(prepare_startup_images(quiz))
+    if QUIZ_WATCH_SECONDS > 0:
+        quiz_watcher = asyncio.create_task(watch_quiz_file())
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    global timer_task
-    if timer_task:
-        timer_task.cancel()
-        with contextlib.suppress(asyncio.CancelledError):
-            await timer_task
-        timer_task = None
+    global quiz_watcher, startup_images
+    # Wait for them to unwind, so neither is left holding the reload lock
+    for task in (quiz_watcher, startup_images):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    quiz_watcher = startup_images = None
+    await rooms.stop()
+    # Rooms flushed their journals on close; let the writer thread finish anything left
+    await asyncio.to_thread(persistence.WRITER.stop)
+
+# ---------------- Quiz reload ----------------
+
+_quiz_reload_lock = asyncio.Lock()
+
+async def prepare_images(quiz: CompiledQuiz):
+    """Build the quiz's hashed and resized images in a thread, then attach them to it."""
+    quiz.set_assets(await asyncio.to_thread(images.PIPELINE.prepare, quiz.image_urls()))
+
+async def prepare_startup_images(quiz: CompiledQuiz):
+    async with _quiz_reload_lock:
+        if rooms.quiz is not quiz:
+            # Replaced by a reload, which prepared its own images
+            return
+        try:
+            await prepare_images(quiz)
+        except Exception as e:
+            print(f"[images] preparing images failed: {e}")
+            return
+        for room in list(rooms.rooms.values()):
+            room.game.bump_version()
+            await room.broadcasts.flush_now("state")
+
+async def apply_quiz(room: Room, old: CompiledQuiz, new: CompiledQuiz):
+    """Switch a room to new quiz content, keeping participants and answers."""
+    game = room.game
+    st = game.state
+    game.quiz = new
+    visible = len(new) != len(old) or new.meta != old.meta or (
+        0 <= st.current_question_index < len(new) and not new.same_question(st.current_question_index, old)
+    )
+    # Option counts and scores depend on options and correct answers
+    game.rebuild_tallies()
+    room.store.sync()
+    if st.current_question_index >= len(new):
+        st.current_question_index = -1
+        st.reveal_answer = False
+        st.question_started_at = None
+        st.question_time_limit = None
+        await state_changed(room, "advance")
+    elif visible:
+        game.bump_version()
+    if visible:
+        await room.broadcasts.flush_now("state")
+
+async def reload_quiz() -> Dict[str, Any]:
+    """Re-read the quiz file off the event loop and swap it into every loaded room.
+
+    In multi-worker mode this only reloads the worker that runs it; use
+    QUIZ_WATCH_SECONDS to have every worker pick the change up.
+    """
+    async with _quiz_reload_lock:
+        old = rooms.quiz
+        new = await asyncio.to_thread(load_quiz, QUIZ_FILE, old)
+        if new is old:
+            return {"changed": False, "questions": len(new), "changed_questions": []}
+        await prepare_images(new)
+        changed = [q.id for i, q in enumerate(new) if not new.same_question(i, old)]
+        rooms.quiz = new
+        for room in list(rooms.rooms.values()):
+            await apply_quiz(room, old, new)
+        print(f"[quiz] reloaded {len(new)} questions ({len(changed)} changed)")
+        return {"changed": True, "questions": len(new), "changed_questions": changed}
+
+async def watch_quiz_file():
+    def signature():
+        stat = QUIZ_FILE.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    last = signature()
+    while True:
+        await asyncio.sleep(QUIZ_WATCH_SECONDS)
+        try:
+            current = signature()
+            if current != last:
+                last = current
+                await reload_quiz()
+        except Exception as e:
+            # Keep serving the previous quiz; the next save is picked up again
+            print(f"[quiz] reload failed: {e}")
 
 # ---------------- Public endpoints ----------------
 
-@app.post("/join", response_model=JoinResponse)
-async def join(req: JoinRequest):
+@router.post("/join", response_model=JoinResponse, dependencies=[Depends(join_admission)])
+async def join(req: JoinRequest, room: Room = Depends(get_room)):
+    game = room.game
     name = req.name.strip()
     if not name:
         raise HTTPException(status_code=422, detail="Username cannot be empty")
-    # Check if username already exists (case-sensitive)
-    if name in quiz_state.participants:
+    # Claim the username (case-sensitive); atomic across workers
+    if name in game.participants or not await room.store.add_participant(name, name[:40]):
         raise HTTPException(status_code=409, detail="This username is already in use. Please choose a different one.")
 
     # Store participant with username as key
-    quiz_state.participants[name] = {"name": name[:40]}
-    save_state()
-    await broadcast_state()
+    game.add_participant(name, name[:40])
+    room.broadcasts.mark_dirty("state")
+    room.broadcasts.mark_dirty("counts")
     return JoinResponse(username=name)
 
-@app.get("/participant/{username}")
-async def participant_exists(username: str):
-    if username in quiz_state.participants:
+@router.get("/participant/{username}")
+async def participant_exists(username: str, room: Room = Depends(get_room)):
+    game = room.game
+    if username not in game.participants:
+        room.store.sync()
+    if username in game.participants:
         return {
             "status": "ok",
-            "name": quiz_state.participants[username]["name"]
+            "name": game.participants[username]["name"]
         }
     raise HTTPException(status_code=404, detail="Participant not found")
 
-@app.get("/state", response_model=PublicState)
-async def get_state():
-    return make_public_state()
+@router.get("/state", response_model=PublicState)
+async def get_state(
+    lang: Optional[str] = None, if_none_match: Optional[str] = Header(None), room: Room = Depends(get_room)
+):
+    """Public state; with ?lang= the question comes in that language only, without translations."""
+    variant = room.game.quiz.variant(lang)
+    remaining = compute_remaining_seconds(room)
+    etag = f'"{BOOT_ID}-{room.code}-{variant}-{room.game.version}-{remaining}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=public_state_json(room, remaining, variant), media_type="application/json", headers=headers)
 
-@app.post("/answer")
-async def submit_answer(req: AnswerRequest):
-    if req.participant_id not in quiz_state.participants:
-        return {"status": "error", "message": "Unknown participant"}
-    question = quiz_state.get_current_question()
-    if not question or question.id != req.question_id:
-        return {"status": "error", "message": "Question mismatch"}
-    if quiz_state.state.reveal_answer:
-        return {"status": "error", "message": "Answer already revealed"}
-    remaining = compute_remaining_seconds()
-    if remaining is not None and remaining <= 0:
-        return {"status": "error", "message": "Time expired"}
-    if not (0 <= req.option_index < len(question.options)):
-        return {"status": "error", "message": "Invalid option index"}
-    key = (req.participant_id, req.question_id)
-    if key in quiz_state.answers:
-        return {"status": "error", "message": "Answer already locked"}
-    quiz_state.answers[key] = req.option_index
-    save_state()
-    if all_participants_answered_current():
-        await reveal_current_question(auto_reason="all_answered")
-    return {"status": "ok"}
-
-@app.get("/answer_status/{username}/{question_id}")
-async def answer_status(username: str, question_id: int):
-    if username not in quiz_state.participants:
+@router.post("/answer")
+async def submit_answer(req: AnswerRequest, request: Request, room: Room = Depends(get_room)):
+    try:
+        check_answer_rate(request, req.participant_id)
+    except RateLimited as e:
+        raise too_many_requests(e)
+    return await room.answers.submit(req)
+
+@router.get("/answer_status/{username}/{question_id}")
+async def answer_status(username: str, question_id: int, room: Room = Depends(get_room)):
+    game = room.game
+    if username not in game.participants:
         raise HTTPException(status_code=404, detail="Participant not found")
-    question = next((q for q in quiz_state.QUIZ if q.id == question_id), None)
+    question = game.quiz.question_by_id(question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    key = (username, question_id)
-    if key in quiz_state.answers:
-        return {"status": "ok", "answered": True, "option_index": quiz_state.answers[key]}
-    return {"status": "ok", "answered": False, "option_index": None}
-
-@app.get("/scoreboard", response_model=ScoreboardResponse)
-async def scoreboard():
-    if not quiz_state.state.is_finished:
+    option_index = game.get_answer(username, question_id)
+    return {"status": "ok", "answered": option_index is not None, "option_index": option_index}
+
+@router.get("/scoreboard", response_model=ScoreboardResponse)
+async def scoreboard(room: Room = Depends(get_room)):
+    if not room.game.state.is_finished:
         raise HTTPException(status_code=403, detail="Scoreboard is only available after the quiz finishes")
-    return compute_scoreboard()
+    return model_response(compute_scoreboard(room))
+
+@router.get("/rank/{username}", response_model=RankResponse)
+async def participant_rank(username: str, room: Room = Depends(get_room)):
+    """A participant's current rank: one bisection of the leaderboard, not a scoreboard build."""
+    game = room.game
+    if username not in game.participants:
+        raise HTTPException(status_code=404, detail="Participant not found")
+    st = game.state
+    # Ranks move as answers come in, which would give away whether an answer was right
+    if st.current_question_index >= 0 and not st.reveal_answer and not st.is_finished:
+        raise HTTPException(status_code=403, detail="Rank is only available after the answer is revealed")
+    correct, _, points = game.participant_scores[username]
+    return RankResponse(
+        participant_id=username,
+        rank=game.rank(username),
+        participants=len(game.participants),
+        points=points,
+        correct=correct,
+    )
 
 # ---------------- Admin endpoints ----------------
 
-@app.post("/admin/start", dependencies=[Depends(verify_admin)])
-async def admin_start():
-    if quiz_state.state.current_question_index == -1 and quiz_state.QUIZ:
-        quiz_state.state.current_question_index = 0
-        quiz_state.state.reveal_answer = False
-        q = quiz_state.get_current_question()
-        if q:
-            quiz_state.state.question_time_limit = effective_time_limit(q) or None
-            quiz_state.state.question_started_at = datetime.now(timezone.utc).isoformat()
-        save_state()
-        await broadcast_state()
-    return {"status": "ok", "state": quiz_state.state}
-
-@app.post("/admin/next", dependencies=[Depends(verify_admin)])
-async def admin_next():
-    if quiz_state.participants and not all_participants_answered_current():
-        rem = compute_remaining_seconds()
-        if not quiz_state.state.reveal_answer and (rem is None or rem > 0):
+@router.post("/admin/start", dependencies=[Depends(verify_room_admin)])
+async def admin_start(room: Room = Depends(get_room)):
+    room.store.sync()
+    game = room.game
+    if game.state.current_question_index == -1 and game.quiz:
+        game.state.current_question_index = 0
+        begin_current_question(room)
+        if not await state_changed(room, "advance"):
+            return STATE_CONFLICT
+        await room.broadcasts.flush_now("state")
+    return {"status": "ok", "state": game.state}
+
+@router.post("/admin/next", dependencies=[Depends(verify_room_admin)])
+async def admin_next(room: Room = Depends(get_room)):
+    room.store.sync()
+    game = room.game
+    if game.participants and not all_participants_answered_current(room):
+        rem = compute_remaining_seconds(room)
+        if not game.state.reveal_answer and (rem is None or rem > 0):
             return {"status": "error", "message": "Not all participants answered yet"}
-    if quiz_state.state.current_question_index < len(quiz_state.QUIZ) - 1:
-        quiz_state.state.current_question_index += 1
-        quiz_state.state.reveal_answer = False
-        q = quiz_state.get_current_question()
-        if q:
-            quiz_state.state.question_time_limit = effective_time_limit(q) or None
-            quiz_state.state.question_started_at = datetime.now(timezone.utc).isoformat()
+    if game.state.current_question_index < len(game.quiz) - 1:
+        game.state.current_question_index += 1
+        begin_current_question(room)
     else:
-        quiz_state.state.is_finished = True
-        quiz_state.state.question_time_limit = None
-        quiz_state.state.question_started_at = None
-    save_state()
-    await broadcast_state()
-    return {"status": "ok", "state": quiz_state.state}
-
-@app.post("/admin/prev", dependencies=[Depends(verify_admin)])
-async def admin_prev():
-    if quiz_state.state.current_question_index > 0:
-        quiz_state.state.current_question_index -= 1
-        quiz_state.state.reveal_answer = False
-        q = quiz_state.get_current_question()
-        if q:
-            quiz_state.state.question_time_limit = effective_time_limit(q) or None
-            quiz_state.state.question_started_at = datetime.now(timezone.utc).isoformat()
-        save_state()
-    await broadcast_state()
-    return {"status": "ok", "state": quiz_state.state}
-
-@app.post("/admin/reveal", dependencies=[Depends(verify_admin)])
-async def admin_reveal():
-    await reveal_current_question(auto_reason="admin")
-    return {"status": "ok", "state": quiz_state.state}
-
-@app.post("/admin/extend", dependencies=[Depends(verify_admin)])
-async def admin_extend(extra_seconds: int = 10):
-    st = quiz_state.state
+        game.state.is_finished = True
+        game.state.question_time_limit = None
+        game.state.question_started_at = None
+    if not await state_changed(room, "advance"):
+        return STATE_CONFLICT
+    await room.broadcasts.flush_now("state")
+    return {"status": "ok", "state": game.state}
+
+@router.post("/admin/prev", dependencies=[Depends(verify_room_admin)])
+async def admin_prev(room: Room = Depends(get_room)):
+    room.store.sync()
+    game = room.game
+    if game.state.current_question_index > 0:
+        game.state.current_question_index -= 1
+        begin_current_question(room)
+        if not await state_changed(room, "advance"):
+            return STATE_CONFLICT
+    await room.broadcasts.flush_now("state")
+    return {"status": "ok", "state": game.state}
+
+@router.post("/admin/reveal", dependencies=[Depends(verify_room_admin)])
+async def admin_reveal(room: Room = Depends(get_room)):
+    await reveal_current_question(room, auto_reason="admin")
+    return {"status": "ok", "state": room.game.state}
+
+@router.post("/admin/extend", dependencies=[Depends(verify_room_admin)])
+async def admin_extend(extra_seconds: int = 10, room: Room = Depends(get_room)):
+    room.store.sync()
+    game = room.game
+    st = game.state
     if st.is_finished:
         return {"status": "error", "message": "Quiz finished"}
     if st.question_time_limit in (None, 0):
         return {"status": "error", "message": "No active timer"}
     st.question_time_limit += max(1, extra_seconds)
-    save_state()
-    await broadcast_state()
+    if game.question_deadline is not None:
+        game.question_deadline += max(1, extra_seconds)
+    if not await state_changed(room, "extend"):
+        return STATE_CONFLICT
+    await room.broadcasts.flush_now("state")
     return {"status": "ok", "new_time_limit": st.question_time_limit}
 
-@app.post("/admin/reset", dependencies=[Depends(verify_admin)])
-async def admin_reset():
+@router.post("/admin/reset", dependencies=[Depends(verify_room_admin)])
+async def admin_reset(room: Room = Depends(get_room)):
     """Reset the entire quiz game - clears all participants, answers, and quiz state"""
-    # Clear all participants
-    quiz_state.participants.clear()
-
-    # Clear all answers
-    quiz_state.answers.clear()
+    # Clear participants, answers and quiz progress
+    room.game.reset()
 
-    # Reset quiz state to initial state
-    quiz_state.state.current_question_index = -1
-    quiz_state.state.reveal_answer = False
-    quiz_state.state.is_finished = False
-    quiz_state.state.question_started_at = None
-    quiz_state.state.question_time_limit = None
-
-    # Save the cleared state
-    save_state()
+    # Persist the reset
+    room.game.bump_version()
+    await room.store.reset()
+    schedule_auto_reveal(room)
 
     # Broadcast the reset state to all connected clients
-    await broadcast_state()
+    await room.broadcasts.flush_now("state")
 
     return {"status": "ok", "message": "Quiz has been reset successfully"}
 
-@app.get("/admin/results", response_model=AdminResults, dependencies=[Depends(verify_admin)])
-async def admin_results():
-    return compute_results()
-
-@app.get("/admin/participants", response_model=ParticipantsStatusResponse, dependencies=[Depends(verify_admin)])
-async def admin_participants():
-    current_q = quiz_state.get_current_question()
-    participants: List[ParticipantStatus] = []
-    for pid, pdata in quiz_state.participants.items():
-        answered_current = False
-        if current_q:
-            answered_current = ((pid, current_q.id) in quiz_state.answers)
-        participants.append(
-            ParticipantStatus(
-                participant_id=pid,
-                name=pdata["name"],
-                answered_current=answered_current,
-            )
-        )
-    participants.sort(key=lambda p: p.name.lower())
-    return ParticipantsStatusResponse(participants=participants)
+@router.get("/admin/results", response_model=AdminResults, dependencies=[Depends(verify_room_admin)])
+async def admin_results(room: Room = Depends(get_room)):
+    return model_response(compute_results(room))
+
+@router.get("/admin/leaderboard", response_model=ScoreboardResponse, dependencies=[Depends(verify_room_admin)])
+async def admin_leaderboard(limit: int = 10, room: Room = Depends(get_room)):
+    """Live mid-quiz leaderboard (top `limit` entries) for the presenter."""
+    return model_response(compute_scoreboard(room, limit=max(0, limit)))
+
+@router.get("/admin/participants", response_model=ParticipantsStatusResponse, dependencies=[Depends(verify_room_admin)])
+async def admin_participants(since: Optional[int] = None, room: Room = Depends(get_room)):
+    """Participant roster; with ?since=<version> only participants changed after that version.
+
+    Admin sockets (/ws?admin_token=...) receive the same changes pushed as
+    {"type": "participants", ...} messages instead of polling this.
+    """
+    return model_response(participants_status(room, since))
+
+EXPORT_FORMATS = ("csv", "columns")
+
+@router.get("/admin/export", dependencies=[Depends(verify_room_admin)])
+async def admin_export(table: str = "questions", format: str = "csv", room: Room = Depends(get_room)):
+    """Post-game statistics of this room as CSV (streamed) or columnar JSON ({column: [values]}).
+
+    table=questions: answer distribution, correct rate and time-to-answer percentiles per
+    question; table=participants: answered, correct, streaks and mean time to answer;
+    table=answers: every answer with its correctness and latency_ms since the question started.
+    """
+    if table not in analytics.TABLES:
+        raise HTTPException(status_code=422, detail=f"table must be one of {', '.join(analytics.TABLES)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    data = analytics.session_table(room.game, table)
+    if format == "columns":
+        return data
+    return StreamingResponse(
+        analytics.iter_csv(data),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{room.code}-{table}.csv"'},
+    )
+
+@router.get("/admin/broadcast_stats", dependencies=[Depends(verify_room_admin)])
+async def admin_broadcast_stats(room: Room = Depends(get_room)):
+    manager = room.manager
+    return {
+        "connections": len(manager.active_connections),
+        **manager.stats,
+        "scheduler": room.broadcasts.stats,
+        "answers": room.answers.stats,
+    }
 
 # ---------------- WebSocket ----------------
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def handle_client_message(room: Room, websocket: WebSocket, protocol: str, variant: Optional[str], text: str):
     try:
-        await websocket.send_json({"type": "state", "payload": make_public_state().model_dump()})
+        message = json_codec.loads(text)
+    except ValueError:
+        return
+    if not isinstance(message, dict):
+        return
+    kind = message.get("type")
+    if kind == "ping":
+        room.manager.send(websocket, {"type": "pong"})
+    elif kind == "resync" and protocol == PROTOCOL_DELTA:
+        room.manager.send_text(websocket, snapshot_message(room, compute_remaining_seconds(room), variant))
+    elif kind == "answer":
+        # {"type": "answer", "id": <echoed in the ack>, participant_id, question_id, option_index}
+        try:
+            req = AnswerRequest.model_validate(message)
+        except ValidationError:
+            result = {"status": "error", "message": "Invalid answer"}
+        else:
+            try:
+                check_answer_rate(websocket, req.participant_id)
+            except RateLimited as e:
+                result = {"status": "error", "message": e.reason, "retry_after": math.ceil(e.retry_after)}
+            else:
+                result = await room.answers.submit(req)
+        room.manager.send(websocket, {"type": "answer_ack", "id": message.get("id"), **result})
+
+@router.websocket("/ws")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    protocol: str = PROTOCOL_FULL,
+    lang: Optional[str] = None,
+    participant_id: Optional[str] = None,
+    admin_token: Optional[str] = None,
+    heartbeat: bool = False,
+):
+    """State stream. Optional query parameters: `participant_id` ties the socket to a
+    participant for presence, `admin_token` also subscribes it to participant roster
+    pushes, `heartbeat=1` opts into {"type": "ping"} messages, which must be answered
+    ({"type": "pong"}) within WS_PING_TIMEOUT seconds."""
+    room = await rooms.get(path_room_code(websocket))
+    if room is None:
+        await websocket.close(code=4404)
+        return
+    if protocol != PROTOCOL_DELTA:
+        protocol = PROTOCOL_FULL
+    game = room.game
+    variant = game.quiz.variant(lang)
+    if participant_id is not None and participant_id not in game.participants:
+        # May have joined through another worker a moment ago
+        room.store.sync()
+    owner = participant_id if participant_id in game.participants else None
+    admin = is_room_admin(room, admin_token)
+    manager = room.manager
+    await manager.connect(websocket, group=(protocol, variant), owner=owner, admin=admin, heartbeat=heartbeat)
+    try:
+        remaining = compute_remaining_seconds(room)
+        if protocol == PROTOCOL_DELTA:
+            if len(manager.groups[(protocol, variant)]) == 1:
+                reset_delta_base(room, variant)
+            manager.send_text(websocket, snapshot_message(room, remaining, variant))
+        else:
+            manager.send_text(websocket, state_message(room, remaining, variant), coalesce="state")
+        if admin:
+            manager.send_text(websocket, participants_message(room, None))
+            if len(manager.admins) == 1:
+                room.roster_pushed = game.roster_version
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            manager.seen(websocket)
+            await handle_client_message(room, websocket, protocol, variant, text)
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also reached when the heartbeat dropped the socket; presence must not leak
         await manager.disconnect(websocket)
+        room.touch()
+
+# ---------------- Quiz content ----------------
+
+@app.post("/admin/reload_quiz", dependencies=[Depends(verify_admin)])
+async def admin_reload_quiz():
+    """Reload quiz_questions.json without a restart; participants and answers are kept."""
+    try:
+        result = await reload_quiz()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Quiz not reloaded: {e}")
+    return {"status": "ok", **result}
+
+# ---------------- Metrics ----------------
+
+def _room_totals(count) -> Dict[tuple, float]:
+    return {(): sum(count(room) for room in list(rooms.rooms.values()))}
+
+metrics.gauge("quiz_rooms_loaded", "Rooms held in memory", collect=lambda: {(): len(rooms.rooms)})
+metrics.gauge(
+    "quiz_websocket_connections", "Open WebSockets across loaded rooms",
+    collect=lambda: _room_totals(lambda room: len(room.manager.active_connections)),
+)
+metrics.gauge(
+    "quiz_participants_online", "Participants with an open WebSocket across loaded rooms",
+    collect=lambda: _room_totals(lambda room: len(room.manager.online)),
+)
+metrics.gauge(
+    "quiz_participants", "Joined participants across loaded rooms",
+    collect=lambda: _room_totals(lambda room: len(room.game.participants)),
+)
+metrics.gauge(
+    "quiz_answers", "Stored answers across loaded rooms",
+    collect=lambda: _room_totals(lambda room: sum(room.game.answered_counts.values())),
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint (disabled with METRICS_ENABLED=0)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# ---------------- Images ----------------
+
+@app.get("/assets/images/{name}")
+async def image_asset(name: str):
+    """Optimized question image; the name embeds a content hash, so it can be cached forever."""
+    path = images.PIPELINE.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, headers={"Cache-Control": images.IMMUTABLE_CACHE_CONTROL})
+
+# ---------------- Profiling ----------------
+
+PROFILE_FORMATS = ("collapsed", "speedscope", "events")
+
+@app.get("/admin/profile", dependencies=[Depends(verify_admin)])
+async def admin_profile(seconds: float = 10, format: str = "collapsed", interval_ms: float = 5, all_threads: bool = False):
+    """Sample the event loop thread (or every thread) for `seconds` and return the profile.
+
+    format=collapsed: folded stacks for flamegraph.pl / speedscope; format=speedscope:
+    speedscope JSON, including the answer/reveal/broadcast pipeline spans; format=events:
+    only those spans as JSON. Only one profile can be recorded at a time.
+    """
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    seconds = min(max(seconds, 0.1), profiler.PROFILE_MAX_SECONDS)
+    # This handler runs on the event loop thread
+    thread_ids = None if all_threads else {threading.get_ident()}
+    try:
+        profiler.start(max(interval_ms, 1) / 1000, thread_ids)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile = profiler.stop()
+    if format == "speedscope":
+        return profile.speedscope()
+    if format == "events":
+        return {"seconds": round(profile.stopped - profile.started, 3), "spans": profile.events()}
+    return PlainTextResponse(profile.collapsed())
+
+# ---------------- Rate limit stats ----------------
+
+@app.get("/admin/rate_limits", dependencies=[Depends(verify_admin)])
+async def admin_rate_limits():
+    """Admitted and rejected counts of the /join and answer limits (per process)."""
+    return rate_limit.stats()
+
+# ---------------- Room management ----------------
+
+@app.post("/admin/rooms", dependencies=[Depends(verify_admin)])
+async def admin_create_room():
+    """Open a new room; its endpoints live under /rooms/{code}.
+
+    The returned admin_token administers this room only (it is not stored and
+    can't be shown again); hand it to the room's host instead of ADMIN_TOKEN.
+    """
+    room, token = await rooms.create()
+    return {"status": "ok", "code": room.code, "admin_token": token}
+
+@app.get("/admin/rooms", dependencies=[Depends(verify_admin)])
+async def admin_list_rooms():
+    loaded = []
+    for room in rooms.rooms.values():
+        loaded.append({
+            "code": room.code,
+            "participants": len(room.game.participants),
+            "connections": len(room.manager.active_connections),
+            "current_question_index": room.game.state.current_question_index,
+            "is_finished": room.game.state.is_finished,
+        })
+    return {"rooms": rooms.codes(), "loaded": loaded, **rooms.stats}
+
+app.include_router(router)
+app.include_router(router, prefix="/rooms/{room_code}", dependencies=[Depends(room_code_path)])
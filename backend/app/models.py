@@ -34,11 +34,21 @@ class AnswerRequest(BaseModel):
     question_id: int
     option_index: int
 
+class ImageVariant(BaseModel):
+    url: str  # content-hashed, served with immutable cache headers
+    width: int  # pixels; 0 when unknown
+
+class ImageAsset(BaseModel):
+    src: str  # image URL as written in the quiz
+    variants: List[ImageVariant]  # narrowest first; the last one is the original
+
 class PublicState(BaseModel):
     state: QuizState
     question: Question | None
     final_image_url: Optional[str] = None  # existing field
     total_questions: int  # existing field
+    images: List[ImageAsset] = []  # optimized copies of the images on screen now
+    prefetch: List[ImageAsset] = []  # images the next question will show, to preload
     remaining_seconds: Optional[int] = None  # NEW: countdown value
 
 class AggregateResult(BaseModel):
@@ -55,14 +65,28 @@ class ScoreboardEntry(BaseModel):
     answered: int
     total_questions: int
     percentage: float
+    points: int = 0  # equals `correct` in the "correct" scoring mode
+    rank: int = 0  # 1-based; equal points share a rank
 
 class ScoreboardResponse(BaseModel):
     entries: List[ScoreboardEntry]
+    scoring_mode: str = "correct"
+
+class RankResponse(BaseModel):
+    participant_id: str
+    rank: int
+    participants: int
+    points: int
+    correct: int
 
 class ParticipantStatus(BaseModel):
     participant_id: str
     name: str
     answered_current: bool
+    online: bool = False  # has an open WebSocket on this server
 
 class ParticipantsStatusResponse(BaseModel):
     participants: List[ParticipantStatus]
+    version: int = 0  # pass back as ?since= to receive only changed participants
+    full: bool = True  # False when `participants` only holds changes since the requested version
+    online: int = 0  # participants with an open WebSocket on this server
@@ -1,50 +1,377 @@
-import json
+import os
+import threading
+import time
+from array import array
 from pathlib import Path
-from typing import Dict, Tuple
-from . import state as quiz_state
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+from . import json_codec
+from .metrics import PERSIST_BYTES, PERSIST_SECONDS
+from .state import NO_ANSWER, NO_LATENCY, GameState
 
-STATE_FILE = Path(__file__).resolve().parent.parent / "quiz_state.json"
+STATE_FILE = Path(os.getenv("QUIZ_STATE_FILE", Path(__file__).resolve().parent.parent / "quiz_state.json"))
+# Fold the journal into a fresh snapshot after this many events (0 disables periodic compaction)
+COMPACT_EVERY = int(os.getenv("JOURNAL_COMPACT_EVERY", "1000"))
 
-def save_state():
-    try:
-        data = {
-            "participants": quiz_state.participants,
-            "answers": [
-                {"participant_id": pid, "question_id": qid, "option_index": opt}
-                for (pid, qid), opt in quiz_state.answers.items()
-            ],
-            "quiz_state": quiz_state.state.model_dump(),
+
+class Snapshot:
+    """A copy of a game's persistent state, taken on the event loop and encoded by the writer."""
+
+    __slots__ = ("seq", "participants", "participant_ids", "answer_rows", "answer_latency", "quiz_state")
+
+    def __init__(self, seq: int, game: GameState):
+        self.seq = seq
+        self.participants = dict(game.participants)
+        self.participant_ids = list(game.participant_ids)
+        self.answer_rows: Dict[int, array] = {qid: row[:] for qid, row in game.answer_rows.items()}
+        self.answer_latency: Dict[int, array] = {qid: row[:] for qid, row in game.answer_latency.items()}
+        self.quiz_state = game.state.model_dump()
+
+    def data(self) -> Dict[str, Any]:
+        ids = self.participant_ids
+        answers = {
+            str(qid): {ids[idx]: opt for idx, opt in enumerate(row) if opt != NO_ANSWER}
+            for qid, row in self.answer_rows.items()
+        }
+        latency = {
+            str(qid): {ids[idx]: ms for idx, ms in enumerate(row) if ms != NO_LATENCY}
+            for qid, row in self.answer_latency.items()
         }
-        STATE_FILE.write_text(json.dumps(data, indent=2), encoding="utf-8")
-    except Exception as e:
-        # Non-fatal
-        print(f"[persistence] save failed: {e}")
+        return {
+            "seq": self.seq,
+            "participants": self.participants,
+            "answers": answers,
+            "latency": latency,
+            "quiz_state": self.quiz_state,
+        }
+
+    def encode(self) -> bytes:
+        return json_codec.dumps(self.data())
+
 
-def load_state():
-    if not STATE_FILE.exists():
+def _fsync_dir(path: Path):
+    if os.name == "nt":
         return
+    fd = os.open(path, os.O_RDONLY)
     try:
-        raw = json.loads(STATE_FILE.read_text(encoding="utf-8"))
-        # Restore participants
-        if isinstance(raw.get("participants"), dict):
-            quiz_state.participants.clear()
-            quiz_state.participants.update(raw["participants"])  # type: ignore
-        # Restore answers
-        quiz_state.answers.clear()
-        for entry in raw.get("answers", []):
-            try:
-                pid = entry["participant_id"]
-                qid = entry["question_id"]
-                opt = entry["option_index"]
-                quiz_state.answers[(pid, qid)] = opt
-            except Exception:
-                continue
-        # Restore quiz state (only safe fields)
-        qs = raw.get("quiz_state", {})
-        for k in ["current_question_index", "reveal_answer", "is_finished", "question_started_at", "question_time_limit"]:
-            if k in qs:
-                setattr(quiz_state.state, k, qs[k])
-        print("[persistence] state loaded")
-    except Exception as e:
-        print(f"[persistence] load failed: {e}")
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class PersistenceWriter:
+    """Background thread doing every journal and snapshot write, so handlers never wait on disk.
+
+    Journals queue their work and call notify(); everything a journal queued
+    while the thread was busy is written in one go.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._dirty: Dict["Journal", None] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def notify(self, journal: "Journal"):
+        with self._cond:
+            self._dirty[journal] = None
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="persistence-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        """Write everything queued, then end the thread (blocking)."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopping:
+                    self._cond.wait()
+                if not self._dirty:
+                    self._thread = None
+                    return
+                journals = list(self._dirty)
+                self._dirty.clear()
+            for journal in journals:
+                journal.write_pending()
+
+
+WRITER = PersistenceWriter()
+
+
+class Journal:
+    """Snapshot file plus append-only event journal for one game.
+
+    The journal (state_file with a .journal suffix) holds events written since
+    the snapshot; both are replayed into `game` by load_state at startup.
+    Events and snapshots are captured on the event loop and written by the
+    PersistenceWriter thread; flush() writes whatever is still queued.
+    """
 
+    def __init__(
+        self,
+        game: GameState,
+        state_file: Path = STATE_FILE,
+        compact_every: int = COMPACT_EVERY,
+        writer: PersistenceWriter = WRITER,
+    ):
+        self.game = game
+        self.state_file = Path(state_file)
+        self.journal_file = self.state_file.with_suffix(".journal")
+        self.compact_every = compact_every
+        self.writer = writer
+        self._journal: Optional[TextIO] = None
+        self._seq = 0  # sequence number of the last event written
+        self._events_since_snapshot = 0
+        # Bytes of the journal made of complete lines, as found by the last replay
+        self._journal_intact = 0
+        # Work queued for the writer: journal lines as (seq, line) and the latest snapshot
+        self._pending_lock = threading.Lock()
+        self._pending_lines: List[Tuple[int, str]] = []
+        self._pending_snapshot: Optional[Snapshot] = None
+        # Held while writing files (by the writer thread or flush())
+        self._write_lock = threading.Lock()
+
+    def _open_journal(self) -> TextIO:
+        if self._journal is None:
+            self._journal = self.journal_file.open("a", encoding="utf-8")
+        return self._journal
+
+    def close_journal(self):
+        with self._write_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def append_event(self, kind: str, **data: Any):
+        """Queue one event for the journal. O(1) regardless of how much state exists."""
+        self.append_events([(kind, data)])
+
+    def append_events(self, events: List[Tuple[str, Dict[str, Any]]]):
+        """Queue events to be appended with a single write and flush.
+
+        Callers may journal a change before applying it to the game state, so
+        compaction happens before appending: the snapshot never claims an
+        unapplied event.
+        """
+        if self.compact_every and self._events_since_snapshot >= self.compact_every:
+            self.request_snapshot()
+        lines = []
+        for kind, data in events:
+            self._seq += 1
+            lines.append((self._seq, json_codec.dumps_str({"seq": self._seq, "kind": kind, **data}) + "\n"))
+        with self._pending_lock:
+            self._pending_lines.extend(lines)
+        self._events_since_snapshot += len(events)
+        self.writer.notify(self)
+
+    def record_join(self, participant_id: str, name: str):
+        self.append_event("join", participant_id=participant_id, name=name)
+
+    def record_answers(self, answers: List[Tuple[str, int, int, Optional[int]]]):
+        self.append_events([
+            ("answer", {"participant_id": pid, "question_id": qid, "option_index": opt, "latency_ms": ms})
+            for pid, qid, opt, ms in answers
+        ])
+
+    def record_state(self, kind: str):
+        """Journal a quiz state transition (advance, reveal, extend)."""
+        self.append_event(kind, quiz_state=self.game.state.model_dump())
+
+    def record_reset(self):
+        self.append_event("reset")
+
+    def request_snapshot(self):
+        """Capture the full state now (on the event loop) and queue it; a newer request replaces
+        a snapshot the writer hasn't written yet."""
+        snapshot = Snapshot(self._seq, self.game)
+        with self._pending_lock:
+            self._pending_snapshot = snapshot
+        self._events_since_snapshot = 0
+        self.writer.notify(self)
+
+    def save_state(self):
+        """Write a compacted snapshot of the full state now and truncate the journal."""
+        self.request_snapshot()
+        self.flush()
+
+    def flush(self):
+        """Write everything queued so far, in the calling thread."""
+        self.write_pending()
+
+    def write_pending(self):
+        with self._write_lock:
+            with self._pending_lock:
+                snapshot, self._pending_snapshot = self._pending_snapshot, None
+                lines, self._pending_lines = self._pending_lines, []
+            if snapshot is not None and self._write_snapshot(snapshot):
+                # Those events are part of the snapshot now
+                lines = [line for line in lines if line[0] > snapshot.seq]
+            if lines:
+                self._write_lines(lines)
+
+    def _write_lines(self, lines: List[Tuple[int, str]]):
+        text = "".join(line for _, line in lines)
+        started = time.perf_counter()
+        try:
+            journal = self._open_journal()
+            journal.write(text)
+            journal.flush()
+        except Exception as e:
+            # Non-fatal
+            print(f"[persistence] journal append failed: {e}")
+            return
+        PERSIST_SECONDS.observe(time.perf_counter() - started, "journal")
+        PERSIST_BYTES.observe(len(text), "journal")
+
+    def _write_snapshot(self, snapshot: Snapshot) -> bool:
+        """Atomically replace the snapshot file (temp file + fsync + rename), then truncate the journal."""
+        started = time.perf_counter()
+        try:
+            data = snapshot.encode()
+            tmp_file = self.state_file.with_suffix(".tmp")
+            with tmp_file.open("wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.state_file)
+            _fsync_dir(self.state_file.parent)
+            # Every journaled event up to snapshot.seq is now part of the snapshot; later ones
+            # are still queued and are appended after this.
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self.journal_file.write_text("", encoding="utf-8")
+        except Exception as e:
+            # Non-fatal
+            print(f"[persistence] save failed: {e}")
+            return False
+        PERSIST_SECONDS.observe(time.perf_counter() - started, "snapshot")
+        PERSIST_BYTES.observe(len(data), "snapshot")
+        return True
+
+    def _apply_event(self, entry: Dict[str, Any]):
+        game = self.game
+        kind = entry["kind"]
+        if kind == "join":
+            game.participants[entry["participant_id"]] = {"name": entry["name"]}
+        elif kind == "answer":
+            game.set_answer(entry["participant_id"], entry["question_id"], entry["option_index"], entry.get("latency_ms"))
+        elif kind == "reset":
+            game.participants.clear()
+            game.clear_answers()
+            game.apply_quiz_state(
+                {"current_question_index": -1, "reveal_answer": False, "is_finished": False,
+                 "question_started_at": None, "question_time_limit": None}
+            )
+        elif "quiz_state" in entry:
+            game.apply_quiz_state(entry["quiz_state"])
+
+    def _replay_journal(self, after_seq: int) -> int:
+        last_seq = after_seq
+        self._journal_intact = 0
+        if not self.journal_file.exists():
+            return last_seq
+        replayed = 0
+        garbled = 0
+        with self.journal_file.open("rb") as f:
+            for line in f:
+                try:
+                    entry = json_codec.loads(line)
+                except ValueError:
+                    if not line.endswith(b"\n"):
+                        # Torn final line from a crash mid-append
+                        break
+                    # A torn line that later appends ran into; the events after it still count
+                    self._journal_intact += len(line)
+                    garbled += 1
+                    continue
+                self._journal_intact += len(line)
+                seq = entry.get("seq", 0)
+                if seq <= after_seq:
+                    continue
+                try:
+                    self._apply_event(entry)
+                except Exception:
+                    continue
+                last_seq = seq
+                replayed += 1
+        if replayed:
+            print(f"[persistence] replayed {replayed} journal events from {self.journal_file.name}")
+        if garbled:
+            print(f"[persistence] skipped {garbled} unreadable journal lines in {self.journal_file.name}")
+        return last_seq
+
+    def _repair_journal(self):
+        """Cut a torn final line off the journal and end it with a newline, so new events
+        are appended on lines of their own instead of running into the fragment."""
+        if not self.journal_file.exists():
+            return
+        intact = self._journal_intact
+        with self.journal_file.open("r+b") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > intact:
+                print(f"[persistence] dropped a torn line of {f.tell() - intact} bytes from {self.journal_file.name}")
+                f.truncate(intact)
+            if intact:
+                # A last event complete but for its newline was replayed; terminate it
+                f.seek(intact - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_state(self, compact: bool = True):
+        """Load the snapshot and replay the journal; compact=False leaves the files untouched (read-only use)."""
+        game = self.game
+        snapshot_seq = 0
+        snapshot_ok = True
+        if self.state_file.exists():
+            try:
+                raw = json_codec.loads(self.state_file.read_bytes())
+                snapshot_seq = int(raw.get("seq", 0))
+                # Restore participants
+                if isinstance(raw.get("participants"), dict):
+                    game.participants.clear()
+                    game.participants.update(raw["participants"])  # type: ignore
+                # Restore answers: {"<question_id>": {participant_id: option_index}}, or a
+                # list of {participant_id, question_id, option_index} in older snapshots
+                game.clear_answers()
+                answers = raw.get("answers", [])
+                if isinstance(answers, dict):
+                    for qid, by_pid in answers.items():
+                        game.set_answers(int(qid), {pid: opt for pid, opt in by_pid.items() if isinstance(opt, int)})
+                else:
+                    for entry in answers:
+                        pid, qid, opt = entry.get("participant_id"), entry.get("question_id"), entry.get("option_index")
+                        if isinstance(pid, str) and isinstance(qid, int) and isinstance(opt, int):
+                            game.set_answer(pid, qid, opt)
+                # {"<question_id>": {participant_id: milliseconds}}; absent in older snapshots
+                for qid, by_pid in (raw.get("latency") or {}).items():
+                    game.set_latencies(int(qid), {pid: ms for pid, ms in by_pid.items() if isinstance(ms, int)})
+                game.apply_quiz_state(raw.get("quiz_state", {}))
+                print(f"[persistence] state loaded from {self.state_file.name}")
+            except Exception as e:
+                snapshot_ok = False
+                print(f"[persistence] load failed: {e}")
+        try:
+            self._seq = self._replay_journal(snapshot_seq)
+        except Exception as e:
+            print(f"[persistence] journal replay failed: {e}")
+            self._seq = snapshot_seq
+        if compact:
+            try:
+                self._repair_journal()
+            except OSError as e:
+                print(f"[persistence] journal repair failed: {e}")
+        # Start the session from a clean snapshot so the journal only holds new events.
+        # A snapshot that failed to load is left untouched for manual recovery.
+        if snapshot_ok and compact:
+            self.request_snapshot()
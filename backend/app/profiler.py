@@ -0,0 +1,201 @@
+from pathlib import Path
+from types import CodeType
+from typing import Any, Dict, List, Optional, Set, Tuple
+import os
+import sys
+import threading
+import time
+
+# Longest profile one /admin/profile request may record
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Pipeline spans kept per profile; later ones are dropped
+MAX_SPANS = 100_000
+
+Span = Tuple[str, str, float, float]  # (name, room, start, end) in perf_counter seconds
+
+
+def _frame_name(code: CodeType) -> str:
+    path = Path(code.co_filename)
+    return f"{code.co_name} ({'/'.join(path.parts[-2:])}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of some threads every `interval` seconds from a background thread.
+
+    Meant to be switched on for a few seconds on a live server: sampling
+    walks frames without tracing every call, so the overhead is one stack
+    walk per interval. While it runs, record_span() also collects timings
+    of pipeline events (answer batches, reveals, broadcasts).
+    """
+
+    def __init__(self, interval: float, thread_ids: Optional[Set[int]] = None):
+        self.interval = interval
+        # None samples every thread except the sampler itself
+        self.thread_ids = thread_ids
+        self.codes: Dict[CodeType, int] = {}
+        self.stacks: Dict[Tuple[int, ...], int] = {}
+        # One (stack index, thread name) per sample, in order, for time-ordered views
+        self.samples: List[Tuple[int, str]] = []
+        self.spans: List[Span] = []
+        self.started = 0.0
+        self.stopped = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.stopped = time.perf_counter()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    index = self.codes.get(code)
+                    if index is None:
+                        index = self.codes[code] = len(self.codes)
+                    stack.append(index)
+                    frame = frame.f_back
+                stack.reverse()
+                key = tuple(stack)
+                stack_index = self.stacks.get(key)
+                if stack_index is None:
+                    stack_index = self.stacks[key] = len(self.stacks)
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self.samples.append((stack_index, names.get(ident, str(ident))))
+
+    def record_span(self, name: str, room: str, start: float, end: float):
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((name, room, start, end))
+
+    # ---------------- Output formats ----------------
+
+    def _frame_names(self) -> List[str]:
+        names = [""] * len(self.codes)
+        for code, index in self.codes.items():
+            names[index] = _frame_name(code)
+        return names
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stacks ("root;...;leaf count" per line), for flamegraph.pl,
+        speedscope or inferno."""
+        frame_names = self._frame_names()
+        stacks = list(self.stacks)
+        counts: Dict[str, int] = {}
+        multi_thread = self.thread_ids is None or len(self.thread_ids) > 1
+        for stack_index, thread in self.samples:
+            line = ";".join(frame_names[i] for i in stacks[stack_index])
+            if multi_thread:
+                line = f"{thread};{line}"
+            counts[line] = counts.get(line, 0) + 1
+        return "".join(f"{line} {count}\n" for line, count in sorted(counts.items()))
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Pipeline spans with times in milliseconds since the profile started."""
+        return [
+            {
+                "name": name,
+                "room": room,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+            }
+            for name, room, start, end in self.spans
+        ]
+
+    def speedscope(self) -> Dict[str, Any]:
+        """https://www.speedscope.app file: one sampled profile per thread, plus one evented
+        profile per pipeline span kind and room (spans of one kind and room never overlap)."""
+        frames: List[Dict[str, Any]] = [
+            {"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno}
+            for code in sorted(self.codes, key=self.codes.__getitem__)
+        ]
+        duration = self.stopped - self.started
+        stacks = list(self.stacks)
+        by_thread: Dict[str, List[int]] = {}
+        for stack_index, thread in self.samples:
+            by_thread.setdefault(thread, []).append(stack_index)
+        profiles: List[Dict[str, Any]] = [
+            {
+                "type": "sampled",
+                "name": f"{thread} (every {self.interval * 1000:g} ms)",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": duration,
+                "samples": [list(stacks[i]) for i in indices],
+                "weights": [self.interval] * len(indices),
+            }
+            for thread, indices in by_thread.items()
+        ]
+        spans_by_kind: Dict[Tuple[str, str], List[Span]] = {}
+        for span in self.spans:
+            spans_by_kind.setdefault((span[0], span[1]), []).append(span)
+        for (name, room), spans in sorted(spans_by_kind.items()):
+            frame = len(frames)
+            frames.append({"name": name})
+            events = []
+            for _, _, start, end in sorted(spans, key=lambda s: s[2]):
+                events.append({"type": "O", "frame": frame, "at": start - self.started})
+                events.append({"type": "C", "frame": frame, "at": end - self.started})
+            profiles.append(
+                {
+                    "type": "evented",
+                    "name": f"{name} [{room}]" if room else name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": duration,
+                    "events": events,
+                }
+            )
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": "quiz-game profile",
+            "exporter": "quiz-game",
+        }
+
+
+# The profile being recorded, if any
+current: Optional[SamplingProfiler] = None
+_lock = threading.Lock()
+
+
+def start(interval: float, thread_ids: Optional[Set[int]] = None) -> SamplingProfiler:
+    """Start recording; raises RuntimeError if a profile is already being recorded."""
+    global current
+    with _lock:
+        if current is not None:
+            raise RuntimeError("A profile is already being recorded")
+        current = SamplingProfiler(interval, thread_ids)
+        current.start()
+        return current
+
+
+def stop() -> Optional[SamplingProfiler]:
+    global current
+    with _lock:
+        profile, current = current, None
+    if profile is not None:
+        profile.stop()
+    return profile
+
+
+def record_span(name: str, room: str, start: float, end: Optional[float] = None):
+    """Record a pipeline event lasting from `start` to `end` (perf_counter); free when not profiling."""
+    profile = current
+    if profile is not None:
+        profile.record_span(name, room, start, time.perf_counter() if end is None else end)
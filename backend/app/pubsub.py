@@ -0,0 +1,118 @@
+from typing import Callable, Dict, Optional, Set
+import asyncio
+import os
+
+from . import json_codec
+
+
+class UnixSocketBroker:
+    """Cross-process pub/sub over a Unix socket, for workers on one host.
+
+    Every worker connects as a client; whichever worker holds the lock file
+    also runs the hub that relays each published line to every other client.
+    If the hub's process exits, the remaining workers reconnect and one of
+    them takes over. Messages are doorbells only: delivery during a failover
+    is not guaranteed, so subscribers must be able to catch up from the
+    durable store (on_reconnect is called after every (re)connect).
+    """
+
+    def __init__(self, path: str, on_message: Callable[[Dict], None], on_reconnect: Callable[[], None]):
+        self.path = path
+        self.on_message = on_message
+        self.on_reconnect = on_reconnect
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._hub: Optional[asyncio.AbstractServer] = None
+        self._hub_clients: Set[asyncio.StreamWriter] = set()
+        self._hub_handlers: Set[asyncio.Task] = set()
+        self._lock_fd: Optional[int] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Close every socket so the hub's handlers see EOF and finish before the loop goes away
+        writers = list(self._hub_clients)
+        if self._writer is not None:
+            writers.append(self._writer)
+            self._writer = None
+        if self._hub:
+            self._hub.close()
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        if self._hub_handlers:
+            await asyncio.gather(*self._hub_handlers, return_exceptions=True)
+        if self._hub:
+            await self._hub.wait_closed()
+            self._hub = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def publish(self, message: Dict):
+        if self._writer is not None:
+            self._writer.write(json_codec.dumps(message) + b"\n")
+
+    def _try_become_hub(self) -> bool:
+        import fcntl
+
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    async def _ensure_hub(self):
+        if self._hub is not None or not self._try_become_hub():
+            return
+        # Holding the lock: any socket file left behind belongs to a dead hub
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._hub = await asyncio.start_unix_server(self._serve_client, path=self.path)
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        handler = asyncio.current_task()
+        self._hub_handlers.add(handler)
+        self._hub_clients.add(writer)
+        try:
+            while line := await reader.readline():
+                for other in list(self._hub_clients):
+                    if other is not writer:
+                        other.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Cancelled only when the loop shuts down; nothing is waiting on this handler
+            pass
+        finally:
+            self._hub_clients.discard(writer)
+            self._hub_handlers.discard(handler)
+            writer.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await self._ensure_hub()
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                self.on_reconnect()
+                while line := await reader.readline():
+                    try:
+                        self.on_message(json_codec.loads(line))
+                    except Exception as e:
+                        print(f"[pubsub] message handling failed: {e}")
+            except Exception as e:
+                print(f"[pubsub] broker connection failed: {e}")
+            self._writer = None
+            await asyncio.sleep(0.5)
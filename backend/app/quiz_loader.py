@@ -1,21 +1,219 @@
+import hashlib
 import json
+import os
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import Iterator, List, Optional, Tuple, Dict, Any
 
-from .models import Question
+from .models import ImageAsset, Question
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+QUIZ_FILE = BASE_DIR / "quiz_questions.json"
 
+# Time limit of questions without their own or a quiz default_time_limit_seconds (0: no limit)
+DEFAULT_TIME_LIMIT = int(os.getenv("DEFAULT_TIME_LIMIT", "30"))
 
-def load_quiz() -> Tuple[List[Question], Dict[str, Any]]:
-    questions_file = BASE_DIR / "quiz_questions.json"
-    with questions_file.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+# Payload variant for clients that declared a language the quiz has no translations for
+UNTRANSLATED = ""
+
+
+def redact_question(q: Question) -> Question:
+    """The question as shown before the reveal: no correct answer, no reveal image."""
+    return q.model_copy(update={"correct_index": None, "reveal_image_url": None})
+
+
+def localize_question(q: Question, lang: str) -> Question:
+    """The question in one language, with the other translations dropped.
+
+    Falls back to the original text when `lang` has no translation for it
+    (same rules as localizeQuestion in the frontend).
+    """
+    translation = (q.translations or {}).get(lang)
+    if translation is None:
+        return q.model_copy(update={"translations": None})
+    return q.model_copy(
+        update={
+            "text": translation.text or q.text,
+            "options": translation.options or q.options,
+            "image_url": translation.image_url or q.image_url,
+            "translations": None,
+        }
+    )
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class CompiledQuestion:
+    """One question with its redacted copy and serialized payloads."""
+
+    __slots__ = ("question", "redacted", "content_hash", "payloads", "image_urls")
+
+    def __init__(self, question: Question, question_hash: str):
+        self.question = question
+        self.redacted = redact_question(question)
+        # Hash of the question's source JSON; equal hashes mean the compiled form can be reused
+        self.content_hash = question_hash
+        # variant -> (question phase payload, reveal phase payload). Languages this
+        # question has no translation for use the UNTRANSLATED payloads.
+        self.payloads: Dict[Optional[str], Tuple[bytes, bytes]] = {
+            None: (self.redacted.model_dump_json().encode(), question.model_dump_json().encode())
+        }
+        # variant -> (images shown while the question is open, images shown after the reveal)
+        self.image_urls: Dict[Optional[str], Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+            # Clients without a language pick among the original and translated images themselves
+            None: self._image_urls(
+                question, [question.image_url, *(t.image_url for t in (question.translations or {}).values())]
+            )
+        }
+        for lang in (UNTRANSLATED, *(question.translations or {})):
+            localized = localize_question(question, lang)
+            self.payloads[lang] = (
+                redact_question(localized).model_dump_json().encode(),
+                localized.model_dump_json().encode(),
+            )
+            self.image_urls[lang] = self._image_urls(question, [localized.image_url])
+
+    @staticmethod
+    def _image_urls(question: Question, shown: List[Optional[str]]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        open_urls = tuple(dict.fromkeys(url for url in shown if url))
+        revealed = open_urls + ((question.reveal_image_url,) if question.reveal_image_url else ())
+        return open_urls, tuple(dict.fromkeys(revealed))
+
+
+class CompiledQuiz:
+    """Read-only quiz content, indexed and pre-serialized once at load time.
+
+    Behaves as a sequence of Question. question_payload() returns the JSON of
+    a question as clients see it, for each phase (question / reveal) and each
+    payload variant: None (original text with all translations, for clients
+    that declared no language), a language found in `translations`, or
+    UNTRANSLATED (original text, no translations).
+    """
+
+    def __init__(self, compiled: List[CompiledQuestion], meta: Dict[str, Any], file_hash: str = ""):
+        self.compiled: Tuple[CompiledQuestion, ...] = tuple(compiled)
+        self.questions: Tuple[Question, ...] = tuple(cq.question for cq in self.compiled)
+        self.meta: Dict[str, Any] = meta
+        # Hash of the whole source file; an unchanged file is not parsed again
+        self.content_hash = file_hash
+        self.index_by_id: Dict[int, int] = {q.id: i for i, q in enumerate(self.questions)}
+        if len(self.index_by_id) != len(self.questions):
+            raise ValueError("Question ids must be unique")
+        self.scored_question_count = sum(1 for q in self.questions if q.correct_index is not None)
+        self.languages: Tuple[str, ...] = tuple(sorted({lang for q in self.questions for lang in (q.translations or {})}))
+        # Redacted copies served while a question is open
+        self.redacted: Tuple[Question, ...] = tuple(cq.redacted for cq in self.compiled)
+        # image URL -> optimized copies (see images.py); set by set_assets once they are built
+        self.assets: Dict[str, ImageAsset] = {}
+        self._manifests: Dict[Tuple[int, bool, bool, Optional[str]], Tuple[List[ImageAsset], List[ImageAsset], bytes]] = {}
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __iter__(self) -> Iterator[Question]:
+        return iter(self.questions)
+
+    def __getitem__(self, index: int) -> Question:
+        return self.questions[index]
+
+    def question_by_id(self, question_id: int) -> Optional[Question]:
+        index = self.index_by_id.get(question_id)
+        return None if index is None else self.questions[index]
+
+    def time_limit(self, q: Question) -> int:
+        """Configured time limit of a question in seconds (0: no limit)."""
+        if q.time_limit_seconds is not None:
+            return q.time_limit_seconds
+        raw_val = self.meta.get("default_time_limit_seconds")
+        if raw_val is not None:
+            try:
+                return int(str(raw_val))
+            except Exception:
+                return 0
+        return DEFAULT_TIME_LIMIT
+
+    def variant(self, lang: Optional[str]) -> Optional[str]:
+        """Payload variant for a client-declared language (bounded by the quiz's languages)."""
+        if not lang:
+            return None
+        return lang if lang in self.languages else UNTRANSLATED
+
+    def question_payload(self, index: int, reveal: bool, variant: Optional[str] = None) -> bytes:
+        """Serialized question at `index` in a variant returned by variant()."""
+        payloads = self.compiled[index].payloads
+        return payloads.get(variant, payloads[UNTRANSLATED])[1 if reveal else 0]
+
+    def image_urls(self) -> List[str]:
+        """Every image URL the quiz may show."""
+        urls = [url for cq in self.compiled for phases in cq.image_urls.values() for url in phases[1]]
+        final = self.meta.get("final_image_url")
+        return urls + ([final] if final else [])
+
+    def _phase_urls(self, index: int, reveal: bool, variant: Optional[str]) -> Tuple[str, ...]:
+        if not 0 <= index < len(self.compiled):
+            final = self.meta.get("final_image_url")
+            return (final,) if final and index == len(self.compiled) else ()
+        urls = self.compiled[index].image_urls
+        return urls.get(variant, urls[UNTRANSLATED])[1 if reveal else 0]
+
+    def image_manifest(
+        self, index: int, reveal: bool, finished: bool, variant: Optional[str] = None
+    ) -> Tuple[List[ImageAsset], List[ImageAsset], bytes]:
+        """(images on screen, images to prefetch, their `,"images":[...],"prefetch":[...]` JSON)
+        for a quiz position. The next question's reveal image is never prefetched: it
+        gives the answer away."""
+        key = (index, reveal, finished, variant)
+        manifest = self._manifests.get(key)
+        if manifest is None:
+            if finished:
+                shown, upcoming = self._phase_urls(len(self.compiled), False, variant), ()
+            else:
+                shown, upcoming = self._phase_urls(index, reveal, variant), self._phase_urls(index + 1, False, variant)
+            on_screen = [self.assets[url] for url in shown if url in self.assets]
+            prefetch = [self.assets[url] for url in upcoming if url in self.assets and url not in shown]
+            encoded = (
+                b',"images":[' + b",".join(a.model_dump_json().encode() for a in on_screen)
+                + b'],"prefetch":[' + b",".join(a.model_dump_json().encode() for a in prefetch) + b"]"
+            )
+            manifest = self._manifests[key] = (on_screen, prefetch, encoded)
+        return manifest
+
+    def set_assets(self, assets: Dict[str, ImageAsset]):
+        self.assets = assets
+        self._manifests.clear()
+
+    def same_question(self, index: int, other: "CompiledQuiz") -> bool:
+        """Whether question `index` has identical content in `other`."""
+        return index < len(other) and self.compiled[index].content_hash == other.compiled[index].content_hash
+
+
+def load_quiz(path: Path = QUIZ_FILE, previous: Optional[CompiledQuiz] = None) -> CompiledQuiz:
+    """Read, validate and compile the quiz file.
+
+    With `previous`, an unchanged file returns `previous` without parsing, and
+    questions whose source is unchanged reuse their compiled form. Raises
+    ValueError (including pydantic's ValidationError) for invalid content.
+    """
+    raw = path.read_bytes()
+    file_hash = content_hash(raw)
+    if previous is not None and previous.content_hash == file_hash:
+        return previous
+    data = json.loads(raw)
     meta: Dict[str, Any] = {}
     questions_raw = data
     # Allow either a list directly or an object {"questions": [...], ...}
     if isinstance(data, dict):
         meta = {k: v for k, v in data.items() if k != "questions"}
         questions_raw = data.get("questions", [])
-    questions = [Question(**q) for q in questions_raw]
-    return questions, meta
+    if not isinstance(questions_raw, list):
+        raise ValueError("Quiz questions must be a list")
+    reusable = {cq.content_hash: cq for cq in previous.compiled} if previous is not None else {}
+    compiled = []
+    for q in questions_raw:
+        question_hash = content_hash(json.dumps(q, sort_keys=True, ensure_ascii=False).encode())
+        cq = reusable.get(question_hash)
+        if cq is None:
+            cq = CompiledQuestion(Question.model_validate(q), question_hash)
+        compiled.append(cq)
+    return CompiledQuiz(compiled, meta, file_hash)
@@ -0,0 +1,181 @@
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+import asyncio
+import os
+import random
+import time
+
+from .metrics import counter, gauge
+
+# Set to 0 to disable the per-client limits and the /join admission cap
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# Token buckets: sustained requests per second and burst size, per client IP for
+# /join (a venue's phones may share one NAT address, hence the roomy defaults)
+# and per client IP and participant for answers
+JOIN_RATE_PER_SECOND = float(os.getenv("JOIN_RATE_PER_SECOND", "10"))
+JOIN_BURST = float(os.getenv("JOIN_BURST", "50"))
+ANSWER_RATE_PER_SECOND = float(os.getenv("ANSWER_RATE_PER_SECOND", "1"))
+ANSWER_BURST = float(os.getenv("ANSWER_BURST", "5"))
+# /join requests handled at once, how many more may wait for a slot and for how
+# long; beyond that they are turned away with 429
+JOIN_MAX_CONCURRENT = int(os.getenv("JOIN_MAX_CONCURRENT", "32"))
+JOIN_MAX_WAITING = int(os.getenv("JOIN_MAX_WAITING", "256"))
+JOIN_QUEUE_TIMEOUT = float(os.getenv("JOIN_QUEUE_TIMEOUT", "2"))
+# Retry-After for requests turned away by the admission cap is spread over
+# 1..JOIN_RETRY_AFTER_MAX seconds so rejected clients don't all return at once
+JOIN_RETRY_AFTER_MAX = int(os.getenv("JOIN_RETRY_AFTER_MAX", "5"))
+# Buckets are pruned (full ones dropped) every this many checks
+PRUNE_EVERY = 1024
+
+RATE_LIMIT_TOTAL = counter(
+    "quiz_rate_limit_total", "Requests checked against per-client limits by endpoint and outcome", ("endpoint", "result")
+)
+ADMISSION_TOTAL = counter(
+    "quiz_admission_total", "Requests through an admission cap by endpoint and outcome", ("endpoint", "result")
+)
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucketLimiter:
+    """Token bucket per key: `burst` requests at once, refilled at `rate` per second.
+
+    A bucket is two floats updated on each check, so there is no timer per
+    client; buckets that have refilled completely are indistinguishable from
+    new ones and are dropped every PRUNE_EVERY checks.
+    """
+
+    def __init__(self, endpoint: str, rate: float, burst: float):
+        self.endpoint = endpoint
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        # key -> (tokens, time of last check)
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self._checks = 0
+        self.stats: Dict[str, int] = {"admitted": 0, "rejected": 0}
+
+    def check(self, key: str):
+        """Take a token for `key`; raises RateLimited if there is none."""
+        if not RATE_LIMIT_ENABLED or self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._checks += 1
+        if self._checks % PRUNE_EVERY == 0:
+            self._prune(now)
+        tokens, last = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            self.stats["rejected"] += 1
+            RATE_LIMIT_TOTAL.inc(1, self.endpoint, "rejected")
+            raise RateLimited((1 - tokens) / self.rate, "Too many requests, please slow down")
+        self.buckets[key] = (tokens - 1, now)
+        self.stats["admitted"] += 1
+        RATE_LIMIT_TOTAL.inc(1, self.endpoint, "admitted")
+
+    def _prune(self, now: float):
+        refill = self.burst / self.rate
+        self.buckets = {k: b for k, b in self.buckets.items() if now - b[1] < refill}
+
+
+class AdmissionGate:
+    """Caps how many requests of one kind run at once.
+
+    Requests beyond `limit` wait in FIFO order for up to `timeout` seconds; if
+    `max_waiting` are already waiting, or the wait times out, acquire() raises
+    RateLimited instead, so a rush is answered with quick 429s rather than an
+    ever-growing backlog.
+    """
+
+    def __init__(self, endpoint: str, limit: int, max_waiting: int, timeout: float):
+        self.endpoint = endpoint
+        self.limit = max(limit, 1)
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.stats: Dict[str, int] = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if not RATE_LIMIT_ENABLED:
+            return
+        if self.active < self.limit and not self.waiting:
+            self._admit()
+            return
+        if self.waiting >= self.max_waiting:
+            self._reject("rejected")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._waiters.remove(future)
+                future.cancel()
+                self._reject("timed_out")
+            # Handed a slot just as the wait timed out: keep it
+        except asyncio.CancelledError:
+            # Client went away while waiting; pass on a slot it was handed
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+        self.stats["admitted"] += 1
+        ADMISSION_TOTAL.inc(1, self.endpoint, "admitted")
+
+    def release(self):
+        if not RATE_LIMIT_ENABLED:
+            return
+        # Hand the slot straight to the oldest waiter, if any
+        while self.waiting:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def _admit(self):
+        self.active += 1
+        self.stats["admitted"] += 1
+        ADMISSION_TOTAL.inc(1, self.endpoint, "admitted")
+
+    def _reject(self, result: str):
+        self.stats[result] += 1
+        ADMISSION_TOTAL.inc(1, self.endpoint, result)
+        raise RateLimited(random.randint(1, max(JOIN_RETRY_AFTER_MAX, 1)), "Server busy, please try again shortly")
+
+
+# ---------------- Limits applied by the endpoints ----------------
+
+JOIN_LIMITER = TokenBucketLimiter("join", JOIN_RATE_PER_SECOND, JOIN_BURST)
+ANSWER_LIMITER = TokenBucketLimiter("answer", ANSWER_RATE_PER_SECOND, ANSWER_BURST)
+JOIN_ADMISSION = AdmissionGate("join", JOIN_MAX_CONCURRENT, JOIN_MAX_WAITING, JOIN_QUEUE_TIMEOUT)
+
+gauge(
+    "quiz_admission_active", "Requests currently holding an admission slot", ("endpoint",),
+    collect=lambda: {("join",): JOIN_ADMISSION.active},
+)
+gauge(
+    "quiz_admission_waiting", "Requests waiting for an admission slot", ("endpoint",),
+    collect=lambda: {("join",): JOIN_ADMISSION.waiting},
+)
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "join": {**JOIN_LIMITER.stats, "tracked_clients": len(JOIN_LIMITER.buckets)},
+        "answer": {**ANSWER_LIMITER.stats, "tracked_clients": len(ANSWER_LIMITER.buckets)},
+        "join_admission": {**JOIN_ADMISSION.stats, "active": JOIN_ADMISSION.active, "waiting": JOIN_ADMISSION.waiting},
+    }
@@ -0,0 +1,256 @@
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import os
+import re
+import secrets
+import time
+
+from . import persistence
+from . import store as state_store
+from .answer_batcher import AnswerBatcher, AnswerResult
+from .broadcast_scheduler import BroadcastScheduler
+from .models import AnswerRequest
+from .quiz_loader import CompiledQuiz
+from .state import GameState
+from .store import StateStore, create_broker, create_store
+from .websocket_manager import ConnectionManager
+
+# The room served by the unprefixed endpoints; backed by QUIZ_STATE_FILE / QUIZ_DB_FILE as before
+DEFAULT_ROOM = "default"
+# Snapshot, journal and database files of every other room
+ROOMS_DIR = Path(os.getenv("ROOMS_DIR", persistence.STATE_FILE.parent / "rooms"))
+# Rooms without sockets or requests for this long are written to disk and unloaded
+ROOM_IDLE_SECONDS = float(os.getenv("ROOM_IDLE_SECONDS", "600"))
+# Upper bound on rooms held in memory; the least recently used idle ones are unloaded first
+MAX_LOADED_ROOMS = int(os.getenv("MAX_LOADED_ROOMS", "500"))
+ROOM_SWEEP_SECONDS = 30
+
+ROOM_CODE_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+# No 0/O or 1/I so codes can be read out loud
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+CODE_LENGTH = 6
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class Room:
+    """One game: its state, store, sockets, broadcast scheduler and auto-reveal timer."""
+
+    def __init__(
+        self,
+        code: str,
+        game: GameState,
+        store: StateStore,
+        flush: Callable[["Room", Set[str]], Awaitable[None]],
+        ingest: Callable[["Room", List[AnswerRequest]], Awaitable[List[AnswerResult]]],
+    ):
+        self.code = code
+        self.game = game
+        self.store = store
+        self.manager = ConnectionManager(on_presence=self._presence_changed)
+        # Joins and answers mark state dirty and are flushed together at most once per
+        # BROADCAST_INTERVAL_MS; transitions (reveal, next, ...) flush immediately.
+        self.broadcasts = BroadcastScheduler(lambda kinds: flush(self, kinds))
+        # Answers (HTTP and WebSocket) are validated, stored and tallied per event-loop tick
+        self.answers = AnswerBatcher(lambda batch: ingest(self, batch), name=code)
+        # Fires auto-reveal exactly at game.question_deadline
+        self.reveal_timer: Optional[asyncio.TimerHandle] = None
+        # payload variant -> (state version, PublicState JSON without remaining_seconds)
+        self.public_state_cache: Dict[Optional[str], Tuple[int, bytes]] = {}
+        # payload variant -> (state version, PublicState dict) the last delta broadcast was computed against
+        self.delta_base: Dict[Optional[str], Tuple[int, Dict[str, Any]]] = {}
+        # Roster version last pushed to admin sockets
+        self.roster_pushed: Optional[int] = None
+        # SHA-256 of the room's own admin token (None: only the server ADMIN_TOKEN admins it)
+        self.admin_token_hash: Optional[str] = None
+        self.last_active = time.monotonic()
+
+    def _presence_changed(self, participant_id: str, online: bool):
+        self.game.mark_presence_changed(participant_id)
+        self.broadcasts.mark_dirty("presence")
+
+    def is_admin_token(self, token: str) -> bool:
+        """Whether `token` is this room's own admin token."""
+        return self.admin_token_hash is not None and secrets.compare_digest(token_hash(token), self.admin_token_hash)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def is_idle(self, now: float) -> bool:
+        return (
+            self.code != DEFAULT_ROOM
+            and not self.manager.active_connections
+            and now - self.last_active >= ROOM_IDLE_SECONDS
+        )
+
+
+def valid_room_code(code: str) -> bool:
+    return bool(ROOM_CODE_RE.match(code))
+
+
+def room_files(code: str) -> Tuple[Path, str]:
+    """(snapshot file, SQLite database file) of a room."""
+    if code == DEFAULT_ROOM:
+        return persistence.STATE_FILE, state_store.DB_FILE
+    state_file = ROOMS_DIR / f"{code}.json"
+    return state_file, str(state_file.with_suffix(".sqlite3"))
+
+
+def room_token_file(code: str) -> Path:
+    """Hash of a room's admin token; kept apart from the state so every backend and worker reads it."""
+    return ROOMS_DIR / f"{code}.token"
+
+
+def room_exists_on_disk(code: str) -> bool:
+    state_file, db_file = room_files(code)
+    return Path(db_file if state_store.STATE_BACKEND == "sqlite" else state_file).exists()
+
+
+class RoomRegistry:
+    """Rooms by game code, loaded on first use and unloaded to disk when idle.
+
+    `flush` and `ingest` are the rooms' broadcast and answer batch callbacks.
+    `open_room` runs after a room's state was loaded (timers, store
+    subscription); `close_room` runs before it is unloaded and must leave
+    everything persisted.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[Room, Set[str]], Awaitable[None]],
+        ingest: Callable[[Room, List[AnswerRequest]], Awaitable[List[AnswerResult]]],
+        open_room: Callable[[Room], Awaitable[None]],
+        close_room: Callable[[Room], Awaitable[None]],
+    ):
+        self._flush = flush
+        self._ingest = ingest
+        self._open_room = open_room
+        self._close_room = close_room
+        self.rooms: Dict[str, Room] = {}
+        self.quiz = CompiledQuiz([], {})
+        self._lock = asyncio.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.broker = None
+        self.stats: Dict[str, int] = {"loads": 0, "evictions": 0}
+
+    async def start(self, quiz: CompiledQuiz):
+        self.quiz = quiz
+        self.broker = create_broker(on_message=self._on_broker_message, on_reconnect=self._sync_all)
+        await self.get(DEFAULT_ROOM, create=True)
+        if self.broker is not None:
+            await self.broker.start()
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        async with self._lock:
+            for room in list(self.rooms.values()):
+                await self._unload(room)
+        if self.broker is not None:
+            await self.broker.stop()
+            self.broker = None
+
+    def loaded(self, code: str) -> Optional[Room]:
+        return self.rooms.get(code)
+
+    async def get(self, code: str, create: bool = False) -> Optional[Room]:
+        """The room with this code, loading it from disk if needed; None if it doesn't exist."""
+        room = self.rooms.get(code)
+        if room is None:
+            if not valid_room_code(code):
+                return None
+            async with self._lock:
+                room = self.rooms.get(code)
+                if room is None:
+                    if not (create or code == DEFAULT_ROOM or room_exists_on_disk(code)):
+                        return None
+                    room = await self._load(code)
+        room.touch()
+        return room
+
+    async def create(self) -> Tuple[Room, str]:
+        """A new room with a fresh random code, and its admin token (only its hash is stored)."""
+        while True:
+            code = "".join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+            if code not in self.rooms and not room_exists_on_disk(code):
+                break
+        token = secrets.token_urlsafe(24)
+        ROOMS_DIR.mkdir(parents=True, exist_ok=True)
+        room_token_file(code).write_text(token_hash(token), encoding="utf-8")
+        room = await self.get(code, create=True)
+        room.admin_token_hash = token_hash(token)
+        return room, token
+
+    def codes(self) -> List[str]:
+        """Codes of every room, loaded or on disk."""
+        codes = set(self.rooms)
+        codes.add(DEFAULT_ROOM)
+        if ROOMS_DIR.is_dir():
+            suffix = ".sqlite3" if state_store.STATE_BACKEND == "sqlite" else ".json"
+            codes.update(p.stem for p in ROOMS_DIR.glob(f"*{suffix}"))
+        return sorted(codes)
+
+    async def _load(self, code: str) -> Room:
+        if code != DEFAULT_ROOM:
+            ROOMS_DIR.mkdir(parents=True, exist_ok=True)
+        state_file, db_file = room_files(code)
+        game = GameState(self.quiz)
+        store = create_store(game, state_file, db_file, room=code, broker=self.broker)
+        room = Room(code, game, store, self._flush, self._ingest)
+        token_file = room_token_file(code)
+        if code != DEFAULT_ROOM and token_file.exists():
+            room.admin_token_hash = token_file.read_text(encoding="utf-8").strip()
+        store.load()
+        await self._open_room(room)
+        self.rooms[code] = room
+        self.stats["loads"] += 1
+        await self._evict_over_limit()
+        return room
+
+    async def _unload(self, room: Room):
+        self.rooms.pop(room.code, None)
+        await self._close_room(room)
+
+    async def evict_idle(self):
+        now = time.monotonic()
+        async with self._lock:
+            for room in [r for r in self.rooms.values() if r.is_idle(now)]:
+                await self._unload(room)
+                self.stats["evictions"] += 1
+                print(f"[rooms] unloaded idle room {room.code}")
+
+    async def _evict_over_limit(self):
+        """Unload least recently used rooms without sockets until under MAX_LOADED_ROOMS (lock held)."""
+        excess = len(self.rooms) - MAX_LOADED_ROOMS
+        if excess <= 0:
+            return
+        candidates = sorted(
+            (r for r in self.rooms.values() if r.code != DEFAULT_ROOM and not r.manager.active_connections),
+            key=lambda r: r.last_active,
+        )
+        for room in candidates[:excess]:
+            await self._unload(room)
+            self.stats["evictions"] += 1
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(ROOM_SWEEP_SECONDS)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                print(f"[rooms] eviction failed: {e}")
+
+    def _on_broker_message(self, message: Dict):
+        room = self.rooms.get(message.get("room", DEFAULT_ROOM))
+        if room is not None:
+            room.store.sync()
+
+    def _sync_all(self):
+        for room in list(self.rooms.values()):
+            room.store.sync()
@@ -0,0 +1,33 @@
+from typing import Optional
+import os
+
+# How the scoreboard ranks participants:
+#   correct: one point per correct answer (ties ordered by name)
+#   speed:   correct answers score SPEED_MAX_POINTS scaled down linearly with the time taken,
+#            to SPEED_MIN_POINTS at the end of the question's time limit
+SCORING_MODES = ("correct", "speed")
+SCORING_MODE = os.getenv("SCORING_MODE", "correct")
+if SCORING_MODE not in SCORING_MODES:
+    print(f"[scoring] unknown SCORING_MODE={SCORING_MODE}, using correct")
+    SCORING_MODE = "correct"
+SPEED_MAX_POINTS = int(os.getenv("SPEED_MAX_POINTS", "1000"))
+SPEED_MIN_POINTS = int(os.getenv("SPEED_MIN_POINTS", "500"))
+# Time window of questions without a time limit, in seconds
+SPEED_WINDOW_SECONDS = int(os.getenv("SPEED_WINDOW_SECONDS", "30"))
+
+
+def answer_points(latency_ms: Optional[int], time_limit: Optional[int], mode: str = SCORING_MODE) -> int:
+    """Points for one correct answer given `latency_ms` after a question with `time_limit` seconds.
+
+    Depends only on persisted data (latency and the quiz's time limit), so
+    scores rebuilt after a restart match the live ones. Answers after the
+    window (the timer was extended) or with an unknown latency score
+    SPEED_MIN_POINTS.
+    """
+    if mode != "speed":
+        return 1
+    window_ms = (time_limit or SPEED_WINDOW_SECONDS) * 1000
+    if latency_ms is None or latency_ms < 0 or window_ms <= 0:
+        return SPEED_MIN_POINTS
+    remaining = max(0.0, 1 - latency_ms / window_ms)
+    return SPEED_MIN_POINTS + round((SPEED_MAX_POINTS - SPEED_MIN_POINTS) * remaining)
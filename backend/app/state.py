@@ -1,20 +1,288 @@
-from typing import Dict, Tuple, List
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, Optional, Tuple, List
 
 from .models import QuizState, Question
+from .quiz_loader import CompiledQuiz
+from .scoring import SCORING_MODE, answer_points
 
-# These will be initialized by main.py on startup
-QUIZ: List[Question] = []
-QUIZ_META: Dict[str, object] = {}
-state = QuizState(current_question_index=-1, reveal_answer=False, is_finished=False)
 
-# participant_id -> {"name": str}
-participants: Dict[str, Dict] = {}
+# Answer row typecode and filler: one signed byte per participant and question
+ANSWER_TYPECODE = "b"
+NO_ANSWER = -1
+# Latency row typecode and filler: milliseconds from question start to answer
+LATENCY_TYPECODE = "i"
+NO_LATENCY = -1
 
-# (participant_id, question_id) -> option_index
-answers: Dict[Tuple[str, int], int] = {}
 
+def _row_slot(rows: Dict[int, array], question_id: int, idx: int, typecode: str, fill: int) -> array:
+    """The question's row in `rows`, created or grown so that `idx` is a valid index."""
+    row = rows.get(question_id)
+    if row is None:
+        row = rows[question_id] = array(typecode)
+    if idx >= len(row):
+        # Grow geometrically so a stream of joins doesn't extend every row each time
+        row.extend(array(typecode, [fill]) * (max(idx + 1, 2 * len(row)) - len(row)))
+    return row
 
-def get_current_question() -> Question | None:
-    if 0 <= state.current_question_index < len(QUIZ):
-        return QUIZ[state.current_question_index]
-    return None
+
+class GameState:
+    """The state of one game (room): quiz progress, participants and answers.
+
+    participants/answers/state are the source of truth. The remaining indexes
+    are derived from them, kept up to date by add_participant/record_answer and
+    rebuilt from scratch by rebuild_tallies.
+    """
+
+    def __init__(self, quiz: Optional[CompiledQuiz] = None, scoring_mode: str = SCORING_MODE):
+        self.quiz: CompiledQuiz = quiz if quiz is not None else CompiledQuiz([], {})
+        # "correct" or "speed", see scoring.py
+        self.scoring_mode = scoring_mode
+        self.state = QuizState(current_question_index=-1, reveal_answer=False, is_finished=False)
+
+        # time.monotonic() at which the current question's timer runs out (None: no timer running)
+        self.question_deadline: Optional[float] = None
+
+        # Bumped on every change to what public_state_body() would return (state
+        # transitions, quiz content); caches of the public projection key on it.
+        self.version = 0
+
+        # participant_id -> {"name": str}
+        self.participants: Dict[str, Dict] = {}
+
+        # Participants are interned to dense integer ids (in order of first
+        # appearance) that index the per-question answer rows.
+        self.participant_index: Dict[str, int] = {}
+        self.participant_ids: List[str] = []
+
+        # question_id -> option index chosen by each interned participant, NO_ANSWER if none.
+        # Rows grow on demand, so they may be longer than participant_ids.
+        self.answer_rows: Dict[int, array] = {}
+
+        # question_id -> milliseconds from question_started_at to each interned participant's
+        # answer, NO_LATENCY if unknown (answers persisted before latencies were recorded).
+        # Same layout as answer_rows; rows exist only for questions with a recorded latency.
+        self.answer_latency: Dict[int, array] = {}
+
+        # question_id -> number of answers per option index
+        self.option_counts: Dict[int, List[int]] = {}
+
+        # participant_id -> [correct, answered, points] over questions that have a correct answer
+        self.participant_scores: Dict[str, List[int]] = {}
+
+        # (-points, lowercase name, participant_id), kept sorted in scoreboard order. An
+        # answer moves one entry (bisect + insort), and ranks are bisections: no re-sorting.
+        self.leaderboard: List[Tuple[int, str, str]] = []
+
+        # Number of questions that have a correct answer (scoreboard denominator)
+        self.scored_question_count = 0
+
+        # question_id -> number of participants that answered it
+        self.answered_counts: Dict[int, int] = {}
+
+        # (lowercase name, participant_id), kept sorted for the admin roster
+        self.roster: List[Tuple[str, str]] = []
+
+        # Roster versioning for incremental /admin/participants reads. Every join,
+        # answer or presence change bumps roster_version and is logged in
+        # roster_changes; a change of the current question invalidates every
+        # answered flag, so it starts a new base.
+        self.roster_version = 0
+        self.roster_base_version = 0
+        self.roster_changes: List[Tuple[int, str]] = []
+
+    def apply_quiz_state(self, data: Dict[str, object]):
+        """Restore persisted quiz state fields (only safe fields)."""
+        for k in ["current_question_index", "reveal_answer", "is_finished", "question_started_at", "question_time_limit"]:
+            if k in data:
+                setattr(self.state, k, data[k])
+
+    def bump_version(self) -> int:
+        self.version += 1
+        return self.version
+
+    def get_current_question(self) -> Question | None:
+        if 0 <= self.state.current_question_index < len(self.quiz):
+            return self.quiz[self.state.current_question_index]
+        return None
+
+    def _leaderboard_key(self, participant_id: str) -> Tuple[int, str, str]:
+        return (
+            -self.participant_scores[participant_id][2],
+            self.participants[participant_id]["name"].lower(),
+            participant_id,
+        )
+
+    def rank(self, participant_id: str) -> int:
+        """1-based rank by points; participants with equal points share a rank."""
+        return bisect_left(self.leaderboard, (-self.participant_scores[participant_id][2],)) + 1
+
+    def _roster_changed(self, participant_id: str):
+        self.roster_version += 1
+        self.roster_changes.append((self.roster_version, participant_id))
+
+    def mark_presence_changed(self, participant_id: str):
+        """Call when a participant connects or disconnects, so roster reads pick it up."""
+        if participant_id in self.participants:
+            self._roster_changed(participant_id)
+
+    def mark_question_changed(self):
+        """Call whenever current_question_index changes."""
+        self.roster_version += 1
+        self.roster_base_version = self.roster_version
+        self.roster_changes.clear()
+
+    def roster_changed_since(self, version: int) -> Iterable[str]:
+        """Participant ids whose status changed after `version` (>= roster_base_version)."""
+        start = bisect_left(self.roster_changes, (version + 1, ""))
+        return dict.fromkeys(pid for _, pid in self.roster_changes[start:])
+
+    def intern(self, participant_id: str) -> int:
+        """Dense integer id of a participant, assigned on first use."""
+        idx = self.participant_index.get(participant_id)
+        if idx is None:
+            idx = self.participant_index[participant_id] = len(self.participant_ids)
+            self.participant_ids.append(participant_id)
+        return idx
+
+    def get_answer(self, participant_id: str, question_id: int) -> Optional[int]:
+        """The option a participant chose for a question, or None."""
+        idx = self.participant_index.get(participant_id)
+        row = self.answer_rows.get(question_id)
+        if idx is None or row is None or idx >= len(row) or row[idx] == NO_ANSWER:
+            return None
+        return row[idx]
+
+    def has_answer(self, participant_id: str, question_id: int) -> bool:
+        return self.get_answer(participant_id, question_id) is not None
+
+    def set_answer(self, participant_id: str, question_id: int, option_index: int, latency_ms: Optional[int] = None):
+        """Store an answer without touching the derived indexes (loaders call rebuild_tallies after)."""
+        idx = self.intern(participant_id)
+        _row_slot(self.answer_rows, question_id, idx, ANSWER_TYPECODE, NO_ANSWER)[idx] = option_index
+        if latency_ms is not None:
+            self.set_latency(participant_id, question_id, latency_ms)
+
+    def set_latency(self, participant_id: str, question_id: int, latency_ms: int):
+        idx = self.intern(participant_id)
+        _row_slot(self.answer_latency, question_id, idx, LATENCY_TYPECODE, NO_LATENCY)[idx] = max(0, latency_ms)
+
+    def set_answers(self, question_id: int, options: Dict[str, int]):
+        """set_answer for many participants of one question at once (loaders)."""
+        self._set_row(self.answer_rows, question_id, options, ANSWER_TYPECODE, NO_ANSWER)
+
+    def set_latencies(self, question_id: int, latencies: Dict[str, int]):
+        self._set_row(self.answer_latency, question_id, latencies, LATENCY_TYPECODE, NO_LATENCY)
+
+    def _set_row(self, rows: Dict[int, array], question_id: int, values: Dict[str, int], typecode: str, fill: int):
+        if not values:
+            return
+        index = self.participant_index
+        idxs = [index[pid] if pid in index else self.intern(pid) for pid in values]
+        row = _row_slot(rows, question_id, max(idxs), typecode, fill)
+        for idx, value in zip(idxs, values.values()):
+            row[idx] = value
+
+    def get_latency(self, participant_id: str, question_id: int) -> Optional[int]:
+        """Milliseconds the participant took to answer the question, or None."""
+        idx = self.participant_index.get(participant_id)
+        row = self.answer_latency.get(question_id)
+        if idx is None or row is None or idx >= len(row) or row[idx] == NO_LATENCY:
+            return None
+        return row[idx]
+
+    def iter_answers(self) -> Iterator[Tuple[str, int, int]]:
+        """(participant_id, question_id, option_index) for every stored answer."""
+        ids = self.participant_ids
+        for qid, row in self.answer_rows.items():
+            for idx, opt in enumerate(row):
+                if opt != NO_ANSWER:
+                    yield ids[idx], qid, opt
+
+    def clear_answers(self):
+        self.answer_rows.clear()
+        self.answer_latency.clear()
+        self.participant_index.clear()
+        self.participant_ids.clear()
+
+    def answered_count(self, question_id: int) -> int:
+        return self.answered_counts.get(question_id, 0)
+
+    def all_answered(self, question_id: int) -> bool:
+        return bool(self.participants) and self.answered_count(question_id) >= len(self.participants)
+
+    def add_participant(self, participant_id: str, name: str):
+        self.participants[participant_id] = {"name": name}
+        self.intern(participant_id)
+        self.participant_scores[participant_id] = [0, 0, 0]
+        insort(self.leaderboard, self._leaderboard_key(participant_id))
+        insort(self.roster, (name.lower(), participant_id))
+        self._roster_changed(participant_id)
+
+    def record_answer(self, participant_id: str, question: Question, option_index: int, latency_ms: Optional[int] = None):
+        self.set_answer(participant_id, question.id, option_index, latency_ms)
+        if participant_id in self.participants:
+            self.answered_counts[question.id] = self.answered_counts.get(question.id, 0) + 1
+            self._roster_changed(participant_id)
+        counts = self.option_counts.get(question.id)
+        if counts is not None and 0 <= option_index < len(counts):
+            counts[option_index] += 1
+        if question.correct_index is None or participant_id not in self.participant_scores:
+            return
+        score = self.participant_scores[participant_id]
+        score[1] += 1
+        if option_index == question.correct_index:
+            self.leaderboard.pop(bisect_left(self.leaderboard, self._leaderboard_key(participant_id)))
+            score[0] += 1
+            score[2] += answer_points(latency_ms, self.quiz.time_limit(question), self.scoring_mode)
+            insort(self.leaderboard, self._leaderboard_key(participant_id))
+
+    def reset(self):
+        """Clear participants, answers and quiz progress."""
+        self.participants.clear()
+        self.clear_answers()
+        self.state.current_question_index = -1
+        self.state.reveal_answer = False
+        self.state.is_finished = False
+        self.state.question_started_at = None
+        self.state.question_time_limit = None
+        self.question_deadline = None
+        self.rebuild_tallies()
+
+    def rebuild_tallies(self):
+        """Recompute the derived indexes from participants/answers (after load or reset)."""
+        for pid in self.participants:
+            self.intern(pid)
+        # Interned ids of non-participants (answers left over in old state) are masked out
+        members = array(ANSWER_TYPECODE, (pid in self.participants for pid in self.participant_ids))
+        self.option_counts = {q.id: [0] * len(q.options) for q in self.quiz}
+        self.answered_counts = {}
+        correct = [0] * len(self.participant_ids)
+        answered = [0] * len(self.participant_ids)
+        points = [0] * len(self.participant_ids)
+        for qid, row in self.answer_rows.items():
+            # Whole-row operations: array.count and zip run over bytes, not per-answer dict entries
+            counts = self.option_counts.get(qid)
+            if counts is not None:
+                for opt in range(len(counts)):
+                    counts[opt] = row.count(opt)
+            chosen = [idx for idx, (opt, member) in enumerate(zip(row, members)) if member and opt != NO_ANSWER]
+            self.answered_counts[qid] = len(chosen)
+            q = self.quiz.question_by_id(qid)
+            if q is None or q.correct_index is None:
+                continue
+            latencies = self.answer_latency.get(qid, ())
+            time_limit = self.quiz.time_limit(q)
+            for idx in chosen:
+                answered[idx] += 1
+                if row[idx] == q.correct_index:
+                    correct[idx] += 1
+                    latency = latencies[idx] if idx < len(latencies) and latencies[idx] != NO_LATENCY else None
+                    points[idx] += answer_points(latency, time_limit, self.scoring_mode)
+        self.participant_scores = {
+            pid: [correct[idx], answered[idx], points[idx]] for pid, idx in self.participant_index.items() if pid in self.participants
+        }
+        self.scored_question_count = self.quiz.scored_question_count
+        self.leaderboard = sorted(self._leaderboard_key(pid) for pid in self.participants)
+        self.roster = sorted((pdata["name"].lower(), pid) for pid, pdata in self.participants.items())
+        self.mark_question_changed()
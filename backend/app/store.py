@@ -0,0 +1,371 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import os
+import secrets
+import sqlite3
+import time
+
+from . import json_codec, persistence
+from .metrics import PERSIST_SECONDS
+from .persistence import Journal
+from .pubsub import UnixSocketBroker
+from .state import GameState
+
+# "memory": one process, state persisted by the journal in persistence.py.
+# "sqlite": several workers (e.g. uvicorn --workers N) share games through SQLite files
+# (QUIZ_DB_FILE for the default room, one file per room next to its state file otherwise).
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+DB_FILE = os.getenv("QUIZ_DB_FILE", str(persistence.STATE_FILE.with_suffix(".sqlite3")))
+BROKER_SOCKET = os.getenv("BROKER_SOCKET", str(persistence.STATE_FILE.with_suffix(".sock")))
+
+EventHandler = Callable[[List[Dict[str, Any]]], None]
+
+
+class StateStore(ABC):
+    """Authoritative state of one game behind its GameState read model.
+
+    Each worker applies its own changes to the GameState directly after the store
+    accepted them, and other workers' changes through the handler given to
+    start(). Claims (add_participant, record_answers) return False when another
+    request, possibly in another worker, got there first.
+    """
+
+    @abstractmethod
+    def load(self):
+        """Populate the game's participants, answers and quiz state."""
+
+    @abstractmethod
+    async def add_participant(self, participant_id: str, name: str) -> bool:
+        """Claim `participant_id` for a new participant called `name`."""
+
+    @abstractmethod
+    async def record_answers(self, answers: List[Tuple[str, int, int, Optional[int]]]) -> List[bool]:
+        """Claim a batch of (participant_id, question_id, option_index, latency_ms) answers in one write."""
+
+    @abstractmethod
+    async def record_state(self, kind: str) -> bool:
+        """Persist game.state after a transition (advance, reveal, extend).
+
+        Returns False, persisting nothing, if another worker changed the state
+        since this one last synced; sync() then brings in that state.
+        """
+
+    @abstractmethod
+    async def reset(self):
+        """Clear participants, answers and quiz state."""
+
+    def sync(self):
+        """Apply changes made by other workers that this one has not seen yet."""
+
+    async def start(self, on_events: EventHandler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class MemoryStore(StateStore):
+    """Single-process store: the GameState is authoritative, journaled by persistence.py."""
+
+    def __init__(self, game: GameState, state_file: Path = persistence.STATE_FILE):
+        self.game = game
+        self.journal = Journal(game, state_file)
+
+    def load(self):
+        self.journal.load_state()
+
+    async def add_participant(self, participant_id: str, name: str) -> bool:
+        if participant_id in self.game.participants:
+            return False
+        self.journal.record_join(participant_id, name)
+        return True
+
+    async def record_answers(self, answers: List[Tuple[str, int, int, Optional[int]]]) -> List[bool]:
+        granted = []
+        claimed: Set[Tuple[str, int]] = set()
+        for pid, qid, *_ in answers:
+            ok = (pid, qid) not in claimed and not self.game.has_answer(pid, qid)
+            claimed.add((pid, qid))
+            granted.append(ok)
+        accepted = [answer for answer, ok in zip(answers, granted) if ok]
+        if accepted:
+            self.journal.record_answers(accepted)
+        return granted
+
+    async def record_state(self, kind: str) -> bool:
+        self.journal.record_state(kind)
+        return True
+
+    async def reset(self):
+        # Journal the reset, then fold everything into an (empty) snapshot
+        self.journal.record_reset()
+        self.journal.request_snapshot()
+
+    async def close(self):
+        # Compact the journal so the next load reads a single snapshot; the state is
+        # captured here, the file written off the event loop
+        self.journal.request_snapshot()
+        await asyncio.to_thread(self.journal.flush)
+        self.journal.close_journal()
+
+
+class SQLiteStore(StateStore):
+    """Game state shared by worker processes on one host through a SQLite database.
+
+    Claims are INSERT OR IGNORE statements inside a write transaction, so a
+    username or an answer lock is granted to exactly one worker. Quiz state
+    writes are compare-and-set on a version number, so a worker that has not
+    seen another's transition yet (say, a timer firing for a question that was
+    already left) cannot overwrite it. Every change
+    is also appended to an events table in the same transaction; workers tail
+    that table to update their read model, woken through a Unix-socket broker
+    (shared by all rooms of a worker) rather than polling.
+
+    Write transactions may wait up to BUSY_TIMEOUT seconds for another
+    worker's, so they run in a thread (asyncio.to_thread) on their own
+    connection, one at a time per store; the event loop keeps serving sockets
+    and timers meanwhile. Reads (load, sync) stay on the loop: in WAL mode
+    they never wait for writers.
+    """
+
+    # Seconds a write transaction waits for the database lock
+    BUSY_TIMEOUT = 5
+
+    def __init__(self, game: GameState, db_file: str = DB_FILE, room: str = "", broker: Optional[UnixSocketBroker] = None):
+        self.game = game
+        self.db_file = db_file
+        self.room = room
+        self.broker = broker
+        # Reads, on the event loop
+        self.db: Optional[sqlite3.Connection] = None
+        # Write transactions, in a worker thread
+        self._write_db: Optional[sqlite3.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self.last_event_id = 0
+        # Version of the quiz_state row that game.state reflects
+        self.state_version = 0
+        # Tags this store's events: they are applied locally when the write returns, so sync() skips them
+        self.origin = secrets.token_hex(8)
+        self._on_events: Optional[EventHandler] = None
+
+    def _open(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        db = sqlite3.connect(
+            self.db_file, isolation_level=None, timeout=self.BUSY_TIMEOUT, check_same_thread=check_same_thread
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS participants (
+                participant_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                participant_id TEXT NOT NULL,
+                question_id INTEGER NOT NULL,
+                option_index INTEGER NOT NULL,
+                latency_ms INTEGER,
+                PRIMARY KEY (participant_id, question_id)
+            );
+            CREATE TABLE IF NOT EXISTS quiz_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            """
+        )
+        # Databases created before answer latencies were recorded
+        columns = {row[1] for row in db.execute("PRAGMA table_info(answers)")}
+        if "latency_ms" not in columns:
+            db.execute("ALTER TABLE answers ADD COLUMN latency_ms INTEGER")
+        # ... and before quiz state writes were versioned
+        columns = {row[1] for row in db.execute("PRAGMA table_info(quiz_state)")}
+        if "version" not in columns:
+            db.execute("ALTER TABLE quiz_state ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        return db
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.db is None:
+            self.db = self._open()
+        return self.db
+
+    @contextmanager
+    def _transaction(self):
+        # Runs in a worker thread, under _write_lock
+        if self._write_db is None:
+            self._write_db = self._open(check_same_thread=False)
+        db = self._write_db
+        started = time.perf_counter()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        PERSIST_SECONDS.observe(time.perf_counter() - started, "sqlite")
+
+    def _log_event(self, db: sqlite3.Connection, kind: str, data: Dict[str, Any]) -> int:
+        return db.execute(
+            "INSERT INTO events (kind, data) VALUES (?, ?)", (kind, json_codec.dumps_str({"origin": self.origin, **data}))
+        ).lastrowid
+
+    def _published(self, *event_ids: int):
+        if self.broker is not None and event_ids:
+            self.broker.publish({"room": self.room, "event_id": event_ids[-1]})
+
+    def load(self):
+        db = self._connect()
+        game = self.game
+        game.participants.clear()
+        for pid, name in db.execute("SELECT participant_id, name FROM participants"):
+            game.participants[pid] = {"name": name}
+        game.clear_answers()
+        for pid, qid, opt, ms in db.execute("SELECT participant_id, question_id, option_index, latency_ms FROM answers"):
+            game.set_answer(pid, qid, opt, ms)
+        row = db.execute("SELECT data, version FROM quiz_state WHERE id = 1").fetchone()
+        if row:
+            game.apply_quiz_state(json_codec.loads(row[0]))
+        self.state_version = row[1] if row else 0
+        self.last_event_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        print(f"[store] state loaded from {Path(self.db_file).name}")
+
+    async def add_participant(self, participant_id: str, name: str) -> bool:
+        async with self._write_lock:
+            event_id = await asyncio.to_thread(self._insert_participant, participant_id, name)
+        if event_id is None:
+            return False
+        self._published(event_id)
+        return True
+
+    def _insert_participant(self, participant_id: str, name: str) -> Optional[int]:
+        with self._transaction() as db:
+            cur = db.execute(
+                "INSERT OR IGNORE INTO participants (participant_id, name) VALUES (?, ?)", (participant_id, name)
+            )
+            if cur.rowcount == 0:
+                return None
+            return self._log_event(db, "join", {"participant_id": participant_id, "name": name})
+
+    async def record_answers(self, answers: List[Tuple[str, int, int, Optional[int]]]) -> List[bool]:
+        async with self._write_lock:
+            granted, event_ids = await asyncio.to_thread(self._insert_answers, answers)
+        self._published(*event_ids)
+        return granted
+
+    def _insert_answers(self, answers: List[Tuple[str, int, int, Optional[int]]]) -> Tuple[List[bool], List[int]]:
+        granted = []
+        event_ids = []
+        with self._transaction() as db:
+            for pid, qid, opt, ms in answers:
+                cur = db.execute(
+                    "INSERT OR IGNORE INTO answers (participant_id, question_id, option_index, latency_ms) VALUES (?, ?, ?, ?)",
+                    (pid, qid, opt, ms),
+                )
+                granted.append(cur.rowcount == 1)
+                if cur.rowcount == 1:
+                    event_ids.append(
+                        self._log_event(
+                            db, "answer", {"participant_id": pid, "question_id": qid, "option_index": opt, "latency_ms": ms}
+                        )
+                    )
+        return granted, event_ids
+
+    async def record_state(self, kind: str) -> bool:
+        async with self._write_lock:
+            # Captured under the lock, so concurrent transitions in this worker apply in turn
+            data = self.game.state.model_dump()
+            expected = self.state_version
+            event_id = await asyncio.to_thread(self._write_state, kind, data, expected)
+            if event_id is None:
+                return False
+            self.state_version = max(self.state_version, expected + 1)
+        self._published(event_id)
+        return True
+
+    def _write_state(self, kind: str, data: Dict[str, Any], expected: int) -> Optional[int]:
+        text = json_codec.dumps_str(data)
+        version = expected + 1
+        with self._transaction() as db:
+            cur = db.execute(
+                "UPDATE quiz_state SET data = ?, version = ? WHERE id = 1 AND version = ?", (text, version, expected)
+            )
+            if cur.rowcount == 0:
+                # No state written yet, or another worker's transition we haven't synced
+                cur = db.execute("INSERT OR IGNORE INTO quiz_state (id, data, version) VALUES (1, ?, ?)", (text, version))
+                if cur.rowcount == 0:
+                    return None
+            return self._log_event(db, kind, {"quiz_state": data, "state_version": version})
+
+    async def reset(self):
+        async with self._write_lock:
+            version, event_id = await asyncio.to_thread(self._write_reset, self.game.state.model_dump())
+            self.state_version = max(self.state_version, version)
+        self._published(event_id)
+
+    def _write_reset(self, data: Dict[str, Any]) -> Tuple[int, int]:
+        with self._transaction() as db:
+            db.execute("DELETE FROM participants")
+            db.execute("DELETE FROM answers")
+            version = db.execute("SELECT COALESCE(MAX(version), 0) FROM quiz_state").fetchone()[0] + 1
+            db.execute(
+                "INSERT OR REPLACE INTO quiz_state (id, data, version) VALUES (1, ?, ?)",
+                (json_codec.dumps_str(data), version),
+            )
+            return version, self._log_event(db, "reset", {"quiz_state": data, "state_version": version})
+
+    def sync(self):
+        rows = self._connect().execute(
+            "SELECT id, kind, data FROM events WHERE id > ? ORDER BY id", (self.last_event_id,)
+        ).fetchall()
+        if not rows:
+            return
+        self.last_event_id = rows[-1][0]
+        events = []
+        for event_id, kind, data in rows:
+            event = {"id": event_id, "kind": kind, **json_codec.loads(data)}
+            if event.pop("origin", None) == self.origin:
+                continue
+            self.state_version = max(self.state_version, event.get("state_version", 0))
+            events.append(event)
+        if events and self._on_events is not None:
+            self._on_events(events)
+
+    async def start(self, on_events: EventHandler):
+        self._on_events = on_events
+
+    async def close(self):
+        self._on_events = None
+        async with self._write_lock:
+            if self._write_db is not None:
+                self._write_db.close()
+                self._write_db = None
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def create_broker(on_message: Callable[[Dict], None], on_reconnect: Callable[[], None]) -> Optional[UnixSocketBroker]:
+    """The per-worker broker that wakes SQLite stores up, or None for the memory backend."""
+    if STATE_BACKEND != "sqlite":
+        return None
+    return UnixSocketBroker(BROKER_SOCKET, on_message=on_message, on_reconnect=on_reconnect)
+
+
+def create_store(
+    game: GameState, state_file: Path, db_file: str, room: str = "", broker: Optional[UnixSocketBroker] = None
+) -> StateStore:
+    """Store for one room: journal + snapshot at state_file, or the SQLite database db_file."""
+    if STATE_BACKEND == "sqlite":
+        return SQLiteStore(game, db_file, room=room, broker=broker)
+    if STATE_BACKEND != "memory":
+        print(f"[store] unknown STATE_BACKEND {STATE_BACKEND!r}, using memory")
+    return MemoryStore(game, state_file)
@@ -1,28 +1,297 @@
-from typing import List
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Optional
 import asyncio
+import os
+import time
 
 from fastapi import WebSocket
 
+from .json_codec import dumps_str
+from .metrics import BROADCAST_BYTES, BROADCAST_FANOUT_SECONDS
+
+# Seconds a single send may take before the client is considered dead
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+# Frames buffered per client before the oldest ones are dropped
+MAX_PENDING_FRAMES = int(os.getenv("WS_MAX_PENDING_FRAMES", "32"))
+# Heartbeat clients (connected with ?heartbeat=1) get {"type": "ping"} this often...
+PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "15"))
+# ...and are dropped after this long without any message from them (a pong or anything else)
+PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "45"))
+# Close code sent to clients dropped by the heartbeat
+CLOSE_HEARTBEAT_TIMEOUT = 4408
+PING_FRAME = dumps_str({"type": "ping"})
+
+
+class _Fanout:
+    """Tracks delivery of one broadcast frame across all clients."""
+
+    def __init__(self, manager: "ConnectionManager", started: float, remaining: int):
+        self.manager = manager
+        self.started = started
+        self.remaining = remaining
+
+    def done(self):
+        self.remaining -= 1
+        if self.remaining == 0:
+            elapsed = time.perf_counter() - self.started
+            self.manager.stats["last_fanout_ms"] = round(elapsed * 1000, 3)
+            BROADCAST_FANOUT_SECONDS.observe(elapsed)
+
+
+class _Frame:
+    __slots__ = ("text", "coalesce", "fanout")
+
+    def __init__(self, text: str, coalesce: Optional[str], fanout: Optional[_Fanout]):
+        self.text = text
+        self.coalesce = coalesce
+        self.fanout = fanout
+
+    def finish(self):
+        if self.fanout is not None:
+            self.fanout.done()
+
+
+class _Client:
+    """A connected socket with its own bounded outbound buffer, drained by a sender task."""
+
+    def __init__(self, websocket: WebSocket, group: Hashable, owner: Optional[str], admin: bool, heartbeat: bool):
+        self.websocket = websocket
+        self.group = group
+        # Participant the socket belongs to, if it identified itself
+        self.owner = owner
+        self.admin = admin
+        self.heartbeat = heartbeat
+        self.last_seen = time.monotonic()
+        self.pending: Deque[_Frame] = deque()
+        self.wakeup = asyncio.Event()
+        self.sender: Optional[asyncio.Task] = None
+
+    def push(self, frame: _Frame, max_pending: int) -> int:
+        """Queue a frame; returns the number of stale frames dropped to make room."""
+        dropped = 0
+        if frame.coalesce and self.pending:
+            # A newer frame supersedes any frame of the same kind the client hasn't received yet
+            kept: Deque[_Frame] = deque()
+            for queued in self.pending:
+                if queued.coalesce == frame.coalesce:
+                    queued.finish()
+                    dropped += 1
+                else:
+                    kept.append(queued)
+            self.pending = kept
+        while len(self.pending) >= max_pending:
+            self.pending.popleft().finish()
+            dropped += 1
+        self.pending.append(frame)
+        self.wakeup.set()
+        return dropped
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """Sockets with per-client send buffers, grouped for broadcasts.
+
+    Sockets may belong to a participant: `online` counts the open sockets of
+    every connected participant, and `on_presence(participant_id, online)` is
+    called when a participant's first socket opens or last socket closes.
+    """
+
+    def __init__(
+        self,
+        send_timeout: float = SEND_TIMEOUT,
+        max_pending: int = MAX_PENDING_FRAMES,
+        on_presence: Optional[Callable[[str, bool], None]] = None,
+        ping_interval: float = PING_INTERVAL,
+        ping_timeout: float = PING_TIMEOUT,
+    ):
+        self.active_connections: Dict[WebSocket, _Client] = {}
+        # group -> sockets in it; clients declare a group on connect (e.g. their protocol)
+        self.groups: Dict[Hashable, Dict[WebSocket, _Client]] = {}
+        # Sockets authenticated as admin (presenter); they also receive admin-only pushes
+        self.admins: Dict[WebSocket, _Client] = {}
+        # participant_id -> number of open sockets
+        self.online: Dict[str, int] = {}
+        self.on_presence = on_presence
         self._lock = asyncio.Lock()
+        self.send_timeout = send_timeout
+        self.max_pending = max_pending
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.stats: Dict[str, float] = {
+            "broadcasts": 0,
+            "frames_sent": 0,
+            "frames_dropped": 0,
+            "send_failures": 0,
+            "last_payload_bytes": 0,
+            "last_encode_ms": 0.0,
+            "last_enqueue_ms": 0.0,
+            "last_fanout_ms": 0.0,
+            "heartbeat_timeouts": 0,
+        }
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        group: Hashable = "default",
+        owner: Optional[str] = None,
+        admin: bool = False,
+        heartbeat: bool = False,
+    ):
         await websocket.accept()
+        client = _Client(websocket, group, owner, admin, heartbeat)
+        client.sender = asyncio.create_task(self._sender(client))
         async with self._lock:
-            self.active_connections.append(websocket)
+            self.active_connections[websocket] = client
+            self.groups.setdefault(group, {})[websocket] = client
+            if admin:
+                self.admins[websocket] = client
+        if owner is not None:
+            self.online[owner] = self.online.get(owner, 0) + 1
+            if self.online[owner] == 1 and self.on_presence:
+                self.on_presence(owner, True)
+        if heartbeat and self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    def _remove(self, websocket: WebSocket) -> Optional[_Client]:
+        client = self.active_connections.pop(websocket, None)
+        if client:
+            members = self.groups.get(client.group)
+            if members is not None:
+                members.pop(websocket, None)
+                if not members:
+                    del self.groups[client.group]
+            self.admins.pop(websocket, None)
+            owner = client.owner
+            if owner is not None:
+                left = self.online.get(owner, 1) - 1
+                if left > 0:
+                    self.online[owner] = left
+                else:
+                    self.online.pop(owner, None)
+                    if self.on_presence:
+                        self.on_presence(owner, False)
+        return client
+
+    def seen(self, websocket: WebSocket):
+        """Record that a client is alive (any message from it counts as a pong)."""
+        client = self.active_connections.get(websocket)
+        if client:
+            client.last_seen = time.monotonic()
 
     async def disconnect(self, websocket: WebSocket):
         async with self._lock:
-            if websocket in self.active_connections:
-                self.active_connections.remove(websocket)
+            client = self._remove(websocket)
+        if client and client.sender:
+            client.sender.cancel()
 
-    async def broadcast(self, message: dict):
+    async def close_all(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
         async with self._lock:
-            for ws in list(self.active_connections):
-                try:
-                    await ws.send_json(message)
-                except Exception:
-                    # Drop broken connections
-                    self.active_connections.remove(ws)
+            clients = list(self.active_connections.values())
+            self.active_connections.clear()
+            self.groups.clear()
+            self.admins.clear()
+            self.online.clear()
+        for client in clients:
+            if client.sender:
+                client.sender.cancel()
+
+    def send(self, websocket: WebSocket, message: dict, coalesce: Optional[str] = None):
+        """Queue a message for one client, ordered with any pending broadcasts."""
+        self.send_text(websocket, dumps_str(message), coalesce)
+
+    def send_text(self, websocket: WebSocket, text: str, coalesce: Optional[str] = None):
+        client = self.active_connections.get(websocket)
+        if client:
+            self.stats["frames_dropped"] += client.push(_Frame(text, coalesce, None), self.max_pending)
+
+    async def broadcast_text(
+        self,
+        text: str,
+        coalesce: Optional[str] = None,
+        group: Optional[Hashable] = None,
+        started: Optional[float] = None,
+        admins: bool = False,
+    ):
+        """Queue an already-encoded frame for every client, only those in `group`, or only admins.
+
+        Nothing waits on any send. A frame with a coalesce key replaces any not-yet-sent
+        frame with the same key (e.g. a newer full state supersedes an older one for
+        slow consumers); `started` is when the caller began encoding it.
+        """
+        encoded = time.perf_counter()
+        if started is None:
+            started = encoded
+        if admins:
+            clients = list(self.admins.values())
+        elif group is None:
+            clients = list(self.active_connections.values())
+        else:
+            clients = list(self.groups.get(group, {}).values())
+        fanout = _Fanout(self, started, len(clients)) if clients else None
+        dropped = 0
+        for client in clients:
+            dropped += client.push(_Frame(text, coalesce, fanout), self.max_pending)
+        stats = self.stats
+        stats["broadcasts"] += 1
+        stats["frames_dropped"] += dropped
+        stats["last_payload_bytes"] = len(text)
+        BROADCAST_BYTES.observe(len(text))
+        stats["last_encode_ms"] = round((encoded - started) * 1000, 3)
+        stats["last_enqueue_ms"] = round((time.perf_counter() - encoded) * 1000, 3)
+
+    async def _sender(self, client: _Client):
+        websocket = client.websocket
+        frame: Optional[_Frame] = None
+        try:
+            while True:
+                while not client.pending:
+                    client.wakeup.clear()
+                    await client.wakeup.wait()
+                frame = client.pending.popleft()
+                await asyncio.wait_for(websocket.send_text(frame.text), self.send_timeout)
+                self.stats["frames_sent"] += 1
+                frame.finish()
+                frame = None
+        except asyncio.CancelledError:
+            self._abandon(client, frame)
+            raise
+        except Exception:
+            # Drop broken or too-slow connections
+            self.stats["send_failures"] += 1
+            self._abandon(client, frame)
+            self._remove(websocket)
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            now = time.monotonic()
+            for client in [c for c in self.active_connections.values() if c.heartbeat]:
+                if now - client.last_seen > self.ping_timeout:
+                    await self._drop(client)
+                else:
+                    client.push(_Frame(PING_FRAME, "ping", None), self.max_pending)
+
+    async def _drop(self, client: _Client):
+        """Disconnect a client that stopped answering pings."""
+        self.stats["heartbeat_timeouts"] += 1
+        self._remove(client.websocket)
+        if client.sender:
+            client.sender.cancel()
+        try:
+            await client.websocket.close(code=CLOSE_HEARTBEAT_TIMEOUT)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _abandon(client: _Client, frame: Optional[_Frame]):
+        if frame is not None:
+            frame.finish()
+        while client.pending:
+            client.pending.popleft().finish()
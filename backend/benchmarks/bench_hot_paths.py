@@ -0,0 +1,435 @@
+"""
+Benchmark the join / answer / broadcast hot paths.
+
+By default the FastAPI app is driven in-process through raw ASGI calls, so no
+server, network or extra client library is involved and numbers reflect the
+handlers themselves. With --url the same scenario runs against a live uvicorn
+(requires httpx; WebSockets use the `websockets` package).
+
+Each run prints one JSON object and, with --out, appends it as a line to a
+JSON Lines file so results can be compared over time.
+
+    cd backend
+    python benchmarks/bench_hot_paths.py --participants 2000 --sockets 500
+    python benchmarks/bench_hot_paths.py --url http://127.0.0.1:8000 --admin-token changeme
+
+WARNING: the scenario resets the game on the target server. Against a live
+server, start it with RATE_LIMIT_ENABLED=0: all simulated players come from one
+address and would otherwise be turned away by the per-client limits.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+ADMIN_TOKEN = "bench-admin-token"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ms = [v * 1000 for v in latencies]
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+# ---------------- Drivers ----------------
+
+class InProcessDriver:
+    """Calls the ASGI app directly."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def start(self):
+        await self.app.router.startup()
+
+    async def stop(self):
+        await self.app.router.shutdown()
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None, admin: bool = False) -> Tuple[int, bytes]:
+        raw_path, _, query = path.partition("?")
+        headers = [(b"host", b"bench"), (b"content-type", b"application/json")]
+        if admin:
+            headers.append((b"x-admin-token", ADMIN_TOKEN.encode()))
+        payload = json.dumps(body).encode() if body is not None else b""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": raw_path,
+            "raw_path": raw_path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        sent = False
+        status = 0
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+    async def open_socket(self, on_frame: Callable[[str], None]) -> Callable[[], Awaitable[None]]:
+        inbox: asyncio.Queue = asyncio.Queue()
+        accepted = asyncio.Event()
+        await inbox.put({"type": "websocket.connect"})
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "scheme": "ws",
+            "path": "/ws",
+            "raw_path": b"/ws",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 50001),
+            "server": ("bench", 80),
+            "subprotocols": [],
+        }
+
+        async def send(message):
+            if message["type"] == "websocket.accept":
+                accepted.set()
+            elif message["type"] == "websocket.send":
+                on_frame(message.get("text") or "")
+
+        task = asyncio.create_task(self.app(scope, inbox.get, send))
+        await accepted.wait()
+
+        async def close():
+            await inbox.put({"type": "websocket.disconnect", "code": 1000})
+            await task
+
+        return close
+
+
+class LiveDriver:
+    """Talks to a running server over the network."""
+
+    def __init__(self, url: str, admin_token: str):
+        import httpx
+
+        self.url = url.rstrip("/")
+        self.admin_token = admin_token
+        self.client = httpx.AsyncClient(base_url=self.url, timeout=30, limits=httpx.Limits(max_connections=200))
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        await self.client.aclose()
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None, admin: bool = False) -> Tuple[int, bytes]:
+        headers = {"X-Admin-Token": self.admin_token} if admin else {}
+        response = await self.client.request(method, path, json=body, headers=headers)
+        return response.status_code, response.content
+
+    async def open_socket(self, on_frame: Callable[[str], None]) -> Callable[[], Awaitable[None]]:
+        import websockets
+
+        ws = await websockets.connect(self.url.replace("http", "ws", 1) + "/ws", max_queue=None)
+
+        async def pump():
+            try:
+                async for frame in ws:
+                    on_frame(frame if isinstance(frame, str) else frame.decode())
+            except websockets.ConnectionClosed:
+                pass
+
+        task = asyncio.create_task(pump())
+
+        async def close():
+            await ws.close()
+            await task
+
+        return close
+
+
+# ---------------- Scenario ----------------
+
+class SocketFleet:
+    """Subscribed sockets that count state frames so fan-out completion can be awaited."""
+
+    def __init__(self):
+        self.frames: List[int] = []
+        self.last_frame_at: List[float] = []
+        self.closers: List[Callable[[], Awaitable[None]]] = []
+        self.changed = asyncio.Event()
+
+    def handler(self, index: int) -> Callable[[str], None]:
+        def on_frame(text: str):
+            if '"type":"state"' in text or '"type": "state"' in text:
+                self.frames[index] += 1
+                self.last_frame_at[index] = time.perf_counter()
+                self.changed.set()
+
+        return on_frame
+
+    async def open(self, driver, count: int):
+        for index in range(count):
+            self.frames.append(0)
+            self.last_frame_at.append(0.0)
+            self.closers.append(await driver.open_socket(self.handler(index)))
+
+    async def wait_all_beyond(self, baseline: List[int], timeout: float = 30) -> bool:
+        deadline = time.perf_counter() + timeout
+        while any(now <= before for now, before in zip(self.frames, baseline)):
+            self.changed.clear()
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def close(self):
+        await asyncio.gather(*(close() for close in self.closers))
+
+
+async def timed_calls(calls: List[Callable[[], Awaitable[Tuple[int, bytes]]]], concurrency: int, ok: Callable[[int, bytes], bool]):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def run(call):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            status, body = await call()
+            latencies.append(time.perf_counter() - started)
+            if not ok(status, body):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(call) for call in calls))
+    return latency_summary(latencies, errors, time.perf_counter() - started)
+
+
+def answer_ok(status: int, body: bytes) -> bool:
+    return status == 200 and b'"ok"' in body
+
+
+async def run_scenario(driver, args) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    await driver.request("POST", "/admin/reset", admin=True)
+
+    # Sockets first, so every join and answer below pays for fan-out to them
+    fleet = SocketFleet()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    await fleet.open(driver, args.sockets)
+    await asyncio.sleep(0.2)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results["ws_connect"] = {
+        "sockets": args.sockets,
+        # Only meaningful in-process, where the server's allocations are traced
+        "memory_bytes_per_connection": round((after - before) / args.sockets) if args.sockets and not args.url else None,
+    }
+
+    names = [f"bench-{i}" for i in range(args.participants)]
+    results["join"] = await timed_calls(
+        [lambda name=name: driver.request("POST", "/join", {"name": name}) for name in names],
+        args.concurrency,
+        lambda status, _: status == 200,
+    )
+
+    await driver.request("POST", "/admin/start", admin=True)
+    _, body = await driver.request("GET", "/state")
+    question = json.loads(body)["question"]
+    question_id = question["id"]
+    options = len(question["options"])
+    results["answer"] = await timed_calls(
+        [
+            lambda name=name, i=i: driver.request(
+                "POST", "/answer", {"participant_id": name, "question_id": question_id, "option_index": i % options}
+            )
+            for i, name in enumerate(names)
+        ],
+        args.concurrency,
+        answer_ok,
+    )
+
+    # Broadcast fan-out: time from an admin transition until every socket has the new frame
+    fanout: List[float] = []
+    for _ in range(args.broadcast_rounds):
+        await driver.request("POST", "/admin/next", admin=True)
+        await asyncio.sleep(0.05)
+        baseline = list(fleet.frames)
+        started = time.perf_counter()
+        await driver.request("POST", "/admin/reveal", admin=True)
+        if not await fleet.wait_all_beyond(baseline):
+            break
+        fanout.append(max(fleet.last_frame_at) - started)
+    fanout_ms = [v * 1000 for v in fanout]
+    results["broadcast_fanout"] = {
+        "rounds": len(fanout),
+        "sockets": args.sockets,
+        "p50_ms": round(percentile(fanout_ms, 50), 3),
+        "p99_ms": round(percentile(fanout_ms, 99), 3),
+        "max_ms": round(max(fanout_ms), 3) if fanout_ms else 0.0,
+    }
+
+    status, body = await driver.request("GET", "/admin/broadcast_stats", admin=True)
+    if status == 200:
+        results["server_broadcast_stats"] = json.loads(body)
+
+    await fleet.close()
+    return results
+
+
+def time_call(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(percentile(samples, 50), 3), "max_ms": round(max(samples), 3)}
+
+
+def encoding_benchmarks(room, repeat: int) -> Dict[str, Any]:
+    """Encode a state broadcast, an admin roster push and a persistence snapshot with every installed JSON library."""
+    from app import json_codec, main
+    from app.persistence import Snapshot
+
+    payloads = {
+        "state_frame": {"type": "state", "payload": json_codec.loads(main.public_state_json(room, None))},
+        "roster_frame": {"type": "participants", **main.participants_status(room).model_dump()},
+        "snapshot": Snapshot(0, room.game).data(),
+    }
+    results: Dict[str, Any] = {"selected": json_codec.BACKEND}
+    for name, encode in json_codec.ENCODERS.items():
+        results[name] = {
+            kind: {**time_call(lambda payload=payload: encode(payload), repeat), "bytes": len(encode(payload))}
+            for kind, payload in payloads.items()
+        }
+    return results
+
+
+def micro_benchmarks(repeat: int) -> Dict[str, Any]:
+    """Time the server-side functions directly, on the default room's state left by the scenario."""
+    from app import main
+    from app.rooms import DEFAULT_ROOM
+
+    room = main.rooms.loaded(DEFAULT_ROOM)
+    return {
+        "save_state": time_call(room.store.journal.save_state, repeat) if hasattr(room.store, "journal") else None,
+        "compute_scoreboard": time_call(lambda: main.compute_scoreboard(room), repeat),
+        # What the presenter is pushed at each reveal, and one participant's rank lookup
+        "top_leaderboard": time_call(lambda: main.compute_scoreboard(room, limit=main.LEADERBOARD_PUSH_SIZE), repeat),
+        "participant_rank": time_call(lambda: room.game.rank(next(iter(room.game.participants))), repeat)
+        if room.game.participants else None,
+        "compute_results": time_call(lambda: main.compute_results(room), repeat),
+        # Building the state body after a change, and the cached per-broadcast serialization
+        "public_state_body": time_call(lambda: main.public_state_body(room), repeat),
+        "public_state_json": time_call(lambda: main.public_state_json(room, main.compute_remaining_seconds(room)), repeat),
+        "json_encoding": encoding_benchmarks(room, repeat),
+    }
+
+
+async def main_async(args) -> Dict[str, Any]:
+    if args.url:
+        driver = LiveDriver(args.url, args.admin_token)
+    else:
+        from app.main import app
+
+        driver = InProcessDriver(app)
+    await driver.start()
+    try:
+        scenario = await run_scenario(driver, args)
+        micro = None if args.url else micro_benchmarks(args.micro_repeat)
+    finally:
+        await driver.stop()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "mode": "live" if args.url else "inprocess",
+        "target": args.url,
+        "python": platform.python_version(),
+        "participants": args.participants,
+        "sockets": args.sockets,
+        "concurrency": args.concurrency,
+        **scenario,
+        "micro": micro,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--sockets", type=int, default=200, help="WebSocket subscribers held open during the run")
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight at once")
+    parser.add_argument("--broadcast-rounds", type=int, default=5)
+    parser.add_argument("--micro-repeat", type=int, default=20)
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--admin-token", default=os.getenv("ADMIN_TOKEN", "changeme"))
+    parser.add_argument("--out", help="append the result as one JSON line to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if not args.url:
+        # Isolate the in-process app from the real quiz_state.json before it is imported
+        state_dir = tempfile.mkdtemp(prefix="quiz-bench-")
+        os.environ["QUIZ_STATE_FILE"] = str(Path(state_dir) / "quiz_state.json")
+        os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+        os.environ.setdefault("DEFAULT_TIME_LIMIT", "0")
+        # Every simulated participant shares one client address; measure the handlers, not the limits
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+        sys.path.insert(0, str(BACKEND_DIR))
+    result = asyncio.run(main_async(args))
+    line = json.dumps(result)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
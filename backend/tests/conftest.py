@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Read by the app modules at import time: keep test runs away from real state and images
+_scratch = Path(tempfile.mkdtemp(prefix="quiz-tests-"))
+os.environ.setdefault("QUIZ_STATE_FILE", str(_scratch / "quiz_state.json"))
+os.environ.setdefault("QUIZ_PUBLIC_DIR", str(_scratch / "public"))
+os.environ.setdefault("IMAGE_CACHE_DIR", str(_scratch / "image_cache"))
+os.environ["ADMIN_TOKEN"] = "test-admin"
+
+ADMIN = {"X-Admin-Token": "test-admin"}
+
+
+@pytest.fixture
+def admin():
+    return dict(ADMIN)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """The app with empty state: every test gets its own state file and rooms directory."""
+    from fastapi.testclient import TestClient
+
+    from app import main, persistence, rooms, store
+
+    monkeypatch.setattr(persistence, "STATE_FILE", tmp_path / "quiz_state.json")
+    monkeypatch.setattr(store, "DB_FILE", str(tmp_path / "quiz_state.sqlite3"))
+    monkeypatch.setattr(rooms, "ROOMS_DIR", tmp_path / "rooms")
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture
+def quiz_file(tmp_path):
+    """Two questions with three options each, option 0 correct."""
+    path = tmp_path / "quiz.json"
+    questions = [{"id": i, "text": f"Q{i}", "options": ["a", "b", "c"], "correct_index": 0} for i in (1, 2)]
+    path.write_text(json.dumps({"questions": questions}), encoding="utf-8")
+    return path
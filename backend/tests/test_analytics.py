@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from app.analytics import load_session, main, session_table
+from app.persistence import Journal, PersistenceWriter
+from app.quiz_loader import load_quiz
+from app.state import GameState
+
+
+@pytest.fixture
+def session(tmp_path, quiz_file):
+    """A finished game where a, b and c joined and only a and b answered."""
+    path = tmp_path / "sessions" / "game1.json"
+    path.parent.mkdir()
+    game = GameState(load_quiz(quiz_file))
+    journal = Journal(game, path, writer=PersistenceWriter())
+    for pid in ("a", "b", "c"):
+        game.add_participant(pid, pid.upper())
+        journal.record_join(pid, pid.upper())
+    answers = [("a", 1, 0, 1200), ("b", 1, 1, None), ("a", 2, 0, 800)]
+    for pid, qid, opt, ms in answers:
+        game.record_answer(pid, game.quiz.question_by_id(qid), opt, ms)
+    journal.record_answers(answers)
+    game.state.is_finished = True
+    journal.record_state("finish")
+    journal.save_state()
+    journal.close_journal()
+    return path
+
+
+def test_participant_without_answers_is_exported(session, quiz_file):
+    game = load_session(session, load_quiz(quiz_file))
+    table = session_table(game, "participants")
+    assert table["participant_id"] == ["a", "b", "c"]
+    assert table["answered"] == [2, 1, 0]
+    assert table["correct"] == [2, 0, 0]
+    assert table["latency_ms_mean"] == [1000.0, None, None]
+
+
+def test_cli_rows_include_participant_without_answers(session, quiz_file, capsys):
+    main([str(session.parent), "--quiz", str(quiz_file), "--table", "participants", "--format", "columns"])
+    row = json.loads(capsys.readouterr().out)
+    assert row["session"] == "game1"
+    assert row["participants"]["participant_id"] == ["a", "b", "c"]
+    assert row["participants"]["answered"] == [2, 1, 0]
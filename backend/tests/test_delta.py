@@ -0,0 +1,66 @@
+import copy
+
+from app.main import diff_public_state
+
+
+def apply_patch(state, patch):
+    """What the frontend does with a delta: set each dotted path."""
+    state = copy.deepcopy(state)
+    for path, value in patch.items():
+        *parents, field = path.split(".")
+        target = state
+        for key in parents:
+            target = target[key]
+        target[field] = value
+    return state
+
+
+def test_nested_changes_are_patched_field_by_field():
+    old = {"state": {"current_question_index": 0, "reveal_answer": False}, "question": {"id": 1, "correct_index": None}}
+    new = {"state": {"current_question_index": 0, "reveal_answer": True}, "question": {"id": 1, "correct_index": 2}}
+    assert diff_public_state(old, new) == {"state.reveal_answer": True, "question.correct_index": 2}
+
+
+def test_a_different_question_is_sent_whole():
+    old = {"question": {"id": 1, "text": "a", "options": ["x"]}}
+    new = {"question": {"id": 2, "text": "a", "options": ["x"]}}
+    assert diff_public_state(old, new) == {"question": new["question"]}
+    assert diff_public_state({"question": None}, new) == {"question": new["question"]}
+
+
+def test_unchanged_state_gives_an_empty_patch():
+    state = {"state": {"current_question_index": 3}, "images": [], "total_questions": 5}
+    assert diff_public_state(state, copy.deepcopy(state)) == {}
+
+
+def test_patched_snapshot_tracks_the_public_state(client, admin):
+    from app import main
+
+    room = main.rooms.loaded("default")
+    with client.websocket_connect("/ws?protocol=delta") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot"
+        state, version = snapshot["payload"], snapshot["version"]
+        steps = [
+            lambda: client.post("/join", json={"name": "ann"}),
+            lambda: client.post("/admin/start", headers=admin),
+            lambda: client.post("/answer", json={"participant_id": "ann", "question_id": 1, "option_index": 0}),
+            lambda: client.post("/admin/next", headers=admin),
+            lambda: client.post("/admin/reveal", headers=admin),
+        ]
+        for step in steps:
+            step()
+            # Apply deltas in order until the client is at the server's version
+            while version != room.game.version:
+                message = ws.receive_json()
+                if message["type"] == "delta":
+                    assert message["base"] == version
+                    state, version = apply_patch(state, message["patch"]), message["version"]
+            expected = client.get("/state").json()
+            assert {k: v for k, v in state.items() if k != "remaining_seconds"} == {
+                k: v for k, v in expected.items() if k != "remaining_seconds"
+            }
+        ws.send_json({"type": "resync"})
+        while (message := ws.receive_json())["type"] != "snapshot":
+            pass
+        assert message["version"] == version
@@ -0,0 +1,53 @@
+import pytest
+from PIL import Image
+
+from app.images import ImagePipeline
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    (tmp_path / "public" / "images").mkdir(parents=True)
+    Image.new("RGB", (800, 400), (0, 128, 255)).save(tmp_path / "public" / "images" / "photo.jpeg")
+    return ImagePipeline(tmp_path / "public", tmp_path / "cache", widths=(320, 640))
+
+
+def widths(asset):
+    return [v.width for v in asset.variants]
+
+
+def test_variants_are_written_without_leftover_temp_files(pipeline):
+    asset = pipeline.prepare(["/images/photo.jpeg"])["/images/photo.jpeg"]
+    assert widths(asset) == [320, 640, 800]
+    assert sorted(p.suffix for p in pipeline.cache_dir.iterdir()) == [".jpg", ".jpg"]
+    for variant in asset.variants:
+        assert pipeline.path(variant.url.rsplit("/", 1)[1]).is_file()
+
+
+def test_variant_written_by_another_worker_counts_as_done(pipeline, monkeypatch):
+    resize = pipeline._resize
+
+    def racing_resize(img, width, height, out, alpha):
+        # Another worker renames its copy into place first, then ours fails
+        resize(img, width, height, out, alpha)
+        raise FileNotFoundError(out)
+
+    monkeypatch.setattr(pipeline, "_resize", racing_resize)
+    asset = pipeline.prepare(["/images/photo.jpeg"])["/images/photo.jpeg"]
+    assert widths(asset) == [320, 640, 800]
+
+
+def test_failed_variant_keeps_the_rest_and_is_retried(pipeline, monkeypatch):
+    resize = pipeline._resize
+
+    def failing_resize(img, width, height, out, alpha):
+        if width == 640:
+            raise OSError("disk full")
+        resize(img, width, height, out, alpha)
+
+    monkeypatch.setattr(pipeline, "_resize", failing_resize)
+    asset = pipeline.prepare(["/images/photo.jpeg"])["/images/photo.jpeg"]
+    assert widths(asset) == [320, 800]
+
+    monkeypatch.setattr(pipeline, "_resize", resize)
+    asset = pipeline.prepare(["/images/photo.jpeg"])["/images/photo.jpeg"]
+    assert widths(asset) == [320, 640, 800]
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from app.persistence import Journal, PersistenceWriter
+from app.state import GameState
+
+
+def join_line(seq, pid):
+    return json.dumps({"seq": seq, "kind": "join", "participant_id": pid, "name": pid}, separators=(",", ":")) + "\n"
+
+
+def load(state_file, compact=True):
+    game = GameState()
+    journal = Journal(game, state_file, writer=PersistenceWriter())
+    journal.load_state(compact=compact)
+    return game, journal
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return tmp_path / "quiz_state.json"
+
+
+@pytest.fixture
+def broken_snapshot(state_file):
+    # A snapshot that fails to load means no compaction: new events go to the existing journal
+    state_file.write_text("{not json", encoding="utf-8")
+    return state_file
+
+
+def test_torn_tail_is_cut_before_appending(broken_snapshot):
+    journal_file = broken_snapshot.with_suffix(".journal")
+    journal_file.write_text(join_line(1, "a") + join_line(2, "b") + '{"seq": 3, "kind": "jo', encoding="utf-8")
+
+    game, journal = load(broken_snapshot)
+    assert set(game.participants) == {"a", "b"}
+    journal.record_join("c", "c")
+    journal.flush()
+    journal.close_journal()
+
+    assert journal_file.read_text(encoding="utf-8") == join_line(1, "a") + join_line(2, "b") + join_line(3, "c")
+    game, _ = load(broken_snapshot)
+    assert set(game.participants) == {"a", "b", "c"}
+
+
+def test_last_event_without_newline_is_kept(broken_snapshot):
+    journal_file = broken_snapshot.with_suffix(".journal")
+    journal_file.write_text(join_line(1, "a") + join_line(2, "b").rstrip("\n"), encoding="utf-8")
+
+    game, journal = load(broken_snapshot)
+    assert set(game.participants) == {"a", "b"}
+    journal.record_join("c", "c")
+    journal.flush()
+    journal.close_journal()
+
+    game, _ = load(broken_snapshot)
+    assert set(game.participants) == {"a", "b", "c"}
+
+
+def test_events_after_a_garbled_line_are_replayed(broken_snapshot):
+    # What journals written before the repair look like: appends ran into a torn fragment
+    journal_file = broken_snapshot.with_suffix(".journal")
+    journal_file.write_text(join_line(1, "a") + '{"seq": 2, "ki' + join_line(3, "c") + join_line(4, "d"), encoding="utf-8")
+
+    game, _ = load(broken_snapshot)
+    assert set(game.participants) == {"a", "d"}
+
+
+def test_torn_tail_with_snapshot_is_compacted(state_file):
+    game, journal = load(state_file)
+    journal.record_join("a", "a")
+    journal.record_answers([("a", 1, 2, 1500)])
+    journal.flush()
+    journal.close_journal()
+    with state_file.with_suffix(".journal").open("a", encoding="utf-8") as f:
+        f.write('{"seq": 3, "kind": "join", "partic')
+
+    game, journal = load(state_file)
+    journal.flush()
+    assert set(game.participants) == {"a"}
+    assert game.get_answer("a", 1) == 2
+    assert game.get_latency("a", 1) == 1500
+    assert state_file.with_suffix(".journal").read_text(encoding="utf-8") == ""
+
+
+def test_read_only_load_leaves_torn_journal_alone(broken_snapshot):
+    journal_file = broken_snapshot.with_suffix(".journal")
+    content = join_line(1, "a") + '{"seq": 2'
+    journal_file.write_text(content, encoding="utf-8")
+
+    game, _ = load(broken_snapshot, compact=False)
+    assert set(game.participants) == {"a"}
+    assert journal_file.read_text(encoding="utf-8") == content
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from app.pubsub import UnixSocketBroker
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_relays_between_workers_and_stops_cleanly(tmp_path):
+    path = str(tmp_path / "broker.sock")
+    received = {"hub": [], "worker": []}
+    hub = UnixSocketBroker(path, received["hub"].append, lambda: None)
+    await hub.start()
+    await wait_for(lambda: hub._writer is not None)
+    worker = UnixSocketBroker(path, received["worker"].append, lambda: None)
+    await worker.start()
+    await wait_for(lambda: worker._writer is not None and len(hub._hub_clients) == 2)
+
+    worker.publish({"event_id": 1})
+    await wait_for(lambda: received["hub"])
+    assert received == {"hub": [{"event_id": 1}], "worker": []}
+
+    await worker.stop()
+    await hub.stop()
+    assert not hub._hub_clients and not hub._hub_handlers
+    others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    assert others == []
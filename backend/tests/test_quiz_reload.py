@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def live_quiz(client, quiz_file, monkeypatch):
+    """The app serving quiz_file, which the tests then edit and reload."""
+    from app import main
+
+    monkeypatch.setattr(main, "QUIZ_FILE", quiz_file)
+    return quiz_file
+
+
+def reload(client, admin):
+    return client.post("/admin/reload_quiz", headers=admin)
+
+
+@pytest.mark.parametrize(
+    "content, error",
+    [
+        ("{not json", "Expecting property name"),
+        (json.dumps({"questions": {"id": 1}}), "must be a list"),
+        (json.dumps([{"id": 1, "text": "Q", "options": ["a"], "correct_index": 0}] * 2), "ids must be unique"),
+        (json.dumps([{"id": 1, "options": ["a"]}]), "text"),
+    ],
+    ids=["bad-json", "not-a-list", "duplicate-ids", "invalid-question"],
+)
+def test_invalid_quiz_is_422_and_keeps_the_old_one(client, admin, live_quiz, content, error):
+    assert reload(client, admin).json()["changed"] is True
+    live_quiz.write_text(content, encoding="utf-8")
+    r = reload(client, admin)
+    assert r.status_code == 422
+    assert r.json()["detail"].startswith("Quiz not reloaded:")
+    assert error in r.json()["detail"]
+    assert client.get("/state").json()["total_questions"] == 2
+
+
+def test_missing_quiz_file_is_422(client, admin, live_quiz):
+    live_quiz.unlink()
+    r = reload(client, admin)
+    assert r.status_code == 422
+    assert "No such file" in r.json()["detail"]
+
+
+def test_reload_keeps_participants_and_reports_changed_questions(client, admin, live_quiz):
+    assert reload(client, admin).json()["changed"] is True
+    client.post("/join", json={"name": "ann"})
+    assert reload(client, admin).json() == {"status": "ok", "changed": False, "questions": 2, "changed_questions": []}
+
+    data = json.loads(live_quiz.read_text(encoding="utf-8"))
+    data["questions"][1]["text"] = "Edited"
+    live_quiz.write_text(json.dumps(data), encoding="utf-8")
+    assert reload(client, admin).json()["changed_questions"] == [2]
+    assert client.get("/participant/ann").status_code == 200
+
+
+def test_reload_needs_the_operator_token(client, live_quiz):
+    assert client.post("/admin/reload_quiz").status_code == 403
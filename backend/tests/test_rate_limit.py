@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app import rate_limit
+from app.rate_limit import AdmissionGate, RateLimited, TokenBucketLimiter
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    limiter = TokenBucketLimiter("test", rate=2, burst=3)
+    for _ in range(3):
+        limiter.check("ip")
+    with pytest.raises(RateLimited) as e:
+        limiter.check("ip")
+    assert e.value.retry_after == pytest.approx(0.5)
+    # Other keys have their own bucket
+    limiter.check("other-ip")
+    clock[0] += 0.5
+    limiter.check("ip")
+    assert limiter.stats == {"admitted": 5, "rejected": 1}
+
+
+@pytest.mark.asyncio
+async def test_admission_queues_then_turns_requests_away():
+    gate = AdmissionGate("test", limit=1, max_waiting=1, timeout=0.2)
+    await gate.acquire()
+    waiter = asyncio.create_task(gate.acquire())
+    await asyncio.sleep(0)
+    assert gate.waiting == 1
+    # The queue is full
+    with pytest.raises(RateLimited):
+        await gate.acquire()
+    # Releasing hands the slot to the waiter
+    gate.release()
+    await waiter
+    assert gate.active == 1 and gate.waiting == 0
+    # Nobody releases: the next request gives up after the timeout
+    with pytest.raises(RateLimited) as e:
+        await gate.acquire()
+    assert 1 <= e.value.retry_after <= max(rate_limit.JOIN_RETRY_AFTER_MAX, 1)
+    assert gate.stats == {"admitted": 2, "queued": 2, "rejected": 1, "timed_out": 1}
+
+
+def test_join_over_the_limit_is_429_with_retry_after(client, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "JOIN_LIMITER", TokenBucketLimiter("join", rate=0.1, burst=2))
+    assert client.post("/join", json={"name": "a"}).status_code == 200
+    assert client.post("/join", json={"name": "b"}).status_code == 200
+    r = client.post("/join", json={"name": "c"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    assert client.get("/participant/c").status_code == 404
+
+
+def test_answer_limit_is_per_participant(client, admin, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "ANSWER_LIMITER", TokenBucketLimiter("answer", rate=0.1, burst=1))
+    for name in ("a", "b"):
+        client.post("/join", json={"name": name})
+    client.post("/admin/start", headers=admin)
+    answer = {"question_id": 1, "option_index": 0}
+    assert client.post("/answer", json={"participant_id": "a", **answer}).json()["status"] == "ok"
+    assert client.post("/answer", json={"participant_id": "a", **answer}).status_code == 429
+    assert client.post("/answer", json={"participant_id": "b", **answer}).json()["status"] == "ok"
@@ -0,0 +1,67 @@
+import pytest
+
+
+@pytest.fixture
+def two_rooms(client, admin):
+    a = client.post("/admin/rooms", headers=admin).json()
+    b = client.post("/admin/rooms", headers=admin).json()
+    return a, b
+
+
+def room_admin(room):
+    return {"X-Admin-Token": room["admin_token"]}
+
+
+def test_rooms_keep_their_own_participants_and_progress(client, admin, two_rooms):
+    a, b = two_rooms
+    assert client.post(f"/rooms/{a['code']}/join", json={"name": "ann"}).status_code == 200
+    # The same name is free in another room and in the default one
+    assert client.post(f"/rooms/{b['code']}/join", json={"name": "ann"}).status_code == 200
+    assert client.get("/participant/ann").status_code == 404
+    assert client.post(f"/rooms/{a['code']}/join", json={"name": "ann"}).status_code == 409
+
+    client.post(f"/rooms/{a['code']}/admin/start", headers=room_admin(a))
+    assert client.get(f"/rooms/{a['code']}/state").json()["state"]["current_question_index"] == 0
+    assert client.get(f"/rooms/{b['code']}/state").json()["state"]["current_question_index"] == -1
+    assert client.get("/state").json()["state"]["current_question_index"] == -1
+
+
+def test_unknown_room_is_404(client):
+    assert client.get("/rooms/NOPE42/state").status_code == 404
+
+
+def test_room_token_only_opens_its_own_room(client, admin, two_rooms):
+    a, b = two_rooms
+    assert client.post(f"/rooms/{a['code']}/admin/start", headers=room_admin(a)).status_code == 200
+    assert client.post(f"/rooms/{b['code']}/admin/reset", headers=room_admin(a)).status_code == 403
+    assert client.post("/admin/reset", headers=room_admin(a)).status_code == 403
+    assert client.post("/admin/rooms", headers=room_admin(a)).status_code == 403
+    assert client.get(f"/rooms/{a['code']}/admin/results").status_code == 403
+    # The operator token opens every room
+    assert client.get(f"/rooms/{b['code']}/admin/results", headers=admin).status_code == 200
+
+
+def test_room_token_survives_unloading_the_room(client, two_rooms):
+    from app import main
+
+    a, _ = two_rooms
+    main.rooms.rooms.pop(a["code"])
+    assert client.post(f"/rooms/{a['code']}/admin/start", headers=room_admin(a)).status_code == 200
+
+
+def test_room_code_comes_from_the_path_only(client, two_rooms):
+    a, _ = two_rooms
+    client.post(f"/rooms/{a['code']}/join", json={"name": "ann"})
+    assert client.get("/participant/ann", params={"room_code": a["code"]}).status_code == 404
+
+
+def test_admin_websocket_needs_the_rooms_token(client, two_rooms):
+    a, b = two_rooms
+    with client.websocket_connect(f"/rooms/{a['code']}/ws?admin_token={a['admin_token']}") as ws:
+        assert ws.receive_json()["type"] == "state"
+        assert ws.receive_json()["type"] == "participants"
+    # Another room's token connects as a plain client: no roster pushes
+    with client.websocket_connect(f"/rooms/{b['code']}/ws?admin_token={a['admin_token']}") as ws:
+        assert ws.receive_json()["type"] == "state"
+        client.post(f"/rooms/{b['code']}/join", json={"name": "x"})
+        assert ws.receive_json()["type"] != "participants"
@@ -0,0 +1,58 @@
+import pytest
+
+from app.quiz_loader import load_quiz
+from app.scoring import SPEED_MAX_POINTS, SPEED_MIN_POINTS, SPEED_WINDOW_SECONDS, answer_points
+from app.state import GameState
+
+
+def test_correct_mode_scores_one_point():
+    assert answer_points(100, 30, mode="correct") == 1
+    assert answer_points(None, None, mode="correct") == 1
+
+
+def test_speed_points_fall_linearly_over_the_time_limit():
+    assert answer_points(0, 20, mode="speed") == SPEED_MAX_POINTS
+    assert answer_points(10_000, 20, mode="speed") == (SPEED_MAX_POINTS + SPEED_MIN_POINTS) // 2
+    assert answer_points(20_000, 20, mode="speed") == SPEED_MIN_POINTS
+    # Past the window (the timer was extended) and unknown latencies score the minimum
+    assert answer_points(25_000, 20, mode="speed") == SPEED_MIN_POINTS
+    assert answer_points(None, 20, mode="speed") == SPEED_MIN_POINTS
+
+
+def test_speed_window_of_questions_without_time_limit():
+    half = SPEED_WINDOW_SECONDS * 500
+    assert answer_points(half, None, mode="speed") == answer_points(half, SPEED_WINDOW_SECONDS, mode="speed")
+
+
+def play(quiz_file, mode, answers):
+    """A game in `mode` after (participant, question_id, option, latency_ms) answers."""
+    game = GameState(load_quiz(quiz_file), scoring_mode=mode)
+    for pid in ("ann", "bob", "cat", "dan"):
+        game.add_participant(pid, pid)
+    game.rebuild_tallies()
+    for pid, qid, opt, ms in answers:
+        game.record_answer(pid, game.quiz.question_by_id(qid), opt, ms)
+    return game
+
+
+def test_tied_participants_share_a_rank(quiz_file):
+    game = play(quiz_file, "correct", [("ann", 1, 0, None), ("bob", 1, 0, None), ("cat", 1, 1, None)])
+    assert [game.rank(pid) for pid in ("ann", "bob", "cat", "dan")] == [1, 1, 3, 3]
+
+
+def test_incremental_ranks_match_a_rebuild(quiz_file):
+    answers = [("ann", 1, 0, 4000), ("bob", 1, 0, 1000), ("cat", 1, 2, 500), ("dan", 2, 0, 4000), ("ann", 2, 0, 9000)]
+    game = play(quiz_file, "speed", answers)
+    live = {pid: (game.rank(pid), game.participant_scores[pid][2]) for pid in game.participants}
+    game.rebuild_tallies()
+    assert live == {pid: (game.rank(pid), game.participant_scores[pid][2]) for pid in game.participants}
+    # Faster correct answers score more; equal times tie
+    assert live["bob"][1] > live["dan"][1]
+    assert live["ann"][0] == 1 and live["cat"][0] == 4
+
+
+@pytest.mark.parametrize("mode", ["correct", "speed"])
+def test_participants_without_answers_rank_last_together(quiz_file, mode):
+    game = play(quiz_file, mode, [("ann", 1, 0, 1000)])
+    assert game.rank("ann") == 1
+    assert game.rank("bob") == game.rank("cat") == game.rank("dan") == 2
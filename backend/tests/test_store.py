@@ -0,0 +1,81 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.state import GameState
+from app.store import SQLiteStore
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "quiz_state.sqlite3")
+
+
+def open_store(db_file):
+    store = SQLiteStore(GameState(), db_file)
+    store.load()
+    return store
+
+
+@pytest.mark.asyncio
+async def test_write_waiting_for_another_worker_does_not_block_the_loop(db_file):
+    store = open_store(db_file)
+    other = sqlite3.connect(db_file, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    join = asyncio.create_task(store.add_participant("a", "a"))
+    await asyncio.sleep(0.3)
+    assert not join.done()
+    assert ticks >= 10
+    other.execute("COMMIT")
+    started = time.monotonic()
+    assert await join
+    assert time.monotonic() - started < 1
+    ticking.cancel()
+    other.close()
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_state_write_is_refused_until_synced(db_file):
+    first, second = open_store(db_file), open_store(db_file)
+    await second.start(lambda events: [second.game.apply_quiz_state(e["quiz_state"]) for e in events])
+    first.game.state.current_question_index = 0
+    assert await first.record_state("advance")
+
+    # The second worker hasn't seen the advance: its reveal of the old state must not land
+    second.game.state.reveal_answer = True
+    assert not await second.record_state("reveal")
+    second.sync()
+    assert second.game.state.current_question_index == 0
+    assert not second.game.state.reveal_answer
+
+    second.game.state.reveal_answer = True
+    assert await second.record_state("reveal")
+    assert not await first.record_state("advance")
+    await first.close()
+    await second.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_applies_other_workers_events_but_not_its_own(db_file):
+    first, second = open_store(db_file), open_store(db_file)
+    seen = []
+    await second.start(seen.extend)
+    assert await first.add_participant("a", "a")
+    assert not await second.add_participant("a", "a")
+    assert await second.record_answers([("a", 1, 2, 900), ("a", 1, 3, 950)]) == [True, False]
+    second.sync()
+    assert [(e["kind"], e.get("participant_id")) for e in seen] == [("join", "a")]
+    await first.close()
+    await second.close()
@@ -4,8 +4,65 @@ const DEFAULT_API_BASE =
     ? "http://localhost:8000"
     : `${window.location.protocol}//${window.location.hostname}:8000`;
 
-export const API_BASE = import.meta.env.VITE_API_BASE || DEFAULT_API_BASE;
+const SERVER_BASE = import.meta.env.VITE_API_BASE || DEFAULT_API_BASE;
 
-export function makeWsUrl() {
-  return API_BASE.replace(/^http/, "ws") + "/ws";
+// ?room=<code> in the page URL selects a room; without it the default room is used.
+export const ROOM_CODE =
+  typeof window === "undefined" ? null : new URLSearchParams(window.location.search).get("room");
+
+export const API_BASE = ROOM_CODE ? `${SERVER_BASE}/rooms/${encodeURIComponent(ROOM_CODE)}` : SERVER_BASE;
+
+// Optimized copies of quiz images (PublicState.images / .prefetch) are served by the
+// backend under content-hashed URLs; these map a quiz image URL to <img> attributes.
+function assetSrcSet(asset) {
+  return asset.variants
+    .filter((v) => v.width > 0)
+    .map((v) => `${SERVER_BASE}${v.url} ${v.width}w`)
+    .join(", ");
+}
+
+export function imageProps(state, src, sizes) {
+  const asset = src && (state?.images || []).find((a) => a.src === src);
+  if (!asset) return { src };
+  const srcSet = assetSrcSet(asset);
+  return {
+    src: SERVER_BASE + asset.variants[asset.variants.length - 1].url,
+    ...(srcSet ? { srcSet, sizes } : {}),
+  };
+}
+
+// Starts downloading the next question's images so they are cached when it opens.
+export function preloadImages(assets, sizes) {
+  for (const asset of assets || []) {
+    const img = new Image();
+    const srcSet = assetSrcSet(asset);
+    if (srcSet) {
+      img.sizes = sizes;
+      img.srcset = srcSet;
+    }
+    img.src = SERVER_BASE + asset.variants[asset.variants.length - 1].url;
+  }
+}
+
+export function makeWsUrl(params) {
+  const query = params ? `?${new URLSearchParams(params)}` : "";
+  return API_BASE.replace(/^http/, "ws") + "/ws" + query;
+}
+
+// Applies a /ws?protocol=delta message to `current` ({ state, version }).
+// Returns the (possibly unchanged) synced state, or null when the client
+// missed a version and must send {"type": "resync"}.
+export function applyStateMessage(current, msg) {
+  if (msg.type === "snapshot") {
+    return { state: msg.payload, version: msg.version };
+  }
+  if (msg.type !== "delta") return current;
+  if (current.version !== null && msg.version <= current.version) return current;
+  if (msg.base !== current.version) return null;
+  const state = { ...current.state };
+  for (const [path, value] of Object.entries(msg.patch)) {
+    const [key, field] = path.split(".");
+    state[key] = field === undefined ? value : { ...state[key], [field]: value };
+  }
+  return { state, version: msg.version };
 }
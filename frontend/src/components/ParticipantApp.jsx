@@ -1,5 +1,5 @@
-import { useEffect, useMemo, useState } from "react";
-import { API_BASE, makeWsUrl } from "../api.js";
+import { useEffect, useMemo, useRef, useState } from "react";
+import { API_BASE, applyStateMessage, imageProps, makeWsUrl, preloadImages } from "../api.js";
 import { theme } from "../theme.js";
 import Button from "./ui/Button.jsx";
 import Badge from "./ui/Badge.jsx";
@@ -8,6 +8,11 @@ import { useI18n, localizeQuestion } from "../i18n.jsx";
 import LanguageSelector from "./ui/LanguageSelector.jsx";
 
 const USERNAME_STORAGE_KEY = "quiz_username";
+// Retries of a /join turned away with 429 before giving up
+const JOIN_MAX_RETRIES = 5;
+
+// Rendered width of question images (the page is at most 480px wide)
+const IMAGE_SIZES = "(max-width: 480px) 100vw, 480px";
 
 export default function ParticipantApp() {
   const { language, t } = useI18n();
@@ -18,9 +23,14 @@ export default function ParticipantApp() {
   const [joinError, setJoinError] = useState("");
   const [state, setState] = useState(null);
   const [selectedOption, setSelectedOption] = useState(null);
+  // Open state socket (answers are sent over it) and answer id -> ack callback
+  const wsRef = useRef(null);
+  const pendingAnswers = useRef(new Map());
+  const nextAnswerId = useRef(0);
   const [wsStatus, setWsStatus] = useState("disconnected");
   const [imageError, setImageError] = useState(false);
   const [localTimer, setLocalTimer] = useState(null);
+  const [myRank, setMyRank] = useState(null);
   const revealMode = Boolean(state?.state?.reveal_answer);
   const localizedQuestion = useMemo(
     () => localizeQuestion(state?.question, language),
@@ -72,18 +82,53 @@ export default function ParticipantApp() {
 
   useEffect(() => {
     if (!isLoggedIn || !username) return;
-    const ws = new WebSocket(makeWsUrl());
-    ws.onopen = () => setWsStatus("connected");
+    // The server sends the question in `language` only; reconnecting on a switch resyncs it
+    // participant_id marks us online for the presenter; heartbeat pings let the server drop dead sockets
+    const ws = new WebSocket(
+      makeWsUrl({ protocol: "delta", lang: language, participant_id: username, heartbeat: 1 })
+    );
+    let synced = { state: null, version: null };
+    ws.onopen = () => {
+      wsRef.current = ws;
+      setWsStatus("connected");
+    };
     ws.onmessage = (event) => {
       const msg = JSON.parse(event.data);
-      if (msg.type === "state") {
-        setState(msg.payload);
+      if (msg.type === "ping") {
+        ws.send(JSON.stringify({ type: "pong" }));
+        return;
+      }
+      if (msg.type === "answer_ack") {
+        const resolve = pendingAnswers.current.get(msg.id);
+        pendingAnswers.current.delete(msg.id);
+        if (resolve) resolve(msg);
+        return;
+      }
+      const next = applyStateMessage(synced, msg);
+      if (next === null) {
+        ws.send(JSON.stringify({ type: "resync" }));
+      } else if (next !== synced) {
+        synced = next;
+        setState(next.state);
         setImageError(false);
       }
     };
-    ws.onclose = () => setWsStatus("disconnected");
+    ws.onclose = () => {
+      if (wsRef.current === ws) wsRef.current = null;
+      // Answers sent on this socket get no ack any more; let the user pick again
+      for (const resolve of pendingAnswers.current.values()) {
+        resolve({ status: "error", message: "Connection lost" });
+      }
+      pendingAnswers.current.clear();
+      setWsStatus("disconnected");
+    };
     return () => ws.close();
-  }, [isLoggedIn, username]);
+  }, [isLoggedIn, username, language]);
+
+  const prefetchKey = (state?.prefetch || []).map((a) => a.src).join("|");
+  useEffect(() => {
+    preloadImages(state?.prefetch, IMAGE_SIZES);
+  }, [prefetchKey]);
 
   useEffect(() => {
     let cancelled = false;
@@ -116,6 +161,20 @@ export default function ParticipantApp() {
     };
   }, [state?.question?.id, username, isLoggedIn]);
 
+  // Ranks are only served once the answer is revealed (they would give it away earlier)
+  useEffect(() => {
+    if (!revealMode || !username || !isLoggedIn) {
+      setMyRank(null);
+      return;
+    }
+    let cancelled = false;
+    fetch(`${API_BASE}/rank/${encodeURIComponent(username)}`)
+      .then((res) => (res.ok ? res.json() : null))
+      .then((data) => { if (!cancelled) setMyRank(data); })
+      .catch(() => {});
+    return () => { cancelled = true; };
+  }, [revealMode, state?.question?.id, username, isLoggedIn]);
+
   useEffect(() => {
     if (!state?.question || revealMode) {
       setLocalTimer(null);
@@ -148,11 +207,18 @@ export default function ParticipantApp() {
     const trimmedName = username.trim();
 
     try {
-      const res = await fetch(`${API_BASE}/join`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ name: trimmedName })
-      });
+      let res;
+      for (let attempt = 0; ; attempt++) {
+        res = await fetch(`${API_BASE}/join`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ name: trimmedName })
+        });
+        // Server busy (everyone scanning the QR code at once): wait as told and retry
+        if (res.status !== 429 || attempt >= JOIN_MAX_RETRIES) break;
+        const retryAfter = Number(res.headers.get('Retry-After')) || 1;
+        await new Promise((resolve) => setTimeout(resolve, (retryAfter + Math.random()) * 1000));
+      }
 
       if (!res.ok) {
         const data = await res.json().catch(() => ({}));
@@ -187,8 +253,20 @@ export default function ParticipantApp() {
   if (revealMode) return;
   if (remainingSeconds !== null && remainingSeconds <= 0) return;
   setSelectedOption(idx);
-  const res = await fetch(`${API_BASE}/answer`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ participant_id: username, question_id: state.question.id, option_index: idx }) });
-  const data = await res.json();
+  const answer = { participant_id: username, question_id: state.question.id, option_index: idx };
+  let data;
+  const ws = wsRef.current;
+  if (ws && ws.readyState === WebSocket.OPEN) {
+    // Acked on the same socket, no extra HTTP request
+    const id = ++nextAnswerId.current;
+    data = await new Promise((resolve) => {
+      pendingAnswers.current.set(id, resolve);
+      ws.send(JSON.stringify({ type: "answer", id, ...answer }));
+    });
+  } else {
+    const res = await fetch(`${API_BASE}/answer`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(answer) });
+    data = await res.json();
+  }
   if (data.status === 'error') {
     setSelectedOption(null);
   }
@@ -302,7 +380,7 @@ export default function ParticipantApp() {
           {state.final_image_url && (
             <div style={{ margin: `${theme.spacing.xl} 0` }}>
               <img
-                src={state.final_image_url}
+                {...imageProps(state, state.final_image_url, IMAGE_SIZES)}
                 alt='Quiz end'
                 style={{
                   maxWidth: '100%',
@@ -396,7 +474,7 @@ export default function ParticipantApp() {
         {displayImage && !imageError && (
           <div style={{ textAlign: 'center', marginBottom: theme.spacing.lg }}>
             <img
-              src={displayImage}
+              {...imageProps(state, displayImage, IMAGE_SIZES)}
               alt={imageAlt}
               style={{
                 maxWidth: '100%',
@@ -536,6 +614,20 @@ export default function ParticipantApp() {
           </div>
         )}
 
+        {revealMode && myRank && (
+          <div
+            role="status"
+            style={{
+              marginTop: theme.spacing.md,
+              color: theme.colors.neutral[700],
+              fontWeight: theme.fontWeights.semibold,
+              textAlign: 'center',
+            }}
+          >
+            {t("your_rank", { rank: myRank.rank, total: myRank.participants, points: myRank.points })}
+          </div>
+        )}
+
         {revealMode && selectedOption === null && (
           <div
             role="alert"
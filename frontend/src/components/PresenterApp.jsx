@@ -1,5 +1,5 @@
 import { useEffect, useMemo, useState, useRef } from "react";
-import { API_BASE, makeWsUrl } from "../api.js";
+import { API_BASE, ROOM_CODE, imageProps, makeWsUrl, preloadImages } from "../api.js";
 import QRCode from "react-qr-code";
 import Scoreboard from "./Scoreboard.jsx";
 import { theme } from "../theme.js";
@@ -10,13 +10,22 @@ import EmptyState from "./ui/EmptyState.jsx";
 import AnswerChart from "./ui/AnswerChart.jsx";
 import { useMediaQuery } from "../hooks/useMediaQuery.js";
 
+// Rendered width of question images on the presenter screen
+const IMAGE_SIZES = "(max-width: 1024px) 100vw, 800px";
+
 export default function PresenterApp() {
   const [state, setState] = useState(null);
   const [results, setResults] = useState(null);
   const [wsStatus, setWsStatus] = useState("disconnected");
   const [participants, setParticipants] = useState([]);
+  const [onlineCount, setOnlineCount] = useState(null);
+  // Set once the admin socket pushes roster changes; polling /admin/participants stops then
+  const [participantsPushed, setParticipantsPushed] = useState(false);
+  // Top entries pushed to the admin socket when an answer is revealed
+  const [leaderboard, setLeaderboard] = useState(null);
   const [errorMsg, setErrorMsg] = useState("");
   const [adminToken, setAdminToken] = useState(() => localStorage.getItem("admin_token") || "");
+  const [savedToken, setSavedToken] = useState(() => localStorage.getItem("admin_token") || "");
   const [showTokenPrompt, setShowTokenPrompt] = useState(false);
   const [toast, setToast] = useState(null);
   const [localTimer, setLocalTimer] = useState(null);
@@ -38,10 +47,11 @@ export default function PresenterApp() {
   }, [toast]);
 
   const participantUrl = useMemo(() => {
+    const roomQuery = ROOM_CODE ? `?room=${encodeURIComponent(ROOM_CODE)}` : "";
     if (API_BASE && API_BASE !== "http://localhost:8000") {
-      try { const apiUrl = new URL(API_BASE); return `http://${apiUrl.hostname}:5173/`; } catch {}
+      try { const apiUrl = new URL(API_BASE); return `http://${apiUrl.hostname}:5173/${roomQuery}`; } catch {}
     }
-    return window.location.origin + "/";
+    return window.location.origin + "/" + roomQuery;
   }, []);
 
   const wifiConfig = useMemo(() => {
@@ -55,27 +65,39 @@ export default function PresenterApp() {
   }, []);
 
   useEffect(() => {
-    const ws = new WebSocket(makeWsUrl());
+    // With the admin token the server pushes participant, answered and presence changes
+    const ws = new WebSocket(makeWsUrl(savedToken ? { admin_token: savedToken } : undefined));
+    let pushed = false;
     ws.onopen = () => setWsStatus("connected");
     ws.onmessage = (event) => {
       const msg = JSON.parse(event.data);
       if (msg.type === "state") {
         setState(msg.payload);
         fetchResults();
-        fetchParticipants();
+        if (!pushed) fetchParticipants();
+      } else if (msg.type === "participants") {
+        pushed = true;
+        setParticipantsPushed(true);
+        setParticipants(prev => mergeParticipants(prev, msg));
+        setOnlineCount(msg.online);
+      } else if (msg.type === "leaderboard") {
+        setLeaderboard(msg);
       }
     };
-    ws.onclose = () => setWsStatus("disconnected");
+    ws.onclose = () => {
+      setParticipantsPushed(false);
+      setWsStatus("disconnected");
+    };
     return () => ws.close();
-  }, []);
+  }, [savedToken]);
 
   useEffect(() => {
-    if (!state) return;
+    if (!state || participantsPushed) return;
     const hasStarted = state.state.current_question_index >= 0 && !state.state.is_finished;
     if (!hasStarted) return;
     const id = setInterval(fetchParticipants, 2000);
     return () => clearInterval(id);
-  }, [state]);
+  }, [state, participantsPushed]);
 
   useEffect(() => {
     if (!state?.question || revealMode) {
@@ -130,6 +152,7 @@ export default function PresenterApp() {
 
   const saveToken = () => {
     localStorage.setItem('admin_token', adminToken.trim());
+    setSavedToken(adminToken.trim());
     setShowTokenPrompt(false);
     setToast('Admin token saved 🔐');
   };
@@ -176,7 +199,7 @@ export default function PresenterApp() {
 
   const fetchParticipants = async () => {
     const res = await fetch(`${API_BASE}/admin/participants`, { headers: authHeaders() });
-    if (res.ok) { const data = await res.json(); setParticipants(data.participants || []); }
+    if (res.ok) { const data = await res.json(); setParticipants(data.participants || []); setOnlineCount(data.online); }
   };
 
   const q = state?.question || null;
@@ -188,6 +211,11 @@ export default function PresenterApp() {
   const displayImage = (revealMode && q?.reveal_image_url) ? q.reveal_image_url : q?.image_url;
   const questionImageAlt = revealMode ? "Revealed illustration" : "Question illustration";
 
+  const prefetchKey = (state?.prefetch || []).map((a) => a.src).join("|");
+  useEffect(() => {
+    preloadImages(state?.prefetch, IMAGE_SIZES);
+  }, [prefetchKey]);
+
   useEffect(() => { warnPlayedRef.current = false; }, [state?.state?.current_question_index]);
   useEffect(() => {
     if (remainingSeconds !== null && remainingSeconds <= 5 && remainingSeconds > 0 && !warnPlayedRef.current) {
@@ -551,7 +579,7 @@ export default function PresenterApp() {
               {state.final_image_url && (
                 <div style={{ marginTop: theme.spacing.xl }}>
                   <img
-                    src={state.final_image_url}
+                    {...imageProps(state, state.final_image_url, IMAGE_SIZES)}
                     alt='Quiz completion'
                     style={{
                       maxWidth: '100%',
@@ -573,7 +601,7 @@ export default function PresenterApp() {
               {displayImage && (
                 <div style={{ textAlign: 'center', marginBottom: theme.spacing.lg }}>
                   <img
-                    src={displayImage}
+                    {...imageProps(state, displayImage, IMAGE_SIZES)}
                     alt={questionImageAlt}
                     style={{
                       maxWidth: '100%',
@@ -677,6 +705,11 @@ export default function PresenterApp() {
           <Card variant="default" padding="lg">
             <h3 style={{ marginTop: 0, marginBottom: theme.spacing.md }}>
               👥 Participants ({participants.length})
+              {onlineCount !== null && (
+                <span style={{ marginLeft: theme.spacing.sm, fontSize: theme.fontSizes.sm, color: theme.colors.neutral[500] }}>
+                  🟢 {onlineCount} online
+                </span>
+              )}
             </h3>
             <ParticipantsList
               participants={participants}
@@ -684,6 +717,13 @@ export default function PresenterApp() {
             />
           </Card>
 
+          {revealMode && !isFinished && leaderboard?.entries?.length > 0 && (
+            <Card variant="default" padding="lg" style={{ marginTop: theme.spacing.lg }}>
+              <h3 style={{ marginTop: 0, marginBottom: theme.spacing.md }}>🏆 Top players</h3>
+              <Leaderboard leaderboard={leaderboard} />
+            </Card>
+          )}
+
           {isFinished && (
             <div style={{ marginTop: theme.spacing.lg }}>
               <Scoreboard />
@@ -695,6 +735,41 @@ export default function PresenterApp() {
   );
 }
 
+function Leaderboard({ leaderboard }) {
+  const showPoints = leaderboard.scoring_mode === "speed";
+  return (
+    <ol style={{ listStyle: 'none', padding: 0, margin: 0 }}>
+      {leaderboard.entries.map(entry => (
+        <li
+          key={entry.participant_id}
+          style={{
+            display: 'flex',
+            justifyContent: 'space-between',
+            padding: `${theme.spacing.xs} 0`,
+            borderBottom: `1px solid ${theme.colors.neutral[100]}`,
+          }}
+        >
+          <span>
+            <strong style={{ marginRight: theme.spacing.sm }}>{entry.rank}.</strong>
+            {entry.name}
+          </span>
+          <span style={{ color: theme.colors.neutral[600] }}>
+            {showPoints ? `${entry.points} pts` : `${entry.correct} / ${entry.total_questions}`}
+          </span>
+        </li>
+      ))}
+    </ol>
+  );
+}
+
+// Applies a pushed {"type": "participants"} message: a full roster, or only changed entries
+function mergeParticipants(current, msg) {
+  if (msg.full) return msg.participants;
+  const byId = new Map(current.map(p => [p.participant_id, p]));
+  for (const p of msg.participants) byId.set(p.participant_id, p);
+  return [...byId.values()].sort((a, b) => a.name.toLowerCase().localeCompare(b.name.toLowerCase()));
+}
+
 function ParticipantsList({ participants, showAnswered }) {
   if (!participants.length) {
     return (
@@ -721,7 +796,12 @@ function ParticipantsList({ participants, showAnswered }) {
         <tbody>
           {participants.map(p => (
             <tr key={p.participant_id}>
-              <td style={tdStyle}>{p.name}</td>
+              <td style={tdStyle}>
+                <span title={p.online ? 'Online' : 'Offline'} style={{ marginRight: theme.spacing.xs }}>
+                  {p.online ? '🟢' : '⚪'}
+                </span>
+                {p.name}
+              </td>
               {showAnswered && (
                 <td style={{ ...tdStyle, textAlign: 'center' }}>
                   {p.answered_current ? (
@@ -6,6 +6,7 @@ import { Skeleton } from "./ui/Skeleton.jsx";
 
 export default function Scoreboard() {
   const [entries, setEntries] = useState([]);
+  const [showPoints, setShowPoints] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -21,6 +22,7 @@ export default function Scoreboard() {
       } else {
         const data = await res.json();
         setEntries(data.entries || []);
+        setShowPoints(data.scoring_mode === "speed");
       }
     } catch (e) {
       setError(e.message || "Network error");
@@ -123,11 +125,12 @@ export default function Scoreboard() {
           marginBottom: rest.length ? theme.spacing.sm : 0,
         }}
       >
-        {podium.map((entry, idx) => (
+        {podium.map((entry) => (
           <ScoreCard
             key={entry.participant_id}
             entry={entry}
-            rank={idx + 1}
+            rank={entry.rank}
+            showPoints={showPoints}
           />
         ))}
       </div>
@@ -140,11 +143,12 @@ export default function Scoreboard() {
             gap: theme.spacing.md,
           }}
         >
-          {rest.map((entry, idx) => (
+          {rest.map((entry) => (
             <ScoreCard
               key={entry.participant_id}
               entry={entry}
-              rank={idx + 4}
+              rank={entry.rank}
+              showPoints={showPoints}
             />
           ))}
         </div>
@@ -153,7 +157,7 @@ export default function Scoreboard() {
   );
 }
 
-function ScoreCard({ entry, rank }) {
+function ScoreCard({ entry, rank, showPoints }) {
   const accent = getAccent(rank);
   const rankLabel = rank <= 3 ? `Podium #${rank}` : `Rank #${rank}`;
   return (
@@ -201,6 +205,7 @@ function ScoreCard({ entry, rank }) {
       <div style={{ fontSize: theme.fontSizes.sm, color: accent.subtleText, display: 'flex', gap: theme.spacing.lg, flexWrap: 'wrap' }}>
         <span>Correct: <strong>{entry.correct}</strong> / {entry.total_questions}</span>
         <span>Answered: <strong>{entry.answered}</strong></span>
+        {showPoints && <span>Points: <strong>{entry.points}</strong></span>}
       </div>
       <div style={{ height: '6px', background: accent.progressBg, borderRadius: theme.radii.full }}>
         <div
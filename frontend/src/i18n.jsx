@@ -39,6 +39,7 @@ const MESSAGES = {
     correct_answer_label: "Correct answer: {answer}",
     answer_phase_closed: "Answer window closed for this question",
     option_aria_label: "Option {index}: {text}",
+    your_rank: "🏅 Rank {rank} of {total} · {points} pts",
   },
   ru: {
     language_label: "Язык",
@@ -71,6 +72,7 @@ const MESSAGES = {
     correct_answer_label: "Правильный ответ: {answer}",
     answer_phase_closed: "Время ответа на этот вопрос завершено",
     option_aria_label: "Вариант {index}: {text}",
+    your_rank: "🏅 Место {rank} из {total} · {points} очк.",
   },
 };
 